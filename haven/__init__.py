@@ -0,0 +1 @@
+# haven — support modules for the Mindful Haven app (storage, AI client, helpers)
@@ -0,0 +1,222 @@
+# haven/applog.py — append-only JSON Lines log with a record-offset index
+#
+#   <name>.jsonl      one JSON record per line, only ever appended to
+#   <name>.jsonl.idx  16-byte header (magic + inode of the .jsonl), then one uint64 start offset per record
+# append() is two small O_APPEND writes, len() is a stat, tail(n) seeks straight to record len-n.
+# A torn last line or an index that fell behind (crash between the two writes) is repaired on
+# first use; compact() rewrites the log without damaged lines (run it from cron for big folders).
+import os, sys, json, struct, threading
+from array import array
+from contextlib import contextmanager
+from pathlib import Path
+from haven.fsio import WRITER
+
+try:
+    import fcntl
+except ImportError:  # no flock on Windows: in-process locking only
+    fcntl = None
+
+MAGIC = b"HVIDX1\0\0"
+HEADER = struct.Struct("<8sQ")
+OFFSET = struct.Struct("<Q")
+
+
+def _offsets(raw: bytes) -> array:
+    a = array("Q")
+    a.frombytes(raw[: len(raw) // 8 * 8])
+    if sys.byteorder != "little":
+        a.byteswap()
+    return a
+
+
+def _parse(lines):
+    out = []
+    for ln in lines:
+        try: out.append(json.loads(ln))
+        except ValueError: pass
+    return out
+
+
+class AppendLog:
+    def __init__(self, path):
+        self.path = Path(path)
+        self.idx_path = self.path.with_name(self.path.name + ".idx")
+        self._lock = threading.RLock()
+        self._checked = False
+        self.damaged = 0  # torn / unparseable lines found by the last check
+
+    # ----- locking -----
+    @contextmanager
+    def _locked(self):
+        """Exclusive lock on the data file; yields an O_APPEND fd of the *current* file."""
+        with self._lock:
+            while True:
+                fd = os.open(self.path, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o644)
+                if fcntl:
+                    fcntl.flock(fd, fcntl.LOCK_EX)
+                # compact() may have renamed a new file into place while we waited
+                if os.fstat(fd).st_ino == os.stat(self.path).st_ino:
+                    break
+                os.close(fd)
+            try:
+                yield fd
+            finally:
+                os.close(fd)  # also releases the flock
+
+    # ----- index maintenance -----
+    def _read_index(self, inode: int) -> array:
+        try:
+            raw = self.idx_path.read_bytes()
+        except OSError:
+            return None
+        if len(raw) < HEADER.size:
+            return None
+        magic, ino = HEADER.unpack_from(raw)
+        if magic != MAGIC or ino != inode:
+            return None
+        return _offsets(raw[HEADER.size:])
+
+    def _check(self, fd: int):
+        """Bring the index in line with the data file (cheap unless it must be rebuilt)."""
+        if self._checked:
+            return
+        st = os.fstat(fd)
+        offs = self._read_index(st.st_ino)
+        rebuild = offs is None
+        if rebuild:
+            offs = array("Q")
+        while offs and offs[-1] >= st.st_size:
+            offs.pop()
+            rebuild = True
+        start = offs[-1] if offs else 0
+        os.lseek(fd, start, os.SEEK_SET)
+        chunk = os.read(fd, st.st_size - start)
+        self.damaged = 0
+        end = chunk.rfind(b"\n") + 1
+        if end < len(chunk):  # torn last write: drop the partial record
+            os.ftruncate(fd, start + end)
+            chunk = chunk[:end]
+            self.damaged += 1
+            while offs and offs[-1] >= start + end:  # its offset may already be indexed
+                offs.pop()
+                rebuild = True
+        new, pos = [], 0
+        for ln in chunk.splitlines(keepends=True):
+            if not (offs and pos == 0):
+                new.append(start + pos)
+            try: json.loads(ln)
+            except ValueError: self.damaged += 1
+            pos += len(ln)
+        if rebuild:
+            hdr = HEADER.pack(MAGIC, st.st_ino)
+            WRITER.write_bytes(self.idx_path, hdr + b"".join(OFFSET.pack(o) for o in list(offs) + new))
+        elif new:
+            WRITER.append_bytes(self.idx_path, b"".join(OFFSET.pack(o) for o in new))
+        self._checked = True
+
+    # ----- public API -----
+    def append(self, rec):
+        line = (json.dumps(rec, ensure_ascii=False) + "\n").encode("utf-8")
+        with self._locked() as fd:
+            self._check(fd)
+            off = os.fstat(fd).st_size
+            os.write(fd, line)
+            WRITER.track(self.path, fd)
+            WRITER.append_bytes(self.idx_path, OFFSET.pack(off))
+
+    def extend(self, recs):
+        for r in recs:
+            self.append(r)
+
+    def __len__(self):
+        if not self.path.exists():
+            return 0
+        if not self._checked:
+            with self._locked() as fd:
+                self._check(fd)
+        try:
+            return max(0, (self.idx_path.stat().st_size - HEADER.size) // 8)
+        except OSError:
+            return 0
+
+    def tail(self, n: int) -> list:
+        """Last n records, read by seeking to their offsets (no full parse)."""
+        total = len(self)
+        if n <= 0 or total == 0:
+            return []
+        n = min(n, total)
+        with open(self.idx_path, "rb") as f:
+            f.seek(HEADER.size + (total - n) * 8)
+            first = _offsets(f.read(8))[0]
+        with open(self.path, "rb") as f:
+            f.seek(first)
+            chunk = f.read()
+        lines = [ln for ln in chunk.splitlines(keepends=True) if ln.endswith(b"\n")]
+        return _parse(lines)[-n:]
+
+    def read_all(self) -> list:
+        if not self.path.exists():
+            return []
+        if not self._checked:
+            with self._locked() as fd:
+                self._check(fd)
+        with open(self.path, "rb") as f:
+            return _parse(f.read().splitlines())
+
+    def compact(self) -> int:
+        """Rewrite the log without damaged lines and rebuild the index. Returns records kept."""
+        return self.rewrite(lambda recs: recs)
+
+    def rewrite(self, fn) -> int:
+        """Replace the records with fn(records), under the lock (no append can slip in between)."""
+        with self._locked() as fd:
+            st = os.fstat(fd)
+            os.lseek(fd, 0, os.SEEK_SET)
+            recs = fn(_parse(os.read(fd, st.st_size).splitlines()))
+            lines = [(json.dumps(r, ensure_ascii=False) + "\n").encode("utf-8") for r in recs]
+            offs, pos = [], 0
+            for ln in lines:
+                offs.append(pos)
+                pos += len(ln)
+            WRITER.write_bytes(self.path, b"".join(lines))
+            ino = os.stat(self.path).st_ino
+            WRITER.write_bytes(self.idx_path, HEADER.pack(MAGIC, ino) + b"".join(OFFSET.pack(o) for o in offs))
+            self.damaged = 0
+            self._checked = True
+            return len(recs)
+
+    def maybe_compact(self) -> bool:
+        """Compact if the last check found damage."""
+        len(self)
+        if self.damaged:
+            self.compact()
+            return True
+        return False
+
+
+def migrate_json_array(legacy: Path, log: AppendLog) -> bool:
+    """One-time conversion of a legacy JSON array file (e.g. checkins.json) into `log`."""
+    legacy = Path(legacy)
+    if log.path.exists() or not legacy.exists():
+        return False
+    try:
+        with open(legacy, "r", encoding="utf-8") as f:
+            data = json.load(f) if legacy.stat().st_size > 0 else []
+    except Exception:
+        return False
+    if not isinstance(data, list):
+        return False
+    lines = [(json.dumps(r, ensure_ascii=False) + "\n").encode("utf-8") for r in data]
+    WRITER.write_bytes(log.path, b"".join(lines))
+    log.compact()  # builds the index
+    legacy.rename(legacy.with_name(legacy.name + ".migrated"))
+    return True
+
+
+if __name__ == "__main__":
+    # python -m haven.applog compact [data_root]  — periodic maintenance for every *.jsonl log
+    if len(sys.argv) < 2 or sys.argv[1] != "compact":
+        sys.exit("usage: python -m haven.applog compact [data_root]")
+    root = Path(sys.argv[2] if len(sys.argv) > 2 else "data")
+    for p in sorted(root.glob("*/*.jsonl")):
+        print(f"{p}: {AppendLog(p).compact()} records")
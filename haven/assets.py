@@ -0,0 +1,120 @@
+# haven/assets.py — resized WebP/AVIF variants of the app images, cached by content hash
+#
+# Each source image (assets/*.png|jpg) is encoded once per width in WIDTHS (never upscaled) into
+# static/img/<stem>-<hash>-<width>.<fmt>, where <hash> is the SHA-256 prefix of the source bytes:
+# editing an image produces new names, unchanged images are never re-encoded (not even after a
+# restart). picture_html() emits a <picture> with srcset/sizes so the browser downloads the smallest
+# variant that covers its layout width and pixel density, over the cacheable static route.
+# AVIF is added when Pillow can write it (Pillow >= 11.3, or the pillow-avif-plugin package).
+#   python -m haven.assets build [assets]   # pre-build every variant, e.g. at deploy time
+import os, sys, hashlib, threading
+from pathlib import Path
+from PIL import Image
+from haven.cache import file_version
+
+try:
+    __import__("pillow_avif")  # registers the AVIF plugin on older Pillow
+except ImportError:
+    pass
+
+Image.init()
+WIDTHS = (320, 640, 960, 1280)
+FORMATS = (("avif",) if "AVIF" in Image.SAVE else ()) + ("webp",)
+QUALITY = {"webp": 80, "avif": 60}
+STATIC_IMG = Path(__file__).resolve().parent.parent / "static" / "img"   # next to mental_health.py
+SOURCE_TYPES = (".png", ".jpg", ".jpeg", ".webp")
+
+_built = {}   # (path, file version) -> Variants, so a rerun doesn't even re-hash the source
+_lock = threading.Lock()
+
+
+class Variants:
+    def __init__(self, source: Path, digest: str, size: tuple, files: dict):
+        self.source = source
+        self.digest = digest
+        self.size = size          # source (width, height)
+        self.files = files        # fmt -> [(width, Path)] ascending
+
+    def url(self, path: Path) -> str:
+        return f"app/static/img/{path.name}?v={self.digest}"
+
+    def srcset(self, fmt: str) -> str:
+        return ", ".join(f"{self.url(p)} {w}w" for w, p in self.files[fmt])
+
+    def best(self, width: int, fmt: str = "webp") -> Path:
+        """Smallest variant at least `width` px wide (the largest if none is)."""
+        for w, p in self.files[fmt]:
+            if w >= width:
+                return p
+        return self.files[fmt][-1][1]
+
+
+def _widths(src_w: int) -> list:
+    return [w for w in WIDTHS if w < src_w] + [min(src_w, WIDTHS[-1])]
+
+
+def _encode(im: Image.Image, width: int, fmt: str, target: Path):
+    h = round(im.height * width / im.width)
+    out = im if width == im.width else im.resize((width, h), Image.LANCZOS)
+    tmp = target.with_name(f".{target.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        opts = {"quality": QUALITY[fmt], **({"method": 4} if fmt == "webp" else {})}
+        out.save(tmp, format=fmt.upper(), **opts)
+        os.replace(tmp, target)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+
+
+def variants(source) -> Variants:
+    """Variants of `source`, encoding the missing ones (None if the file doesn't exist)."""
+    source = Path(source)
+    ver = file_version(source)
+    if ver is None:
+        return None
+    key = (str(source.resolve()), ver)
+    with _lock:
+        hit = _built.get(key)
+        if hit is not None:
+            return hit
+        digest = hashlib.sha256(source.read_bytes()).hexdigest()[:16]
+        STATIC_IMG.mkdir(parents=True, exist_ok=True)
+        with Image.open(source) as im:
+            size = im.size   # header only: pixels are decoded just when something needs encoding
+            files = {fmt: [(w, STATIC_IMG / f"{source.stem}-{digest}-{w}.{fmt}") for w in _widths(size[0])]
+                     for fmt in FORMATS}
+            missing = [(fmt, w, p) for fmt, ws in files.items() for w, p in ws if not p.exists()]
+            if missing:
+                if im.mode not in ("RGB", "RGBA"):
+                    im = im.convert("RGBA" if "A" in im.getbands() or "transparency" in im.info else "RGB")
+                for fmt, w, p in missing:
+                    _encode(im, w, fmt, p)
+        # older encodings of an edited image
+        for old in STATIC_IMG.glob(f"{source.stem}-*"):
+            if old.name.rsplit("-", 2)[0] == source.stem and f"-{digest}-" not in old.name:
+                old.unlink(missing_ok=True)
+        _built[key] = v = Variants(source, digest, size, files)
+        return v
+
+
+def picture_html(v: Variants, sizes: str = "100vw", alt: str = "", style: str = "") -> str:
+    """<picture> choosing among the variants by layout width (`sizes`) and pixel density."""
+    sources = "".join(f"<source type='image/{fmt}' srcset='{v.srcset(fmt)}' sizes='{sizes}'>" for fmt in FORMATS)
+    w, h = v.size
+    fallback = v.url(v.best(640))
+    return (f"<picture>{sources}<img src='{fallback}' alt='{alt}' width='{w}' height='{h}' "
+            f"loading='lazy' decoding='async' style='width:100%;height:auto;{style}'></picture>")
+
+
+def build(folder="assets"):
+    for p in sorted(Path(folder).iterdir()):
+        if p.suffix.lower() in SOURCE_TYPES:
+            v = variants(p)
+            kb = {fmt: [round(f.stat().st_size / 1024) for _, f in v.files[fmt]] for fmt in FORMATS}
+            print(f"{p.name}: {round(p.stat().st_size / 1024)} KB -> widths {[w for w, _ in v.files['webp']]} KB {kb}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] != "build":
+        sys.exit("usage: python -m haven.assets build [assets]")
+    build(*sys.argv[2:3])
@@ -0,0 +1,257 @@
+# haven/audio.py — content-addressed audio uploads for Moody Melody
+#
+# An upload is copied to a temp file in 1 MiB chunks while it is hashed (SHA-256) and measured, so
+# the app never builds a second in-memory copy, and anything over HAVEN_AUDIO_MAX_MB (default 25)
+# is dropped as soon as it crosses the cap. The file then lands at audio/<hash><ext>: uploading the
+# same bytes again (another playlist, another title) reuses it. Duration and bitrate are probed
+# once at ingest from the file headers (WAV, MP3, Ogg Vorbis/Opus, M4A; stdlib only) and kept in
+# audio/index.json next to the files.
+#   HAVEN_AUDIO_SHARED=1  one library for every user (data/_audio) instead of data/<uid>/audio
+# Uploads are private: they stay under data/ and are played through st.audio (Streamlit's media
+# route: session-scoped URL, Range requests, the MIME type from AUDIO_MIME). Older versions linked
+# tracks into the public static/audio/ folder; remove_static_links() takes those down.
+import os, sys, json, shutil, struct, hashlib, threading
+from pathlib import Path
+from haven.fsio import WRITER
+
+CHUNK = 1 << 20
+STATIC_AUDIO = Path(__file__).resolve().parent.parent / "static" / "audio"   # links of older versions
+AUDIO_TYPES = ("mp3", "wav", "ogg", "m4a")
+AUDIO_MIME = {".mp3": "audio/mpeg", ".wav": "audio/wav", ".ogg": "audio/ogg", ".m4a": "audio/mp4"}
+SHARED_DIR = "_audio"
+INDEX = "index.json"
+
+
+class UploadTooLarge(ValueError):
+    pass
+
+
+# ---------- Probes (header parsing only; {} when the format isn't recognized) ----------
+def _wav(f, size):
+    head = f.read(12)
+    if head[:4] != b"RIFF" or head[8:12] != b"WAVE":
+        return {}
+    byte_rate = data = None
+    while True:
+        ch = f.read(8)
+        if len(ch) < 8:
+            break
+        cid, n = ch[:4], struct.unpack("<I", ch[4:])[0]
+        if cid == b"fmt ":
+            fmt = f.read(n)
+            byte_rate = struct.unpack("<I", fmt[8:12])[0]
+            f.seek(n % 2, 1)
+        elif cid == b"data":
+            data = min(n, size - f.tell())
+            break
+        else:
+            f.seek(n + n % 2, 1)
+    if not byte_rate or data is None:
+        return {}
+    return {"duration": data / byte_rate, "bitrate": byte_rate * 8 / 1000}
+
+
+_MP3_RATES = {  # (mpeg1?, layer) -> kbps by index
+    (True, 3): (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (True, 2): (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (False, 3): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    (False, 2): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+
+
+def _mp3(f, size):
+    head = f.read(10)
+    start = 0
+    if head[:3] == b"ID3":
+        start = 10 + ((head[6] << 21) | (head[7] << 14) | (head[8] << 7) | head[9]) + (10 if head[5] & 0x10 else 0)
+    f.seek(start)
+    buf = f.read(64 * 1024)
+    for i in range(len(buf) - 4):
+        b0, b1, b2, b3 = buf[i:i + 4]
+        if b0 != 0xFF or b1 & 0xE0 != 0xE0:
+            continue
+        ver, layer = (b1 >> 3) & 3, 4 - ((b1 >> 1) & 3)
+        rates = _MP3_RATES.get((ver == 3, layer))
+        if ver == 1 or not rates or b2 >> 4 in (0, 15) or (b2 >> 2) & 3 == 3:
+            continue
+        kbps = rates[b2 >> 4]
+        sr = (44100, 48000, 32000)[(b2 >> 2) & 3] >> {3: 0, 2: 1, 0: 2}[ver]
+        audio = size - start - i
+        # a Xing/Info header (VBR files) gives the real frame count
+        mono = b3 >> 6 == 3
+        x = i + 4 + ((17 if mono else 32) if ver == 3 else (9 if mono else 17))
+        if buf[x:x + 4] in (b"Xing", b"Info") and buf[x + 7] & 1:
+            frames = struct.unpack(">I", buf[x + 8:x + 12])[0]
+            spf = 1152 if ver == 3 or layer == 2 else 576
+            dur = frames * spf / sr
+            return {"duration": dur, "bitrate": audio * 8 / dur / 1000} if dur else {}
+        return {"duration": audio * 8 / (kbps * 1000), "bitrate": float(kbps)}
+    return {}
+
+
+def _ogg(f, size):
+    head = f.read(4096)
+    if head[:4] != b"OggS":
+        return {}
+    body = head[27 + head[26]:]
+    if body[:7] == b"\x01vorbis":
+        rate, skip = struct.unpack("<I", body[12:16])[0], 0
+    elif body[:8] == b"OpusHead":
+        rate, skip = 48000, struct.unpack("<H", body[10:12])[0]
+    else:
+        return {}
+    f.seek(max(0, size - 65536))
+    tail = f.read()
+    last = tail.rfind(b"OggS")
+    if last < 0 or not rate:
+        return {}
+    granule = struct.unpack("<q", tail[last + 6:last + 14])[0]
+    dur = max(0, granule - skip) / rate
+    return {"duration": dur, "bitrate": size * 8 / dur / 1000} if dur else {}
+
+
+def _atoms(f, end):
+    while f.tell() + 8 <= end:
+        pos = f.tell()
+        n, kind = struct.unpack(">I4s", f.read(8))
+        hdr = 8
+        if n == 1:
+            n, hdr = struct.unpack(">Q", f.read(8))[0], 16
+        elif n == 0:
+            n = end - pos
+        if n < hdr:
+            return
+        yield kind, pos + hdr, pos + n
+        f.seek(pos + n)
+
+
+def _m4a(f, size):
+    for kind, body, end in _atoms(f, size):
+        if kind != b"moov":
+            continue
+        for k2, b2, _ in _atoms(f, end):
+            if k2 == b"mvhd":
+                f.seek(b2)
+                v = f.read(1)[0]
+                f.seek(3 + (16 if v == 1 else 8), 1)
+                scale, dur = struct.unpack(">IQ" if v == 1 else ">II", f.read(12 if v == 1 else 8))
+                dur = dur / scale if scale else 0
+                return {"duration": dur, "bitrate": size * 8 / dur / 1000} if dur else {}
+        return {}
+    return {}
+
+
+PROBES = {".wav": _wav, ".mp3": _mp3, ".ogg": _ogg, ".m4a": _m4a}
+
+
+def probe(path) -> dict:
+    """{'duration': seconds, 'bitrate': kbps} from the headers, or {} if unknown."""
+    fn = PROBES.get(Path(path).suffix.lower())
+    if fn is None:
+        return {}
+    try:
+        size = os.path.getsize(path)
+        with open(path, "rb") as f:
+            meta = fn(f, size)
+    except (OSError, struct.error, IndexError, ValueError, ZeroDivisionError):
+        return {}
+    return {k: round(v, 2) if k == "duration" else int(round(v)) for k, v in meta.items()}
+
+
+# ---------- Library ----------
+class AudioLibrary:
+    def __init__(self, root, max_bytes: int):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def _index(self) -> dict:
+        try:
+            with open(self.root / INDEX, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def ingest(self, src, name: str) -> dict:
+        """Store the binary stream `src` (an upload); returns its index record plus hash, path and dedup."""
+        ext = Path(name).suffix.lower()
+        if ext.lstrip(".") not in AUDIO_TYPES:
+            raise ValueError(f"Unsupported audio type: {ext or name!r}")
+        if hasattr(src, "seek"):
+            src.seek(0)
+        h, n = hashlib.sha256(), 0
+        tmp = self.root / f".upload.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp, "wb") as out:
+                while True:
+                    chunk = src.read(CHUNK)
+                    if not chunk:
+                        break
+                    n += len(chunk)
+                    if n > self.max_bytes:
+                        raise UploadTooLarge(f"Audio files are limited to {self.max_bytes / (1 << 20):g} MB")
+                    h.update(chunk)
+                    out.write(chunk)
+            digest = h.hexdigest()
+            with self._lock:
+                index = self._index()
+                rec = index.get(digest)
+                if rec and (self.root / rec["file"]).exists():
+                    return dict(rec, hash=digest, path=str(self.root / rec["file"]), dedup=True)
+                target = self.root / f"{digest}{ext}"
+                os.replace(tmp, target)
+                WRITER.track(target)
+                rec = {"file": target.name, "size": n, **probe(target)}
+                index[digest] = rec
+                WRITER.write_text(self.root / INDEX, json.dumps(index, indent=2))
+                return dict(rec, hash=digest, path=str(target), dedup=False)
+        finally:
+            if tmp.exists():
+                tmp.unlink()
+
+
+_LIBS = {}
+_LIBS_LOCK = threading.Lock()
+
+
+def audio_library(user_dir) -> AudioLibrary:
+    """The user's library (or the shared one with HAVEN_AUDIO_SHARED=1); one per folder per process."""
+    user_dir = Path(user_dir)
+    shared = os.getenv("HAVEN_AUDIO_SHARED", "0").strip().lower() in ("1", "true", "yes")
+    root = (user_dir.parent / SHARED_DIR) if shared else (user_dir / "audio")
+    max_bytes = int(float(os.getenv("HAVEN_AUDIO_MAX_MB", "25") or 25) * (1 << 20))
+    with _LIBS_LOCK:
+        lib = _LIBS.get(str(root.resolve()))
+        if lib is None:
+            lib = _LIBS[str(root.resolve())] = AudioLibrary(root, max_bytes)
+        return lib
+
+
+# ---------- Public links left by older versions ----------
+def remove_static_links(digests=None) -> int:
+    """Delete static/audio/<hash>.<ext> links (all of them, or just those of `digests`)."""
+    if not STATIC_AUDIO.is_dir():
+        return 0
+    n = 0
+    for p in STATIC_AUDIO.iterdir():
+        if digests is None or p.name.split(".", 1)[0] in digests:
+            p.unlink(missing_ok=True)
+            n += 1
+    if digests is None:
+        shutil.rmtree(STATIC_AUDIO, ignore_errors=True)
+    return n
+
+
+def library_digests(user_dir) -> set:
+    """Content hashes of the tracks in a user's own library folder."""
+    lib = Path(user_dir) / "audio"
+    return {p.stem for p in lib.glob("*") if p.suffix.lower().lstrip(".") in AUDIO_TYPES}
+
+
+if __name__ == "__main__":
+    # python -m haven.audio probe FILE...
+    if len(sys.argv) < 3 or sys.argv[1] != "probe":
+        sys.exit("usage: python -m haven.audio probe FILE...")
+    for p in sys.argv[2:]:
+        print(p, probe(p))
@@ -0,0 +1,107 @@
+# haven/cache.py — process-wide LRU cache for parsed per-user data
+#
+# Entries are keyed by (user, source, version...) — for files the version is (inode, mtime_ns, size),
+# which changes on every write (our writes rename a new file into place), so a stale hit is impossible
+# even without invalidation; writes still invalidate eagerly to free memory.
+# Cached values are shared between sessions: treat them as read-only and thaw() before mutating.
+import os, sys, threading
+from collections import OrderedDict
+from pathlib import Path
+import pandas as pd
+from haven.fsio import WRITER
+
+
+def sizeof(value) -> int:
+    """Rough in-memory size, good enough for a budget."""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(sizeof(k) + sizeof(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(sizeof(v) for v in value)
+    return sys.getsizeof(value)
+
+
+def thaw(value):
+    """Private mutable copy of a cached value (containers copied, immutable leaves shared)."""
+    if isinstance(value, pd.DataFrame):
+        return value.copy()
+    if isinstance(value, dict):
+        return {k: thaw(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [thaw(v) for v in value]
+    return value
+
+
+def file_version(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+class LRUCache:
+    def __init__(self, budget_bytes: int):
+        self.budget = budget_bytes
+        self._data = OrderedDict()  # key -> (value, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+
+    def load(self, key, loader):
+        """Cached value for key, computing it with loader() on a miss."""
+        with self._lock:
+            hit = self._data.get(key)
+            if hit is not None:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return hit[0]
+            self.misses += 1
+        value = loader()  # parse outside the lock
+        size = sizeof(value)
+        if size > self.budget:
+            return value
+        with self._lock:
+            # drop older versions of the same source first
+            for k in [k for k in self._data if k[:2] == key[:2] and k != key]:
+                self._bytes -= self._data.pop(k)[1]
+            if key not in self._data:
+                self._data[key] = (value, size)
+                self._bytes += size
+            while self._bytes > self.budget and self._data:
+                _, (_, sz) = self._data.popitem(last=False)
+                self._bytes -= sz
+                self.evictions += 1
+        return value
+
+    def invalidate(self, source):
+        """Forget every cached version of a source (a path or any key[1] value)."""
+        source = str(source)
+        with self._lock:
+            for k in [k for k in self._data if k[1] == source]:
+                self._bytes -= self._data.pop(k)[1]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                "entries": len(self._data), "bytes": self._bytes,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0}
+
+
+CACHE = LRUCache(int(float(os.getenv("HAVEN_CACHE_MB", "64") or 64) * 1024 * 1024))
+WRITER.subscribe(CACHE.invalidate)
+
+
+def load_file(path, parser, user: str = ""):
+    """Parse a file at most once per version, shared across sessions (read-only result)."""
+    path = Path(path)
+    ver = file_version(path)
+    if ver is None:
+        return parser(path)  # missing file: parser supplies the default, nothing to cache
+    return CACHE.load((user, str(path)) + ver, lambda: parser(path))
@@ -0,0 +1,49 @@
+# haven/components.py — browser-side widgets (Streamlit custom components, no build step)
+#
+# haven/frontend/index.html is a plain HTML/JS component: protocol.js speaks Streamlit's component
+# postMessage protocol by hand (componentReady -> render(args) -> setComponentValue), and the widget
+# named in args["widget"] runs entirely in the browser. Timers and animation cost the server nothing;
+# only the outcome comes back, as a dict with a fresh "id" so each result is handled exactly once.
+import streamlit as st
+from pathlib import Path
+import streamlit.components.v1 as components
+
+FRONTEND = Path(__file__).resolve().parent / "frontend"
+PALETTE_KEYS = ("ink", "muted", "accent", "accent_soft", "panel", "body_font", "headline_font")
+
+_component = components.declare_component("haven", path=str(FRONTEND))
+
+# phase patterns: (label, seconds)
+BREATHING = {
+    "4-7-8": [("Inhale", 4), ("Hold", 7), ("Exhale", 8)],
+    "Box (4-4-4-4)": [("Inhale", 4), ("Hold", 4), ("Exhale", 4), ("Hold", 4)],
+}
+
+
+def _palette(theme: dict) -> dict:
+    return {k: theme[k] for k in PALETTE_KEYS if k in theme}
+
+
+def new_result(value, key: str):
+    """`value` if it is a result not handled yet in this session (then marks it handled), else None."""
+    seen = f"_{key}_handled"
+    if not value or value.get("id") == st.session_state.get(seen):
+        return None
+    st.session_state[seen] = value["id"]
+    return value
+
+
+def breathing(mode: str, cycles: int, theme: dict, key: str = "breathing"):
+    """Inhale/Hold/Exhale guide with Start/Stop, run in the browser.
+    Returns {'id', 'cycles', 'seconds'} once per completed session, else None."""
+    value = _component(widget="breathing", phases=BREATHING[mode], cycles=int(cycles),
+                       palette=_palette(theme), key=key, default=None)
+    return new_result(value, key)
+
+
+def reaction(theme: dict, min_ms: int = 1600, max_ms: int = 3800, key: str = "reaction"):
+    """Reaction Focus pad: random wait, GO, then the tap timed with performance.now() in the browser.
+    Returns {'id', 'ms'} once per completed round, else None."""
+    value = _component(widget="reaction", min_ms=int(min_ms), max_ms=int(max_ms),
+                       palette=_palette(theme), key=key, default=None)
+    return new_result(value, key)
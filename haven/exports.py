@@ -0,0 +1,134 @@
+# haven/exports.py — on-demand exports written in chunks and cached by source version
+#
+# Nothing is built while a page renders: export_file() runs when the user asks for a download.
+# Rows come from the Store's chunked iterators (one CSV/SQLite page or one nutrition month at a
+# time) and are written straight to data/<uid>/exports/<kind>-<version>.<fmt>, so the working set
+# is one chunk. The version is the source's (inode, mtime, size) from Store.source_version: as long
+# as the data hasn't changed, asking again just returns the file already on disk.
+# Parquet needs pyarrow (optional); without it only CSV is offered.
+import os, csv, json, hashlib, threading
+from pathlib import Path
+import pandas as pd
+from haven.storage import JOURNAL_COLS, HABIT_COLS
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # CSV only
+    pa = pq = None
+
+EXPORT_DIR = "exports"
+CHUNK_ROWS = 5000
+FORMATS = ("csv", "parquet") if pq is not None else ("csv",)
+
+NUTRITION_FIELDS = ["date", "water_glasses", "calories", "protein", "carbs", "fat", "mood_after_meals",
+                    "breakfast", "lunch", "dinner", "snacks", "notes"]
+NUTRITION_DEFAULTS = {"water_glasses": 0, "calories": 0, "protein": 0, "carbs": 0, "fat": 0,
+                      "mood_after_meals": 3, "breakfast": "", "lunch": "", "dinner": "", "snacks": "", "notes": ""}
+
+# column -> type for Parquet (CSV keeps the stored values as they are)
+SCHEMAS = {
+    "journal": {"date": "str", "mood_1to5": "float", "emotion": "str", "note": "str"},
+    "habits": {"Date": "str", "Habit": "str", "Done": "int"},
+    "nutrition": {"date": "str", **{c: "str" if isinstance(v, str) else "float" for c, v in NUTRITION_DEFAULTS.items()}},
+}
+COLUMNS = {"journal": JOURNAL_COLS, "habits": HABIT_COLS, "nutrition": NUTRITION_FIELDS}
+_LOCK = threading.Lock()
+
+
+def nutrition_rows(items):
+    """(date, entry) pairs -> export rows with every column filled in."""
+    for d, ent in items:
+        yield [d] + [ent.get(k, NUTRITION_DEFAULTS[k]) for k in NUTRITION_FIELDS[1:]]
+
+
+def chunks(store, kind: str, size: int = CHUNK_ROWS):
+    """The whole `kind` history as DataFrames of at most `size` rows, with the export columns."""
+    if kind == "journal":
+        frames = store.iter_journal(size)
+    elif kind == "habits":
+        frames = store.iter_habits(size)
+    elif kind == "nutrition":
+        frames = _batched(nutrition_rows(store.iter_nutrition()), size)
+    else:
+        raise ValueError(f"Unknown export: {kind!r}")
+    for df in frames:
+        yield df.reindex(columns=COLUMNS[kind])
+
+
+def _batched(rows, size):
+    batch = []
+    for r in rows:
+        batch.append(r)
+        if len(batch) == size:
+            yield pd.DataFrame(batch, columns=NUTRITION_FIELDS)
+            batch = []
+    if batch:
+        yield pd.DataFrame(batch, columns=NUTRITION_FIELDS)
+
+
+# ---------- Writers ----------
+def write_csv(f, header, frames):
+    w = csv.writer(f, lineterminator="\n")
+    w.writerow(header)
+    for df in frames:
+        df.to_csv(f, header=False, index=False, lineterminator="\n")
+
+
+def _typed(df, schema):
+    out = {}
+    for c, t in schema.items():
+        col = df[c]
+        if t == "str":
+            out[c] = col.map(lambda v: None if v is None or v != v else str(v)).astype(object)
+        else:
+            col = pd.to_numeric(col, errors="coerce")
+            out[c] = col.fillna(0).astype("int64") if t == "int" else col.astype("float64")
+    return pd.DataFrame(out)
+
+
+def write_parquet(path, schema, frames):
+    arrow = pa.schema([(c, {"str": pa.string(), "float": pa.float64(), "int": pa.int64()}[t])
+                       for c, t in schema.items()])
+    with pq.ParquetWriter(path, arrow) as w:
+        for df in frames:
+            w.write_table(pa.Table.from_pandas(_typed(df, schema), schema=arrow, preserve_index=False))
+        # an empty history still gets a valid file with the schema
+
+
+def _write_gratitude(path, store):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(store.load_gratitude(), f, indent=2)
+
+
+# ---------- Cached export files ----------
+def export_file(store, kind: str, fmt: str = "csv") -> Path:
+    """Path of an up-to-date export (gratitude: json; journal/habits/nutrition: csv or parquet)."""
+    if fmt not in (("json",) if kind == "gratitude" else FORMATS):
+        raise ValueError(f"Can't export {kind} as {fmt}")
+    out_dir = Path(store.user_dir) / EXPORT_DIR
+    version = store.source_version(kind)
+    tag = hashlib.sha1(repr(version).encode()).hexdigest()[:12] if version is not None else None
+    with _LOCK:
+        out_dir.mkdir(parents=True, exist_ok=True)
+        target = out_dir / f"{kind}-{tag}.{fmt}"
+        if tag is not None and target.exists():
+            return target
+        tmp = out_dir / f".{kind}.{os.getpid()}.{threading.get_ident()}.{fmt}.tmp"
+        try:
+            if fmt == "json":
+                _write_gratitude(tmp, store)
+            elif fmt == "parquet":
+                write_parquet(tmp, SCHEMAS[kind], chunks(store, kind))
+            else:
+                with open(tmp, "w", newline="", encoding="utf-8") as f:
+                    write_csv(f, COLUMNS[kind], chunks(store, kind))
+            os.replace(tmp, target)
+        finally:
+            if tmp.exists():
+                tmp.unlink()
+        # older versions of the same export are stale now
+        for old in out_dir.glob(f"{kind}-*.{fmt}"):
+            if old != target:
+                old.unlink(missing_ok=True)
+        return target
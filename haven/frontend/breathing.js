@@ -0,0 +1,87 @@
+// breathing.js — Inhale / Hold / Exhale guide: animation and countdown run here, only completion is reported
+Haven.widgets.breathing = (() => {
+  let el = {}, cfg = {phases: [], cycles: 1}, run = null;
+
+  function render(label, left, frac, cycle) {
+    el.label.textContent = label;
+    el.count.textContent = left === null ? "" : left + "s";
+    const n = run ? run.cycles : cfg.cycles;
+    el.cycle.textContent = cycle ? `cycle ${cycle} of ${n}` : `${n} cycle${n > 1 ? "s" : ""}`;
+    el.fill.style.width = (frac * 100).toFixed(1) + "%";
+  }
+
+  function stop(message) {
+    if (run) cancelAnimationFrame(run.frame);
+    run = null;
+    el.start.disabled = false;
+    el.stop.disabled = true;
+    el.orb.style.transitionDuration = "1s";
+    el.orb.style.transform = "scale(.55)";
+    render(message || "Ready", null, 0, 0);
+  }
+
+  function enter(i) {
+    // phase i of the flattened sequence; the orb eases over the whole phase in one CSS transition
+    const [label, sec] = run.phases[i % run.phases.length];
+    run.phase = i;
+    run.phaseStart = performance.now();
+    el.orb.style.transitionDuration = sec + "s";
+    if (label === "Inhale") el.orb.style.transform = "scale(1)";
+    else if (label === "Exhale") el.orb.style.transform = "scale(.55)";
+  }
+
+  function tick(now) {
+    const total = run.phases.length * run.cycles;
+    let [label, sec] = run.phases[run.phase % run.phases.length];
+    let elapsed = (now - run.phaseStart) / 1000;
+    if (elapsed >= sec) {
+      if (run.phase + 1 >= total) {
+        const seconds = Math.round((now - run.started) / 1000);
+        const cycles = run.cycles;
+        stop("Nice work. Notice any shift?");
+        Haven.setValue({id: Haven.newId(), cycles: cycles, seconds: seconds});
+        return;
+      }
+      enter(run.phase + 1);
+      [label, sec] = run.phases[run.phase % run.phases.length];
+      elapsed = 0;
+    }
+    render(label, Math.max(1, Math.ceil(sec - elapsed)), Math.min(1, elapsed / sec),
+           Math.floor(run.phase / run.phases.length) + 1);
+    run.frame = requestAnimationFrame(tick);
+  }
+
+  function start() {
+    if (run || !cfg.phases.length) return;
+    // the session keeps its own copy: a Mode / Cycles change mid-session applies to the next one
+    run = {started: performance.now(), frame: 0, phases: cfg.phases, cycles: cfg.cycles};
+    el.start.disabled = true;
+    el.stop.disabled = false;
+    enter(0);
+    run.frame = requestAnimationFrame(tick);
+  }
+
+  return {
+    mount(root, args) {
+      root.innerHTML = `
+        <div class="card">
+          <div class="orb"></div>
+          <h3 class="label"></h3>
+          <div class="muted"><span class="count"></span> <span class="cycle"></span></div>
+          <div class="bar"><div></div></div>
+        </div>
+        <div class="row"><button class="start">Start</button><button class="stop" disabled>Stop</button></div>`;
+      el = {orb: root.querySelector(".orb"), label: root.querySelector(".label"), count: root.querySelector(".count"),
+            cycle: root.querySelector(".cycle"), fill: root.querySelector(".bar > div"),
+            start: root.querySelector(".start"), stop: root.querySelector(".stop")};
+      el.start.onclick = start;
+      el.stop.onclick = () => stop();
+      this.update(args);
+    },
+    update(args) {
+      // a new mode or cycle count applies to the next session; a running one finishes as started
+      cfg = {phases: args.phases || [], cycles: Math.max(1, args.cycles || 1)};
+      if (!run) render("Ready", null, 0, 0);
+    },
+  };
+})();
@@ -0,0 +1,45 @@
+// protocol.js — the Streamlit component protocol, by hand (no npm, no build step)
+//   iframe -> app: streamlit:componentReady, streamlit:setFrameHeight, streamlit:setComponentValue
+//   app -> iframe: streamlit:render {args, disabled, theme}
+const Haven = {
+  widgets: {},      // name -> {mount(root, args), update(args)}
+  current: null,
+
+  send(type, data) {
+    window.parent.postMessage(Object.assign({isStreamlitMessage: true, type: type}, data), "*");
+  },
+  setValue(value) {
+    this.send("streamlit:setComponentValue", {value: value, dataType: "json"});
+  },
+  resize() {
+    this.send("streamlit:setFrameHeight", {height: Math.ceil(document.documentElement.scrollHeight)});
+  },
+  newId() {
+    return Date.now().toString(36) + Math.random().toString(36).slice(2, 8);
+  },
+  applyPalette(p) {
+    const s = document.documentElement.style;
+    for (const [k, v] of Object.entries(p || {})) s.setProperty("--" + k.replace(/_/g, "-"), v);
+  },
+
+  onRender(args) {
+    this.applyPalette(args.palette);
+    const w = this.widgets[args.widget];
+    if (!w) return;
+    if (this.current !== w) {
+      this.current = w;
+      w.mount(document.getElementById("root"), args);
+    } else {
+      w.update(args);
+    }
+    this.resize();
+  },
+};
+
+window.addEventListener("message", (e) => {
+  if (e.data && e.data.type === "streamlit:render") Haven.onRender(e.data.args || {});
+});
+window.addEventListener("load", () => {
+  Haven.send("streamlit:componentReady", {apiVersion: 1});
+  new ResizeObserver(() => Haven.resize()).observe(document.body);
+});
@@ -0,0 +1,58 @@
+// reaction.js — Reaction Focus: random wait, GO and timing all happen here; only the result is reported
+Haven.widgets.reaction = (() => {
+  let el = {}, cfg = {}, state = "idle", timer = 0, goAt = 0;
+
+  function show(cls, title, hint) {
+    el.pad.className = "pad " + cls;
+    el.title.textContent = title;
+    el.hint.textContent = hint;
+  }
+
+  function arm() {
+    state = "wait";
+    show("wait", "Wait for GO…", "Don't tap yet");
+    const delay = cfg.min_ms + Math.random() * (cfg.max_ms - cfg.min_ms);
+    timer = setTimeout(() => requestAnimationFrame((t) => {
+      // GO is painted in this frame: time from the frame, not from the timeout
+      state = "go";
+      goAt = t;
+      show("go", "GO!", "Tap now");
+    }), delay);
+  }
+
+  function press(stamp) {
+    if (state === "idle" || state === "done") {
+      arm();
+    } else if (state === "wait") {
+      clearTimeout(timer);
+      state = "done";
+      show("early", "Too soon!", "Tap to try again");
+    } else if (state === "go") {
+      // event timestamps share performance.now()'s clock
+      const ms = Math.max(0, Math.round(stamp - goAt));
+      state = "done";
+      show("idle", ms + " ms", "Tap to play again");
+      Haven.setValue({id: Haven.newId(), ms: ms});
+    }
+  }
+
+  return {
+    mount(root, args) {
+      root.innerHTML = `
+        <div class="pad idle" tabindex="0">
+          <h3 class="title"></h3>
+          <div class="muted hint"></div>
+        </div>`;
+      el = {pad: root.querySelector(".pad"), title: root.querySelector(".title"), hint: root.querySelector(".hint")};
+      el.pad.addEventListener("pointerdown", (e) => { e.preventDefault(); press(e.timeStamp); });
+      el.pad.addEventListener("keydown", (e) => {
+        if ((e.key === " " || e.key === "Enter") && !e.repeat) { e.preventDefault(); press(e.timeStamp); }
+      });
+      this.update(args);
+      show("idle", "Start ▶️", "Tap (or press Space), then wait for GO");
+    },
+    update(args) {
+      cfg = {min_ms: args.min_ms || 1600, max_ms: args.max_ms || 3800};
+    },
+  };
+})();
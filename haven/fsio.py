@@ -0,0 +1,131 @@
+# haven/fsio.py — crash-safe file writes with a configurable fsync policy
+#
+# Every write goes to a temp file in the same folder and is renamed over the target, so a
+# crashed worker leaves either the old or the new file, never a truncated one.
+# HAVEN_FSYNC picks how hard we push the bytes to disk (power-loss durability):
+#   always     fsync each file (and its folder) before the write returns
+#   per-rerun  collect touched files and fsync them together in commit() once per rerun (default)
+#   interval   a background thread runs commit() every HAVEN_FSYNC_INTERVAL seconds (default 2)
+import os, time, threading
+from pathlib import Path
+
+FSYNC_POLICIES = ("always", "per-rerun", "interval")
+
+
+def _fsync_path(path, directory=False):
+    flags = os.O_RDONLY | (getattr(os, "O_DIRECTORY", 0) if directory else 0)
+    try:
+        fd = os.open(path, flags)
+    except OSError:
+        return  # gone already, or directories can't be opened on this OS
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class DurableWriter:
+    def __init__(self, policy: str = "per-rerun", interval: float = 2.0):
+        if policy not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown HAVEN_FSYNC policy: {policy!r} (use one of {FSYNC_POLICIES})")
+        self.policy = policy
+        self.interval = interval
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._listeners = []
+        self.commits = 0
+
+    def subscribe(self, fn):
+        """fn(path) is called after every write (used for cache invalidation)."""
+        self._listeners.append(fn)
+
+    # ----- writes -----
+    def write_bytes(self, path, data: bytes):
+        path = Path(path)
+        tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            with open(tmp, "wb") as f:
+                f.write(data)
+                f.flush()
+                if self.policy == "always":
+                    os.fsync(f.fileno())
+            os.replace(tmp, path)
+        except BaseException:
+            try: tmp.unlink()
+            except OSError: pass
+            raise
+        self.track(path)
+
+    def write_text(self, path, text: str):
+        self.write_bytes(path, text.encode("utf-8"))
+
+    def append_bytes(self, path, data: bytes):
+        """Append in a single O_APPEND write (no truncation; concurrent appends don't interleave)."""
+        path = Path(path)
+        fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, data)
+            self.track(path, fd)
+        finally:
+            os.close(fd)
+
+    def track(self, path, fd: int = None):
+        """Register a file written outside write_bytes/append_bytes (pass its open fd if any)."""
+        path = Path(path)
+        for fn in self._listeners:
+            fn(path)
+        if self.policy == "always":
+            if fd is not None:
+                os.fsync(fd)
+            _fsync_path(path.parent, directory=True)
+            return
+        with self._lock:
+            self._pending.add(path)
+        if self.policy == "interval":
+            self._ensure_thread()
+
+    # ----- durable commit -----
+    def commit(self) -> int:
+        """fsync every file written since the last commit, then each folder once."""
+        with self._lock:
+            paths, self._pending = self._pending, set()
+        if not paths:
+            return 0
+        for p in paths:
+            _fsync_path(p)
+        for d in {p.parent for p in paths}:
+            _fsync_path(d, directory=True)
+        self.commits += 1
+        return len(paths)
+
+    def end_run(self):
+        """Rerun boundary hook; only the per-rerun policy commits here."""
+        if self.policy == "per-rerun":
+            self.commit()
+
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def _ensure_thread(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name="haven-fsync", daemon=True)
+                self._thread.start()
+
+    def _loop(self):
+        while True:
+            time.sleep(self.interval)
+            try: self.commit()
+            except Exception: pass
+
+
+# process-wide writer used by the storage layer and the app
+WRITER = DurableWriter(
+    os.getenv("HAVEN_FSYNC", "per-rerun").strip().lower(),
+    float(os.getenv("HAVEN_FSYNC_INTERVAL", "2") or 2),
+)
@@ -0,0 +1,141 @@
+# haven/games.py — compact game statistics with running aggregates
+#
+# Reaction Focus keeps count / sum / best / worst up to date on every play, plus a log-bucketed quantile
+# sketch (each bucket spans ALPHA relative error, counts simply add up, so sketches merge) for the
+# p50 / p90 line; no raw times are kept.
+# Recording a play and rendering the stats cost the same after 10 plays or 10,000.
+# The "games" doc (Store.save_doc) looks like:
+#   version, reaction: {count, sum, best, worst, sketch: {zero, bins {index: n}}},
+#   eo_best, emotion_sort_best, stroop_best
+# Older docs (reaction as a JSON list or with a raw "recent" history, affirmations inline) are
+# converted by from_doc(); saved affirmations now live in their own doc, so a game score never
+# rewrites them.
+import math
+
+VERSION = 2
+ALPHA = 0.02          # relative accuracy of the quantiles
+BESTS = ("eo_best", "emotion_sort_best", "stroop_best")
+
+
+class QuantileSketch:
+    def __init__(self, alpha: float = ALPHA):
+        self.alpha = alpha
+        self._gamma = (1 + alpha) / (1 - alpha)
+        self._log_gamma = math.log(self._gamma)
+        self.zero = 0         # values <= 0
+        self.bins = {}        # bucket index -> count
+        self.count = 0
+
+    def add(self, x: float, n: int = 1):
+        if x <= 0:
+            self.zero += n
+        else:
+            i = math.ceil(math.log(x) / self._log_gamma)
+            self.bins[i] = self.bins.get(i, 0) + n
+        self.count += n
+
+    def merge(self, other: "QuantileSketch"):
+        """Add another sketch's counts (same alpha): bucket-wise sums, e.g. two devices' histories."""
+        if other.alpha != self.alpha:
+            raise ValueError("sketches with different alpha don't merge")
+        self.zero += other.zero
+        for i, n in other.bins.items():
+            self.bins[i] = self.bins.get(i, 0) + n
+        self.count += other.count
+
+    def quantile(self, q: float):
+        """Estimate of the q-quantile (0..1), within ALPHA relative error; None if empty."""
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zero
+        if seen > rank:
+            return 0.0
+        for i in sorted(self.bins):
+            seen += self.bins[i]
+            if seen > rank:
+                return 2 * self._gamma ** i / (self._gamma + 1)
+        return 2 * self._gamma ** max(self.bins) / (self._gamma + 1)
+
+    def to_doc(self) -> dict:
+        return {"alpha": self.alpha, "zero": self.zero, "bins": {str(i): n for i, n in self.bins.items()}}
+
+    @classmethod
+    def from_doc(cls, doc: dict) -> "QuantileSketch":
+        sk = cls(doc.get("alpha", ALPHA))
+        sk.zero = int(doc.get("zero", 0))
+        sk.bins = {int(i): int(n) for i, n in doc.get("bins", {}).items()}
+        sk.count = sk.zero + sum(sk.bins.values())
+        return sk
+
+
+class ReactionStats:
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.best = self.worst = None
+        self.sketch = QuantileSketch()
+
+    def add(self, ms: int):
+        ms = max(int(ms), 0)
+        self.count += 1
+        self.total += ms
+        self.best = ms if self.best is None else min(self.best, ms)
+        self.worst = ms if self.worst is None else max(self.worst, ms)
+        self.sketch.add(ms)
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+    def quantile(self, q: float):
+        est = self.sketch.quantile(q)
+        return None if est is None else min(max(est, self.best), self.worst)   # exact at the ends
+
+    def to_doc(self) -> dict:
+        return {"count": self.count, "sum": self.total, "best": self.best, "worst": self.worst,
+                "sketch": self.sketch.to_doc()}
+
+    @classmethod
+    def from_doc(cls, doc) -> "ReactionStats":
+        r = cls()
+        if isinstance(doc, list):  # version 1: every play as a JSON list
+            for ms in doc:
+                try:
+                    r.add(ms)
+                except (TypeError, ValueError):
+                    pass
+            return r
+        doc = doc or {}
+        r.count, r.total = int(doc.get("count", 0)), int(doc.get("sum", 0))
+        r.best, r.worst = doc.get("best"), doc.get("worst")
+        r.sketch = QuantileSketch.from_doc(doc.get("sketch", {}))  # a stored "recent" history is dropped
+        return r
+
+
+class GameStats:
+    def __init__(self):
+        self.reaction = ReactionStats()
+        self.bests = {k: 0 for k in BESTS}
+
+    def record_best(self, name: str, score: int) -> bool:
+        """Keep `score` if it beats the stored best; True when it did (i.e. there is something to save)."""
+        if score <= self.bests.get(name, 0):
+            return False
+        self.bests[name] = int(score)
+        return True
+
+    def to_doc(self) -> dict:
+        return {"version": VERSION, "reaction": self.reaction.to_doc(), **self.bests}
+
+    @classmethod
+    def from_doc(cls, doc: dict) -> "GameStats":
+        g = cls()
+        doc = doc or {}
+        g.reaction = ReactionStats.from_doc(doc.get("reaction", []))
+        for k in BESTS:
+            try:
+                g.bests[k] = int(doc.get(k, 0) or 0)
+            except (TypeError, ValueError):
+                pass
+        return g
@@ -0,0 +1,98 @@
+# haven/habits.py — in-memory habit log keyed by (date, habit)
+#
+# Each habit name gets a bit; every day holds two ints: `tracked` (a row exists for that habit) and
+# `done`. Looking up, ticking or clearing a day is a dict lookup plus bit operations, independent of
+# how many days of history there are, and a batch of changes goes to the Store in one set_habits call.
+# Deleted names keep their (cleared) bit so the other habits' bits never move.
+import pandas as pd
+from haven.storage import HABIT_COLS
+
+
+class HabitLog:
+    def __init__(self):
+        self._bit = {}        # habit -> bit position
+        self._order = []      # habit names by bit (None once deleted)
+        self._tracked = {}    # date -> bitmask of habits with a row that day
+        self._done = {}       # date -> bitmask of habits done that day
+        self._rows = 0
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "HabitLog":
+        log = cls()
+        if df is None or df.empty:
+            return log
+        d = df.reindex(columns=HABIT_COLS).dropna(subset=["Date", "Habit"])
+        done = pd.to_numeric(d["Done"], errors="coerce").fillna(0).astype(int).clip(0, 1)
+        # duplicate legacy rows collapse to one (done if any of them was)
+        grouped = done.groupby([d["Date"].astype(str), d["Habit"].astype(str)]).max()
+        for (date, habit), x in grouped.items():
+            b = 1 << log._slot(habit)
+            log._tracked[date] = log._tracked.get(date, 0) | b
+            if x:
+                log._done[date] = log._done.get(date, 0) | b
+        log._rows = len(grouped)
+        return log
+
+    def _slot(self, habit: str) -> int:
+        i = self._bit.get(habit)
+        if i is None:
+            i = self._bit[habit] = len(self._order)
+            self._order.append(habit)
+        return i
+
+    def _names(self, mask: int) -> list:
+        return [h for i, h in enumerate(self._order) if h is not None and mask >> i & 1]
+
+    # ----- reads -----
+    def __len__(self):
+        """Stored (date, habit) rows."""
+        return self._rows
+
+    def names(self) -> list:
+        return sorted(h for h in self._order if h is not None)
+
+    def done_on(self, date: str) -> set:
+        return set(self._names(self._done.get(date, 0)))
+
+    # ----- writes (the caller persists the same change through the Store) -----
+    def set(self, date: str, updates: dict) -> dict:
+        """Apply {habit: 0/1} for one day; returns only the entries that actually changed."""
+        tracked, done = self._tracked.get(date, 0), self._done.get(date, 0)
+        changed = {}
+        for h, v in updates.items():
+            b = 1 << self._slot(h)
+            v = 1 if v else 0
+            if not tracked & b:
+                tracked |= b
+                self._rows += 1
+            elif bool(done & b) == bool(v):
+                continue
+            done = done | b if v else done & ~b
+            changed[h] = v
+        self._tracked[date], self._done[date] = tracked, done
+        return changed
+
+    def add(self, date: str, habit: str) -> bool:
+        """Track `habit` on `date` (not done). False if it already had a row."""
+        b = 1 << self._slot(habit)
+        if self._tracked.get(date, 0) & b:
+            return False
+        self._tracked[date] = self._tracked.get(date, 0) | b
+        self._rows += 1
+        return True
+
+    def remove(self, habit: str):
+        """Forget every row of `habit`."""
+        i = self._bit.pop(habit, None)
+        if i is None:
+            return
+        self._order[i] = None
+        keep = ~(1 << i)
+        for d in list(self._tracked):
+            if self._tracked[d] >> i & 1:
+                self._rows -= 1
+            self._tracked[d] &= keep
+            self._done[d] = self._done.get(d, 0) & keep
+            if not self._tracked[d]:
+                del self._tracked[d]
+                self._done.pop(d, None)
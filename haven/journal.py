@@ -0,0 +1,53 @@
+# haven/journal.py — append-optimized journal for a session
+#
+# New entries go into a plain list (O(1) per save) instead of `pd.concat`-ing a one-row frame onto
+# the whole history. The full DataFrame is only built when a page actually needs it (search) and
+# then reused until the next append; tail(n) for the cards never builds it at all.
+# frame() hands out the shared frame without copying: treat it as read-only.
+import pandas as pd
+from haven.storage import JOURNAL_COLS
+
+
+def _normalize(df: pd.DataFrame) -> pd.DataFrame:
+    for col in JOURNAL_COLS:
+        if col not in df.columns:
+            df[col] = None if col == "mood_1to5" else ""
+    df["mood_1to5"] = pd.to_numeric(df["mood_1to5"], errors="coerce")
+    return df
+
+
+class Journal:
+    def __init__(self, df: pd.DataFrame = None):
+        self._base = _normalize(df if df is not None else pd.DataFrame(columns=JOURNAL_COLS))
+        self._pending = []  # rows appended since _base was last materialized
+
+    def __len__(self):
+        return len(self._base) + len(self._pending)
+
+    @property
+    def empty(self) -> bool:
+        return len(self) == 0
+
+    def append(self, row: dict):
+        self._pending.append(dict(row))
+
+    def frame(self) -> pd.DataFrame:
+        """Every entry as one DataFrame (built at most once per batch of appends; read-only)."""
+        if self._pending:
+            new = _normalize(pd.DataFrame(self._pending))
+            self._base = pd.concat([self._base, new], ignore_index=True) if len(self._base) else new
+            self._pending = []
+        return self._base
+
+    def tail(self, n: int) -> pd.DataFrame:
+        """Last n entries without materializing the whole journal."""
+        if n <= 0:
+            return self._base.iloc[0:0]
+        recent = self._pending[-n:]
+        need = n - len(recent)
+        parts = [self._base.iloc[-need:]] if need > 0 and len(self._base) else []
+        if recent:
+            parts.append(_normalize(pd.DataFrame(recent)))
+        if not parts:
+            return self._base.iloc[0:0]
+        return parts[0] if len(parts) == 1 else pd.concat(parts, ignore_index=True)
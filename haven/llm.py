@@ -0,0 +1,231 @@
+# haven/llm.py — shared Gemini client: one model instance, bounded worker pool, deadlines, dedup
+#
+# Script threads never call the API directly: calls run on a small pool (HAVEN_LLM_WORKERS),
+# the caller waits at most HAVEN_LLM_TIMEOUT seconds, and identical prompts that are already
+# in flight share one upstream request. Callers keep their own try/except fallback text.
+# stream() yields reply text chunk by chunk for incremental rendering (Chat).
+# Each upstream attempt first takes quota from the shared rate limiter; 429/5xx are retried with
+# jittered backoff while the caller's deadline allows.
+# HAVEN_FAKE_LLM=1 swaps Gemini for FakeModel (offline demos / tests).
+import os, json, time, queue, hashlib, threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from haven.ratelimit import get_limiter, is_retryable, backoff
+
+
+class LLMBusy(RuntimeError):
+    """Raised when the pool's queue is full; callers should fall back immediately."""
+
+
+def response_text(r) -> str:
+    # .text raises when the candidate was blocked/empty — treat that as no text
+    try:
+        return (getattr(r, "text", "") or "").strip()
+    except Exception:
+        return ""
+
+
+def chunk_text(c) -> str:
+    # like response_text but unstripped: spaces at chunk edges matter when streaming
+    try:
+        return getattr(c, "text", "") or ""
+    except Exception:
+        return ""
+
+
+class _FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeModel:
+    """Stand-in for genai.GenerativeModel: canned replies, optional word-by-word streaming."""
+    def __init__(self, model_name="fake", reply=None, delay: float = 0.03):
+        self.model_name = model_name
+        self.reply = reply or ("That sounds like a lot to carry. It makes sense to feel this way. "
+                               "Would a slow breath in for 4 and out for 8 help right now?")
+        self.delay = delay
+
+    def generate_content(self, prompt, generation_config=None, stream=False, request_options=None, **_):
+        if not stream:
+            return _FakeResponse(self.reply)
+        def chunks():
+            for w in self.reply.split(" "):
+                time.sleep(self.delay)
+                yield _FakeResponse(w + " ")
+        return chunks()
+
+
+class LLMClient:
+    def __init__(self, model_name: str, workers: int = 4, timeout: float = 20.0,
+                 max_queue: int = 32, model_factory=None, limiter=None, retries: int = 2):
+        self.model_name = model_name
+        self.timeout = timeout
+        self.max_queue = max_queue
+        self.limiter = limiter
+        self.retries = retries
+        self._factory = model_factory
+        self._model = None
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="haven-llm")
+        self._inflight = {}
+        self._streams = 0
+        self._lock = threading.Lock()
+        self.stats = {"calls": 0, "deduped": 0, "retried": 0, "timeouts": 0, "errors": 0,
+                      "rejected": 0, "fallbacks": 0}
+
+    @property
+    def model(self):
+        # one GenerativeModel per process instead of one per click
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    if self._factory is not None:
+                        self._model = self._factory(self.model_name)
+                    else:
+                        import google.generativeai as genai
+                        self._model = genai.GenerativeModel(self.model_name)
+        return self._model
+
+    @staticmethod
+    def key(prompt: str, generation_config=None) -> str:
+        raw = json.dumps([prompt, generation_config or {}], sort_keys=True, default=str)
+        return hashlib.sha1(raw.encode()).hexdigest()
+
+    @staticmethod
+    def estimate_tokens(prompt: str, generation_config=None) -> int:
+        # ~4 chars per token for the prompt + the reply budget
+        return len(prompt) // 4 + int((generation_config or {}).get("max_output_tokens", 256))
+
+    def _open(self, prompt, generation_config, deadline, stream=False):
+        """One generate_content call behind the limiter, retrying 429/5xx until the deadline."""
+        attempt = 0
+        while True:
+            left = deadline - time.monotonic()
+            if left <= 0:
+                raise TimeoutError("LLM deadline passed")
+            if self.limiter is not None:
+                self.limiter.acquire(self.model_name, self.estimate_tokens(prompt, generation_config),
+                                     max_wait=min(self.limiter.max_wait, left))
+            try:
+                # retry=None: the library's own retry policy would ignore our deadline
+                return self.model.generate_content(
+                    prompt, generation_config=generation_config, stream=stream,
+                    request_options={"timeout": max(1.0, deadline - time.monotonic()), "retry": None},
+                )
+            except Exception as e:
+                delay = backoff(attempt)
+                if attempt >= self.retries or not is_retryable(e) or time.monotonic() + delay >= deadline:
+                    raise
+                self._bump("retried")
+                attempt += 1
+                time.sleep(delay)
+
+    def _call(self, prompt, generation_config, deadline):
+        return response_text(self._open(prompt, generation_config, deadline))
+
+    def _bump(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def submit(self, prompt: str, generation_config=None):
+        """Future for the reply text; joins an identical request that is already running."""
+        k = self.key(prompt, generation_config)
+        with self._lock:
+            fut = self._inflight.get(k)
+            if fut is not None:
+                self.stats["deduped"] += 1
+                return fut
+            if len(self._inflight) + self._streams >= self.max_queue:
+                self.stats["rejected"] += 1
+                raise LLMBusy("LLM queue is full")
+            self.stats["calls"] += 1
+            fut = self._pool.submit(self._call, prompt, generation_config, time.monotonic() + self.timeout)
+            self._inflight[k] = fut
+        fut.add_done_callback(lambda _f, k=k: self._forget(k, _f))
+        return fut
+
+    def _forget(self, k, fut):
+        with self._lock:
+            if self._inflight.get(k) is fut:
+                del self._inflight[k]
+
+    def generate(self, prompt: str, generation_config=None, timeout: float = None) -> str:
+        """Reply text; raises TimeoutError past the deadline and re-raises upstream errors.
+        Every raise means the caller shows its fallback, so it is counted as one."""
+        try:
+            fut = self.submit(prompt, generation_config)
+            try:
+                return fut.result(timeout=self.timeout if timeout is None else timeout)
+            except FutureTimeout:
+                self._bump("timeouts")
+                raise TimeoutError(f"LLM call exceeded {timeout or self.timeout}s") from None
+            except Exception:
+                self._bump("errors")
+                raise
+        except Exception:
+            self._bump("fallbacks")
+            raise
+
+    def stream(self, prompt: str, generation_config=None, timeout: float = None):
+        """Yield reply text chunks as they arrive; the whole reply must finish within the deadline."""
+        q, done = queue.Queue(), object()
+        limit = self.timeout if timeout is None else timeout
+        deadline = time.monotonic() + limit
+
+        def pump():
+            try:
+                # retries only happen before the first chunk (the call itself fails on 429)
+                r = self._open(prompt, generation_config, deadline, stream=True)
+                for c in r:
+                    t = chunk_text(c)
+                    if t:
+                        q.put(t)
+            except Exception as e:
+                q.put(e)
+            finally:
+                q.put(done)
+                with self._lock:
+                    self._streams -= 1
+
+        with self._lock:
+            if len(self._inflight) + self._streams >= self.max_queue:
+                self.stats["rejected"] += 1
+                self.stats["fallbacks"] += 1
+                raise LLMBusy("LLM queue is full")
+            self.stats["calls"] += 1
+            self._streams += 1
+        self._pool.submit(pump)
+
+        while True:
+            try:
+                item = q.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                self._bump("timeouts")
+                self._bump("fallbacks")
+                raise TimeoutError(f"LLM stream exceeded {limit}s") from None
+            if item is done:
+                return
+            if isinstance(item, Exception):
+                self._bump("errors")
+                self._bump("fallbacks")
+                raise item
+            yield item
+
+
+_CLIENTS = {}
+_CLIENTS_LOCK = threading.Lock()
+
+def get_client(model_name: str) -> LLMClient:
+    """Process-wide client per model (shared by every session)."""
+    with _CLIENTS_LOCK:
+        c = _CLIENTS.get(model_name)
+        if c is None:
+            c = LLMClient(
+                model_name,
+                workers=int(os.getenv("HAVEN_LLM_WORKERS", "4") or 4),
+                timeout=float(os.getenv("HAVEN_LLM_TIMEOUT", "20") or 20),
+                model_factory=FakeModel if os.getenv("HAVEN_FAKE_LLM") else None,
+                limiter=get_limiter(),
+                retries=int(os.getenv("HAVEN_LLM_RETRIES", "2") or 0),
+            )
+            _CLIENTS[model_name] = c
+        return c
@@ -0,0 +1,132 @@
+# haven/ratelimit.py — token buckets for the Gemini quota (requests/min + tokens/min per model)
+#
+# Buckets live in this process by default. Set HAVEN_RATELIMIT_DB=path/to/file.db to share them
+# between worker processes (state kept in SQLite, updated in BEGIN IMMEDIATE transactions).
+import os, time, random, sqlite3, threading
+
+
+class RateLimited(RuntimeError):
+    """Quota would not free up within the allowed wait."""
+
+
+class MemoryBuckets:
+    def __init__(self):
+        self._state = {}  # key -> (tokens, updated_at)
+        self._lock = threading.Lock()
+
+    def try_take(self, wants):
+        """wants: [(key, n, capacity, per_sec)]. Take all or nothing; return seconds to wait (0 = taken)."""
+        with self._lock:
+            now = time.monotonic()
+            levels, wait = [], 0.0
+            for key, n, cap, rate in wants:
+                tokens, ts = self._state.get(key, (cap, now))
+                tokens = min(cap, tokens + (now - ts) * rate)
+                levels.append(tokens)
+                if tokens < n:
+                    wait = max(wait, (n - tokens) / rate)
+            for (key, n, cap, rate), tokens in zip(wants, levels):
+                self._state[key] = (tokens - n if not wait else tokens, now)
+            return wait
+
+
+class SQLiteBuckets:
+    def __init__(self, path):
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=5)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS buckets(key TEXT PRIMARY KEY, tokens REAL, ts REAL)")
+        self._lock = threading.Lock()
+
+    def try_take(self, wants):
+        with self._lock:
+            c = self.conn
+            c.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()  # wall clock: shared between processes
+                levels, wait = [], 0.0
+                for key, n, cap, rate in wants:
+                    row = c.execute("SELECT tokens, ts FROM buckets WHERE key=?", (key,)).fetchone()
+                    tokens, ts = row if row else (cap, now)
+                    tokens = min(cap, tokens + max(0.0, now - ts) * rate)
+                    levels.append(tokens)
+                    if tokens < n:
+                        wait = max(wait, (n - tokens) / rate)
+                for (key, n, cap, rate), tokens in zip(wants, levels):
+                    c.execute("INSERT INTO buckets(key, tokens, ts) VALUES(?, ?, ?) "
+                              "ON CONFLICT(key) DO UPDATE SET tokens=excluded.tokens, ts=excluded.ts",
+                              (key, tokens - n if not wait else tokens, now))
+                c.execute("COMMIT")
+            except BaseException:
+                c.execute("ROLLBACK")
+                raise
+            return wait
+
+
+class RateLimiter:
+    """Per-model RPM + TPM limiter with a bounded wait queue and counters."""
+
+    def __init__(self, rpm: float, tpm: float, max_wait: float = 8.0, buckets=None):
+        self.rpm, self.tpm, self.max_wait = rpm, tpm, max_wait
+        self.buckets = buckets or MemoryBuckets()
+        self.stats = {"granted": 0, "throttled": 0, "rejected": 0}
+        self._lock = threading.Lock()
+
+    def _bump(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def acquire(self, model: str, tokens: int, max_wait: float = None):
+        """Block until one request + `tokens` fit the quota, or raise RateLimited."""
+        if self.rpm <= 0:  # HAVEN_LLM_RPM=0 disables limiting
+            return
+        wants = [(f"{model}:rpm", 1, self.rpm, self.rpm / 60.0)]
+        if self.tpm > 0:
+            n = min(tokens, self.tpm)  # one huge prompt must still be able to go
+            wants.append((f"{model}:tpm", n, self.tpm, self.tpm / 60.0))
+        limit = self.max_wait if max_wait is None else max_wait
+        deadline = time.monotonic() + limit
+        waited = False
+        while True:
+            wait = self.buckets.try_take(wants)
+            if not wait:
+                self._bump("granted")
+                if waited:
+                    self._bump("throttled")
+                return
+            if time.monotonic() + wait > deadline:
+                self._bump("rejected")
+                raise RateLimited(f"{model}: quota busy for {wait:.1f}s (max wait {limit:.1f}s)")
+            waited = True
+            time.sleep(wait + random.uniform(0, 0.05))  # small jitter so waiters don't stampede
+
+
+# ---------- retry policy ----------
+RETRY_CODES = (429, 500, 502, 503, 504)
+
+def is_retryable(e: Exception) -> bool:
+    """429 / 5xx from google.api_core exceptions (they carry .code) or HTTP-ish messages."""
+    code = getattr(e, "code", None)
+    if isinstance(code, int):
+        return code in RETRY_CODES
+    return str(e)[:3] in {str(c) for c in RETRY_CODES}
+
+def backoff(attempt: int, base: float = 0.5, cap: float = 8.0) -> float:
+    """Full-jitter exponential backoff."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+_LIMITER = None
+_LIMITER_LOCK = threading.Lock()
+
+def get_limiter() -> RateLimiter:
+    global _LIMITER
+    with _LIMITER_LOCK:
+        if _LIMITER is None:
+            db = os.getenv("HAVEN_RATELIMIT_DB", "").strip()
+            _LIMITER = RateLimiter(
+                rpm=float(os.getenv("HAVEN_LLM_RPM", "15") or 15),
+                tpm=float(os.getenv("HAVEN_LLM_TPM", "250000") or 0),
+                max_wait=float(os.getenv("HAVEN_LLM_MAX_WAIT", "8") or 8),
+                buckets=SQLiteBuckets(db) if db else None,
+            )
+        return _LIMITER
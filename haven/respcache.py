@@ -0,0 +1,171 @@
+# haven/respcache.py — persistent cache of Gemini replies for repeatable prompts (CBT, affirmations)
+#
+# Keys are hashes, never the raw text:
+#   exact_key("affirm", trait=..., focus=..., tone=...)   selectbox-only prompts
+#   text_key("cbt", thought, evidence, alt, user=uid)      free text, normalized (case, spacing, punctuation)
+# Replies to typed text echo the user's own words, so they are keyed and stored per user (`owner`)
+# and forget(owner) removes them with the rest of that user's data.
+# Up to `variants` different replies are kept per key: while a key has fewer, callers get a miss and
+# generate a fresh one; once it is full, a random variant is served without touching the API.
+# Entries expire after `ttl` seconds; the least recently served go first when the entry or byte cap
+# is exceeded. State lives in one SQLite file shared by every session and process.
+import os, re, time, json, random, sqlite3, hashlib, threading, unicodedata
+
+
+def normalize(text: str) -> str:
+    t = unicodedata.normalize("NFKC", text or "").casefold()
+    t = re.sub(r"[^\w\s']+", " ", t)
+    return " ".join(t.split())
+
+
+def exact_key(kind: str, **fields) -> str:
+    raw = json.dumps([kind, fields], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def text_key(kind: str, *texts, user: str) -> str:
+    return exact_key(kind, user=user, text=[normalize(t) for t in texts])
+
+
+class ResponseCache:
+    def __init__(self, path, ttl: float = 30 * 86400, variants: int = 3,
+                 max_entries: int = 5000, max_bytes: int = 8 * 1024 * 1024):
+        self.path = str(path)
+        self.ttl, self.variants = ttl, max(1, variants)
+        self.max_entries, self.max_bytes = max_entries, max_bytes
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "stored": 0, "evicted": 0}
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=5)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")  # a lost reply is just a future miss
+        self.conn.execute("PRAGMA secure_delete=ON")     # forgotten replies don't linger in free pages
+        self.conn.execute("""CREATE TABLE IF NOT EXISTS responses(
+            key TEXT, variant TEXT, text TEXT, size INTEGER, created REAL, used REAL, owner TEXT NOT NULL DEFAULT '',
+            PRIMARY KEY(key, variant))""")
+        cols = [r[1] for r in self.conn.execute("PRAGMA table_info(responses)")]
+        if "owner" not in cols:
+            # older file: replies to typed text can't be traced back to a user, so drop them all
+            self.conn.execute("DELETE FROM responses")
+            self.conn.execute("ALTER TABLE responses ADD COLUMN owner TEXT NOT NULL DEFAULT ''")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS responses_used ON responses(used)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS responses_owner ON responses(owner)")
+
+    def _bump(self, name, n=1):
+        self.stats[name] += n
+
+    def get(self, key: str):
+        """A cached reply, or None while the key is missing, expired or still collecting variants."""
+        now = time.time()
+        with self._lock:
+            rows = self.conn.execute("SELECT variant, text FROM responses WHERE key=? AND created>?",
+                                     (key, now - self.ttl)).fetchall()
+            if len(rows) < self.variants:
+                self._bump("misses")
+                return None
+            variant, text = random.choice(rows)
+            self.conn.execute("UPDATE responses SET used=? WHERE key=? AND variant=?", (now, key, variant))
+            self._bump("hits")
+            return text
+
+    def put(self, key: str, text: str, owner: str = ""):
+        text = (text or "").strip()
+        if not text:
+            return
+        now = time.time()
+        variant = hashlib.sha1(normalize(text).encode("utf-8")).hexdigest()[:16]  # same reply twice = one variant
+        size = len(text.encode("utf-8"))
+        with self._lock:
+            c = self.conn
+            c.execute("BEGIN IMMEDIATE")
+            try:
+                c.execute("DELETE FROM responses WHERE key=? AND created<=?", (key, now - self.ttl))
+                c.execute("INSERT OR REPLACE INTO responses VALUES(?, ?, ?, ?, ?, ?, ?)",
+                          (key, variant, text, size, now, now, owner))
+                # keep only the newest `variants` per key
+                c.execute("""DELETE FROM responses WHERE key=? AND variant NOT IN (
+                    SELECT variant FROM responses WHERE key=? ORDER BY created DESC LIMIT ?)""",
+                          (key, key, self.variants))
+                self._evict(now)
+                c.execute("COMMIT")
+            except BaseException:
+                c.execute("ROLLBACK")
+                raise
+            self._bump("stored")
+
+    def _evict(self, now):
+        c = self.conn
+        gone = c.execute("DELETE FROM responses WHERE created<=?", (now - self.ttl,)).rowcount
+        n, total = c.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        if n > self.max_entries or total > self.max_bytes:
+            drop, freed = 0, 0
+            for (sz,) in c.execute("SELECT size FROM responses ORDER BY used").fetchall():
+                if n - drop <= self.max_entries and total - freed <= self.max_bytes:
+                    break
+                drop, freed = drop + 1, freed + sz
+            gone += c.execute("DELETE FROM responses WHERE rowid IN "
+                              "(SELECT rowid FROM responses ORDER BY used LIMIT ?)", (drop,)).rowcount
+        if gone:
+            self._bump("evicted", gone)
+
+    def generate(self, client, key: str, prompt: str, generation_config=None, owner: str = "") -> str:
+        """client.generate() behind the cache; errors propagate so callers keep their fallback.
+        owner: the user whose typed text the prompt contains ("" for shared, selectbox-only prompts)."""
+        hit = self.get(key)
+        if hit is not None:
+            return hit
+        text = client.generate(prompt, generation_config=generation_config)
+        self.put(key, text, owner)
+        return text
+
+    def forget(self, owner: str) -> int:
+        """Drop every reply stored for `owner` (profile deletion). Returns rows removed."""
+        if not owner:
+            return 0
+        with self._lock:
+            return self.conn.execute("DELETE FROM responses WHERE owner=?", (owner,)).rowcount
+
+    def clear(self):
+        with self._lock:
+            self.conn.execute("DELETE FROM responses")
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+
+class _NoCache:
+    """HAVEN_RESPONSE_CACHE=off: same interface, always a miss."""
+    stats = {}
+    def get(self, key): return None
+    def put(self, key, text, owner=""): pass
+    def generate(self, client, key, prompt, generation_config=None, owner=""):
+        return client.generate(prompt, generation_config=generation_config)
+    def forget(self, owner): return 0
+    def clear(self): pass
+    def close(self): pass
+
+
+_CACHE = None
+_CACHE_LOCK = threading.Lock()
+
+def get_response_cache():
+    """Process-wide response cache configured from the environment."""
+    global _CACHE
+    with _CACHE_LOCK:
+        if _CACHE is None:
+            path = os.getenv("HAVEN_RESPONSE_CACHE", os.path.join("data", "llm_responses.db")).strip()
+            if path.lower() in ("", "0", "off"):
+                _CACHE = _NoCache()
+            else:
+                try:
+                    _CACHE = ResponseCache(
+                        path,
+                        ttl=float(os.getenv("HAVEN_RESPONSE_TTL_DAYS", "30") or 30) * 86400,
+                        variants=int(os.getenv("HAVEN_RESPONSE_VARIANTS", "3") or 3),
+                        max_entries=int(os.getenv("HAVEN_RESPONSE_MAX", "5000") or 5000),
+                        max_bytes=int(float(os.getenv("HAVEN_RESPONSE_MB", "8") or 8) * 1024 * 1024),
+                    )
+                except sqlite3.Error:
+                    _CACHE = _NoCache()  # read-only disk etc.: run uncached
+        return _CACHE
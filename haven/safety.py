@@ -0,0 +1,230 @@
+# haven/safety.py — precompiled crisis / stress / tone classifier
+#
+# The lexicon is compiled into two regexes: literal phrases are folded into a prefix trie (so the
+# engine branches on characters instead of trying each word) and `re:` entries are kept as raw patterns.
+# classify() scans the lower-cased text once per regex and returns all three signals plus the spans.
+#   crisis terms  whole words/phrases (word boundaries, any run of spaces between words), scanned on
+#                 their own so no other term can consume their text and hide them
+#   other terms   substrings, like the original `w in text` checks ("stress" also hits "stressed"),
+#                 matched as zero-width lookaheads so overlapping terms don't hide each other either;
+#                 the trie reports the longest phrase at a position, so every shorter term along
+#                 its path ("sad" inside "sadness") is reported too
+# Bigger lexicons: HAVEN_LEXICON=path/to/lexicon.json ({"crisis": [...], "stress": [...],
+# "positive": [...], "negative": [...]}), merged into the built-in lists.
+import os, re, sys, json, time, random
+from typing import NamedTuple
+
+CATEGORIES = ("crisis", "stress", "positive", "negative")
+
+DEFAULT_LEXICON = {
+    "crisis": ["i want to die", "suicide", "kill myself", r"re:self[- ]harm", "ending it all", "no reason to live"],
+    "stress": ["stress", "anxiety", "overwhelmed", "panic", "sad", "lonely", "depressed", "tired"],
+    "positive": ["grateful", "hopeful", "better", "calm", "good", "proud", "glad", "relieved"],
+    "negative": ["anxious", "panic", "sad", "angry", "overwhelmed", "tired", "drained", "depressed", "worthless"],
+}
+
+
+class Match(NamedTuple):
+    start: int
+    end: int
+    text: str
+    categories: tuple
+
+
+class Result(NamedTuple):
+    crisis: bool
+    stress: bool
+    tone: str          # "positive" | "negative" | "neutral"
+    spans: list        # [Match, ...] in text order
+
+
+def _trie_pattern(words) -> str:
+    """Regex for a set of literal phrases, factored by common prefixes."""
+    trie = {}
+    for w in words:
+        node = trie
+        for ch in w:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def walk(node):
+        end = "" in node
+        alts = []
+        for ch in sorted(k for k in node if k):
+            lit = r"\s+" if ch == " " else re.escape(ch)
+            alts.append(lit + walk(node[ch]))
+        if not alts:
+            return ""
+        body = alts[0] if len(alts) == 1 and not end else "(?:" + "|".join(alts) + ")"
+        return body + "?" if end else body
+
+    return walk(trie)
+
+
+def load_lexicon(path=None) -> dict:
+    """Built-in lexicon merged with an optional JSON file (default: $HAVEN_LEXICON)."""
+    lex = {c: list(DEFAULT_LEXICON[c]) for c in CATEGORIES}
+    path = path or os.getenv("HAVEN_LEXICON", "").strip()
+    if path:
+        with open(path, "r", encoding="utf-8") as f:
+            extra = json.load(f)
+        for c, terms in extra.items():
+            if c not in lex:
+                raise ValueError(f"Unknown lexicon category {c!r} (use one of {CATEGORIES})")
+            lex[c].extend(t for t in terms if t not in lex[c])
+    return lex
+
+
+class Classifier:
+    def __init__(self, lexicon: dict = None):
+        lexicon = lexicon or load_lexicon()
+        self._owners, raw = {}, []  # normalized literal term -> categories; raw regex entries
+        for c in CATEGORIES:
+            for term in lexicon.get(c, []):
+                if term.startswith("re:"):
+                    raw.append((c, term[3:]))
+                else:
+                    cats = self._owners.setdefault(" ".join(term.lower().split()), [])
+                    if c not in cats:
+                        cats.append(c)
+        self._owners = {t: tuple(c for c in CATEGORIES if c in cats) for t, cats in self._owners.items()}
+        words = [t for t, cats in self._owners.items() if "crisis" in cats]
+        crisis = [_trie_pattern(words)] if words else []
+        crisis += [p for c, p in raw if c == "crisis"]
+        crisis_body = r"\b(?:" + "|".join(crisis) + r")\b" if crisis else r"(?!x)x"
+        parts, self._raw = [], {}
+        for c, p in raw:
+            if c != "crisis":
+                self._raw[f"r{len(self._raw)}"] = (c,)
+                parts.append(f"(?P<r{len(self._raw) - 1}>{p})")
+        # everything else is one trie; the matched text is looked up in _owners
+        words = [t for t, cats in self._owners.items() if "crisis" not in cats]
+        if words:
+            parts.append(f"(?P<lit>{_trie_pattern(words)})")
+        other_body = "(?=" + "|".join(parts) + ")" if parts else r"(?!x)x"
+        # lexicon terms are lower-case: match on text.lower() (cheaper than IGNORECASE) unless
+        # lower-casing changes the length, which would shift the spans
+        self.patterns = [re.compile(crisis_body), re.compile(other_body)]
+        self.patterns_i = [re.compile(crisis_body, re.IGNORECASE), re.compile(other_body, re.IGNORECASE)]
+
+    def _prefix_terms(self, subject: str, a: int, b: int):
+        """(end, categories) for every term that is a prefix of subject[a:b] (the trie path)."""
+        norm = []
+        for i in range(a, b):
+            ch = subject[i]
+            if ch.isspace():
+                if norm and norm[-1] != " ":
+                    norm.append(" ")
+                continue
+            norm.append(ch.lower())
+            cats = self._owners.get("".join(norm))
+            if cats:
+                yield i + 1, cats
+
+    def classify(self, text: str) -> Result:
+        text = text or ""
+        low = text.lower()
+        crisis_re, other_re = self.patterns if len(low) == len(text) else self.patterns_i
+        subject = low if len(low) == len(text) else text
+        spans, hit = [], set()
+        for m in crisis_re.finditer(subject):
+            cats = self._owners.get(" ".join(m.group().lower().split()), ("crisis",))
+            hit.update(cats)
+            spans.append(Match(m.start(), m.end(), text[m.start():m.end()], cats))
+        for m in other_re.finditer(subject):
+            g = m.lastgroup
+            a, b = m.span(g)
+            if g in self._raw:
+                hit.update(self._raw[g])
+                spans.append(Match(a, b, text[a:b], self._raw[g]))
+                continue
+            for end, cats in self._prefix_terms(subject, a, b):
+                hit.update(cats)
+                spans.append(Match(a, end, text[a:end], cats))
+        spans.sort()
+        pos, neg = "positive" in hit, "negative" in hit
+        tone = "positive" if pos and not neg else "negative" if neg and not pos else "neutral"
+        return Result("crisis" in hit, "stress" in hit, tone, spans)
+
+
+_DEFAULT = None
+
+def classifier() -> Classifier:
+    global _DEFAULT
+    if _DEFAULT is None:
+        _DEFAULT = Classifier()
+    return _DEFAULT
+
+def classify(text: str) -> Result:
+    return classifier().classify(text)
+
+def crisis(text: str) -> bool:
+    return classify(text).crisis
+
+def stress(text: str) -> bool:
+    return classify(text).stress
+
+def tone(text: str) -> str:
+    return classify(text).tone
+
+
+# ---------- micro-benchmark ----------
+def _legacy(text):
+    """The per-function checks this module replaced (kept for the benchmark only)."""
+    pats = [r"\bi want to die\b", r"\bsuicide\b", r"\bkill myself\b", r"\bself[- ]harm\b",
+            r"\bending it all\b", r"\bno reason to live\b"]
+    t = text.lower().strip()
+    c = any(re.search(p, t) for p in pats)
+    t = text.lower()
+    s = any(w in t for w in DEFAULT_LEXICON["stress"])
+    t = text.lower()
+    pos = any(x in t for x in DEFAULT_LEXICON["positive"])
+    neg = any(x in t for x in DEFAULT_LEXICON["negative"])
+    return c, s, "positive" if pos and not neg else "negative" if neg and not pos else "neutral"
+
+
+def bench(sizes=(200, 2000, 20000), rounds=200):
+    filler = "today was a long day at college and i kept thinking about the exam results "
+    clf = classifier()
+    print(f"{'chars':>7} {'legacy µs':>10} {'compiled µs':>15}")
+    for n in sizes:
+        text = (filler * (n // len(filler) + 1))[:n] + " honestly i feel tired"
+        assert _legacy(text) == tuple(clf.classify(text)[:3])
+        t0 = time.perf_counter()
+        for _ in range(rounds):
+            _legacy(text)
+        t1 = time.perf_counter()
+        for _ in range(rounds):
+            clf.classify(text)
+        t2 = time.perf_counter()
+        print(f"{n:>7} {(t1 - t0) / rounds * 1e6:>10.1f} {(t2 - t1) / rounds * 1e6:>15.1f}")
+    # a file-sized lexicon: per-term `in` scans grow with the word list, the trie barely does
+    rnd = random.Random(0)
+    extra = ["".join(rnd.choice("bcdfghjklmnpqrstvwxz") for _ in range(rnd.randint(5, 10))) for _ in range(2000)]
+    big = load_lexicon()
+    big["negative"] += extra
+    clf = Classifier(big)
+    text = (filler * 30)[:2000]
+    t0 = time.perf_counter()
+    for _ in range(20):
+        low = text.lower()
+        any(w in low for w in big["negative"])
+    t1 = time.perf_counter()
+    for _ in range(20):
+        clf.classify(text)
+    t2 = time.perf_counter()
+    print(f"2000 chars, {len(big['negative'])}-term lexicon: per-term scan {(t1 - t0) / 20 * 1e6:.0f} µs, "
+          f"compiled {(t2 - t1) / 20 * 1e6:.0f} µs")
+
+
+if __name__ == "__main__":
+    # python -m haven.safety bench  |  python -m haven.safety "some text"
+    if len(sys.argv) > 1 and sys.argv[1] == "bench":
+        bench()
+    elif len(sys.argv) > 1:
+        r = classify(" ".join(sys.argv[1:]))
+        print(f"crisis={r.crisis} stress={r.stress} tone={r.tone}")
+        for m in r.spans:
+            print(f"  {m.start}-{m.end} {m.text!r} {'+'.join(m.categories)}")
+    else:
+        sys.exit('usage: python -m haven.safety bench | python -m haven.safety "text"')
@@ -0,0 +1,194 @@
+# haven/search.py — journal search: vectorized scan, in-memory inverted index, SQLite FTS5
+#
+# A query is a list of terms (whitespace separated, "quoted phrases" kept together); an entry
+# matches when every term is found in its note or emotion, optionally limited to a date range
+# and a set of moods. Three engines, same filters:
+#   scan   substring match over a lower-cased column built once per journal version (str.contains)
+#   index  token → row positions; terms match word prefixes ("stress" finds "stressed")
+#   fts    the SQLite backend's FTS5 table (same prefix semantics), nothing loaded into memory
+# HAVEN_SEARCH=auto (default) always scans: switching engines by journal size would change which rows
+# a query returns ("ress" finds "stress" in a scan, not as a word prefix). index and fts are opt-in
+# (HAVEN_SEARCH=index|fts); the index costs ~1s to build per 100k entries, fts needs no session data.
+import os, re, sys, time, bisect
+import numpy as np
+import pandas as pd
+from haven.cache import CACHE
+
+SEARCH_ENGINES = ("auto", "scan", "index", "fts")
+_TOKEN = re.compile(r"\w+")
+
+
+def parse_query(q: str) -> list:
+    """'tired "after exams"' -> ['tired', 'after exams']"""
+    terms = [a or b for a, b in re.findall(r'"([^"]+)"|(\S+)', (q or "").lower())]
+    return [" ".join(t.split()) for t in terms if t.strip()]
+
+
+class _Columns:
+    """Date and mood columns prepared once, for the range / mood filters."""
+    def __init__(self, df: pd.DataFrame):
+        self.n = len(df)
+        self.dates = df["date"].astype(str).str[:10].to_numpy(dtype="U10")
+        self.moods = pd.to_numeric(df["mood_1to5"], errors="coerce").to_numpy(dtype=float)
+
+    def filter(self, date_from=None, date_to=None, moods=None) -> np.ndarray:
+        """Boolean mask for the date range (inclusive, 'YYYY-MM-DD') and mood set."""
+        mask = np.ones(self.n, dtype=bool)
+        if date_from:
+            mask &= self.dates >= str(date_from)
+        if date_to:
+            mask &= self.dates <= str(date_to)
+        if moods:
+            mask &= np.isin(self.moods, [int(x) for x in moods])
+        return mask
+
+
+class ScanSearch(_Columns):
+    """Vectorized substring search over a precomputed lower-cased `note + emotion` column."""
+    def __init__(self, df: pd.DataFrame):
+        super().__init__(df)
+        self.hay = (df["note"].fillna("").astype(str) + "\n" + df["emotion"].fillna("").astype(str)).str.lower()
+
+    def __sizeof__(self):  # for the cache budget
+        return int(self.hay.memory_usage(deep=True)) + self.dates.nbytes + self.moods.nbytes
+
+    def match(self, terms) -> np.ndarray:
+        mask = np.ones(len(self.hay), dtype=bool)
+        for t in terms:
+            mask &= self.hay.str.contains(t, regex=False).to_numpy()
+        return mask
+
+
+class InvertedIndex(_Columns):
+    """Word → sorted row positions; each term matches every word it is a prefix of."""
+    def __init__(self, df: pd.DataFrame):
+        super().__init__(df)
+        postings = {}
+        texts = (df["note"].fillna("").astype(str) + " " + df["emotion"].fillna("").astype(str)).str.lower()
+        for pos, text in enumerate(texts):
+            for w in set(_TOKEN.findall(text)):
+                postings.setdefault(w, []).append(pos)
+        self.vocab = sorted(postings)
+        self.postings = {w: np.asarray(p, dtype=np.int64) for w, p in postings.items()}
+
+    def __sizeof__(self):
+        return (sum(len(w) + 50 + p.nbytes for w, p in self.postings.items())
+                + self.dates.nbytes + self.moods.nbytes)
+
+    def _word(self, prefix) -> np.ndarray:
+        lo = bisect.bisect_left(self.vocab, prefix)
+        hits = []
+        for w in self.vocab[lo:]:
+            if not w.startswith(prefix):
+                break
+            hits.append(self.postings[w])
+        return np.unique(np.concatenate(hits)) if hits else np.empty(0, dtype=np.int64)
+
+    def match(self, terms) -> np.ndarray:
+        mask = np.ones(self.n, dtype=bool)
+        for t in terms:
+            words = _TOKEN.findall(t)
+            # a phrase needs all of its words (order is not checked by the index)
+            for w in words:
+                m = np.zeros(self.n, dtype=bool)
+                m[self._word(w)] = True
+                mask &= m
+        return mask
+
+
+def _engine(store, engine):
+    engine = (engine or os.getenv("HAVEN_SEARCH", "auto")).strip().lower()
+    if engine not in SEARCH_ENGINES:
+        raise ValueError(f"Unknown HAVEN_SEARCH engine: {engine!r} (use one of {SEARCH_ENGINES})")
+    if engine == "auto":
+        return "scan"
+    if engine == "fts" and not getattr(store, "fts", False):
+        return "index"
+    return engine
+
+
+def _version(df):
+    # the journal is append-only: its length + last row identify the contents
+    return (len(df), tuple(df.iloc[-1].astype(str))) if len(df) else (0,)
+
+
+def search_journal(journal, query: str = "", date_from=None, date_to=None, moods=None,
+                   store=None, user: str = "", engine: str = None) -> pd.DataFrame:
+    """Rows of `journal` (a DataFrame or haven.journal.Journal) matching the query and filters, in
+    journal order. A Journal's frame is only built for the in-memory engines."""
+    frame = journal.frame if hasattr(journal, "frame") else lambda: journal
+    terms = parse_query(query)
+    if not terms and not (date_from or date_to or moods):
+        return frame()
+    engine = _engine(store, engine)
+    if engine == "fts":
+        return store.search_journal(terms, date_from, date_to, moods)
+    df = frame()
+    cls = ScanSearch if engine == "scan" else InvertedIndex
+    # built once per journal version and shared across reruns/sessions (process cache)
+    idx = CACHE.load((user, f"journal-search:{engine}") + _version(df), lambda: cls(df))
+    mask = idx.filter(date_from, date_to, moods)
+    if terms:
+        mask &= idx.match(terms)
+    return df[mask]
+
+
+# ---------- benchmark ----------
+def _sample(n, seed=0):
+    rnd = np.random.default_rng(seed)
+    words = ("today exam stress friends walk tired calm family sleep anxious hopeful work "
+             "study music rain coffee lonely proud grateful overwhelmed presentation").split()
+    notes = [" ".join(rnd.choice(words, 12)) for _ in range(n)]
+    return pd.DataFrame({
+        "date": pd.date_range("2000-01-01", periods=n, freq="h").strftime("%Y-%m-%d"),
+        "mood_1to5": rnd.integers(1, 6, n),
+        "emotion": rnd.choice(["positive", "negative", "neutral"], n),
+        "note": notes,
+    })
+
+
+def bench(sizes=(10_000, 100_000)):
+    import tempfile
+    from haven.storage import SQLiteStore
+    q = "stress tired"
+    for n in sizes:
+        df = _sample(n)
+        with tempfile.TemporaryDirectory() as tmp:
+            store = SQLiteStore(tmp)
+            with store._batch() as c:
+                c.executemany("INSERT INTO journal(date, mood_1to5, emotion, note) VALUES(?, ?, ?, ?)",
+                              [(d, int(m), e, t) for d, m, e, t in df.itertuples(index=False)])
+            rows = {}
+
+            def timed(name, fn, reps=5):
+                fn()
+                t = time.perf_counter()
+                for _ in range(reps):
+                    rows[name] = len(fn())
+                return (time.perf_counter() - t) / reps * 1000
+
+            def legacy():
+                ql = q.lower()
+                return df[df.apply(lambda r: ql in r["note"].lower() or ql in r["emotion"].lower(), axis=1)]
+
+            print(f"{n:,} entries, query {q!r} (2 terms), 2000-2005 dates, moods 1-2")
+            t0 = time.perf_counter(); ScanSearch(df); build_scan = (time.perf_counter() - t0) * 1000
+            t0 = time.perf_counter(); InvertedIndex(df); build_idx = (time.perf_counter() - t0) * 1000
+            res = {
+                "legacy apply (1 phrase)": timed("legacy", legacy, 1),
+                "scan": timed("scan", lambda: search_journal(df, q, "2000", "2005-12-31", [1, 2], engine="scan")),
+                "index": timed("index", lambda: search_journal(df, q, "2000", "2005-12-31", [1, 2], engine="index")),
+                "fts5": timed("fts", lambda: search_journal(df, q, "2000", "2005-12-31", [1, 2], store, engine="fts")),
+            }
+            for name, ms in res.items():
+                print(f"  {name:<24} {ms:8.2f} ms/query")
+            print(f"  build: scan column {build_scan:.0f} ms, inverted index {build_idx:.0f} ms (once per journal version)")
+            print(f"  matches: {rows}")
+            store.close()
+
+
+if __name__ == "__main__":
+    # python -m haven.search bench
+    if len(sys.argv) < 2 or sys.argv[1] != "bench":
+        sys.exit("usage: python -m haven.search bench")
+    bench()
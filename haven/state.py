@@ -0,0 +1,47 @@
+# haven/state.py — dirty tracking for session_state objects that get persisted
+import json, hashlib
+
+
+def digest(value) -> bytes:
+    """Stable content hash of a JSON-able value (dict key order ignored)."""
+    raw = json.dumps(value, sort_keys=True, separators=(",", ":"), default=str).encode()
+    return hashlib.blake2b(raw, digest_size=16).digest()
+
+
+class DirtyTracker:
+    """Remembers what was last persisted per key and skips writes when nothing changed.
+
+    Counters: `writes` / `skipped` are totals for the session, `run_writes` resets
+    on every rerun via begin_run(), so an idle rerun should show run_writes == 0.
+    """
+
+    def __init__(self):
+        self._last = {}
+        self.writes = 0
+        self.skipped = 0
+        self.run_writes = 0
+
+    def begin_run(self):
+        self.run_writes = 0
+
+    def mark_clean(self, key: str, value):
+        """Record `value` as already on disk (e.g. right after loading it)."""
+        self._last[key] = digest(value)
+
+    def is_dirty(self, key: str, value) -> bool:
+        return self._last.get(key) != digest(value)
+
+    def flush(self, key: str, value, write) -> bool:
+        """Call write() only if `value` differs from the last persisted snapshot."""
+        d = digest(value)
+        if self._last.get(key) == d:
+            self.skipped += 1
+            return False
+        write()
+        self._last[key] = d
+        self.writes += 1
+        self.run_writes += 1
+        return True
+
+    def stats(self) -> dict:
+        return {"run_writes": self.run_writes, "writes": self.writes, "skipped": self.skipped}
@@ -0,0 +1,167 @@
+# haven/stats.py — per-user journal summary, kept as counters updated on every save
+#
+# Pages read these totals instead of rescanning the full history on every render. What is stored is
+# a flat map of numeric counters (Store.load_stats / add_stats / reset_stats):
+#   rows                      journal entries
+#   day/<date>/n|mood|moods   entries, mood sum and mood count for one day
+#   emotion/<emotion>         entries tagged with that emotion
+# A save only adds deltas (a SQL upsert, or one record appended to stats.jsonl), so it costs the
+# same whatever the history size and two sessions saving at once never lose each other's counts.
+# Streak runs are derived from the day keys when the counters are loaded and then kept up to date
+# in memory. `rows` lets a session notice on load that the journal changed behind the summary's
+# back (older app version, manual edits) and rebuild it once.
+# Habit completion isn't summarized here: haven.habits.HabitLog answers it from memory.
+from datetime import date as _date, timedelta
+import pandas as pd
+
+
+def _day(value):
+    """'YYYY-MM-DD...' -> 'YYYY-MM-DD', or None if it isn't a date."""
+    try:
+        return _date.fromisoformat(str(value)[:10]).isoformat()
+    except ValueError:
+        return None
+
+
+def _num(value):
+    try:
+        m = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if m != m else m
+
+
+def journal_deltas(row: dict) -> dict:
+    """Counter increments for one journal row."""
+    out = {"rows": 1}
+    d = _day(row.get("date"))
+    if d is None:
+        return out
+    out[f"day/{d}/n"] = 1
+    m = _num(row.get("mood_1to5"))
+    if m is not None:
+        out[f"day/{d}/mood"] = m
+        out[f"day/{d}/moods"] = 1
+    emo = row.get("emotion")
+    if isinstance(emo, str) and emo:
+        out[f"emotion/{emo}"] = 1
+    return out
+
+
+def merge_deltas(total: dict, deltas: dict) -> dict:
+    for k, v in deltas.items():
+        total[k] = total.get(k, 0) + v
+    return total
+
+
+class Aggregates:
+    def __init__(self, counters: dict = None):
+        self.rows = 0
+        self.days = {}        # date -> [entries, mood_sum, mood_count]
+        self.emotions = {}    # emotion -> entries
+        self.run = None       # [first_day, last_day] of the latest consecutive-day run
+        self.longest = 0
+        for k, v in (counters or {}).items():
+            self._set(k, v)
+        self._recount_runs()
+
+    def _set(self, key: str, v):
+        if key == "rows":
+            self.rows = int(v)
+        elif key.startswith("day/"):
+            _, d, field = key.split("/", 2)
+            entry = self.days.setdefault(d, [0, 0.0, 0])
+            i = {"n": 0, "mood": 1, "moods": 2}.get(field)
+            if i is not None:
+                entry[i] = float(v) if i == 1 else int(v)
+        elif key.startswith("emotion/"):
+            self.emotions[key[len("emotion/"):]] = int(v)
+
+    # ----- building / validation -----
+    @classmethod
+    def build(cls, journal: pd.DataFrame) -> "Aggregates":
+        """Full rebuild from the raw journal (first run, or after a mismatch)."""
+        total = {}
+        for row in journal.to_dict("records"):
+            merge_deltas(total, journal_deltas(row))
+        return cls(total)
+
+    def counters(self) -> dict:
+        """The stored form (what Store.reset_stats takes)."""
+        out = {"rows": self.rows}
+        for d, (n, s, c) in self.days.items():
+            out[f"day/{d}/n"] = n
+            if c:
+                out[f"day/{d}/mood"], out[f"day/{d}/moods"] = s, c
+        out.update({f"emotion/{e}": n for e, n in self.emotions.items()})
+        return out
+
+    def matches(self, journal) -> bool:
+        """journal: anything with len() (a DataFrame or haven.journal.Journal)."""
+        return self.rows == len(journal)
+
+    # ----- journal -----
+    def add_journal(self, row: dict) -> dict:
+        """Apply one journal row; returns the deltas to persist with Store.add_stats."""
+        deltas = journal_deltas(row)
+        self.rows += 1
+        d = _day(row.get("date"))
+        if d is not None:
+            entry = self.days.setdefault(d, [0, 0.0, 0])
+            entry[0] += 1
+            entry[1] += deltas.get(f"day/{d}/mood", 0)
+            entry[2] += deltas.get(f"day/{d}/moods", 0)
+            emo = row.get("emotion")
+            if isinstance(emo, str) and emo:
+                self.emotions[emo] = self.emotions.get(emo, 0) + 1
+            self._extend_run(d)
+        return deltas
+
+    def _extend_run(self, d: str):
+        run = self.run
+        if run is None:
+            self.run = [d, d]
+        elif d < run[0]:
+            # back-dated entry (rare): recount every run from the day index
+            self._recount_runs()
+            return
+        elif d <= run[1]:
+            return  # already inside the latest run
+        elif _date.fromisoformat(d) - _date.fromisoformat(run[1]) == timedelta(days=1):
+            run[1] = d
+        else:
+            self.run = [d, d]
+        a, b = self.run
+        self.longest = max(self.longest, (_date.fromisoformat(b) - _date.fromisoformat(a)).days + 1)
+
+    def _recount_runs(self):
+        run, longest, prev = None, 0, None
+        for d in sorted(d for d, v in self.days.items() if v[0]):
+            cur = _date.fromisoformat(d)
+            if prev is not None and cur - prev == timedelta(days=1):
+                run[1] = d
+            else:
+                run = [d, d]
+            longest = max(longest, (cur - _date.fromisoformat(run[0])).days + 1)
+            prev = cur
+        self.run, self.longest = run, longest
+
+    def current_streak(self, today: str) -> int:
+        """Consecutive days with an entry, ending today (0 if nothing today)."""
+        if not self.run or self.run[1] != today:
+            return 0
+        return (_date.fromisoformat(self.run[1]) - _date.fromisoformat(self.run[0])).days + 1
+
+    def longest_streak(self) -> int:
+        return self.longest
+
+    def entries(self) -> int:
+        return self.rows
+
+    def emotion_counts(self) -> dict:
+        return {e: n for e, n in self.emotions.items() if n}
+
+    def mood_by_day(self, last: int = None) -> list:
+        """[(date, mean mood)] in date order for days that have a mood."""
+        out = [(d, v[1] / v[2]) for d, v in sorted(self.days.items()) if v[2]]
+        return out[-last:] if last else out
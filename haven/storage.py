@@ -0,0 +1,699 @@
+# haven/storage.py — per-user storage backends (legacy CSV/JSON files or SQLite in WAL mode)
+#
+# The app talks to a Store through entity-level calls (append a journal row, tick one habit,
+# update one nutrition day ...) so a backend can persist just the row that changed.
+#   HAVEN_STORAGE=sqlite  -> data/<uid>/haven.db (default), legacy files are migrated once on first open
+#   HAVEN_STORAGE=files   -> data/<uid>/*.csv|json, the original layout
+import os, csv, json, time, sqlite3, threading
+from abc import ABC, abstractmethod
+from pathlib import Path
+import pandas as pd
+from haven.fsio import WRITER
+from haven.applog import AppendLog, migrate_json_array
+from haven.cache import CACHE, load_file, thaw, file_version
+
+JOURNAL_COLS = ["date", "mood_1to5", "emotion", "note"]
+HABIT_COLS = ["Date", "Habit", "Done"]
+
+# legacy per-user files (relative to data/<uid>/)
+FILES = {
+    "journal": "journal.csv",
+    "checkins": "checkins.jsonl",     # append-only logs (see applog)
+    "gratitude": "gratitude.jsonl",
+    "stats": "stats.jsonl",           # journal summary counters, one record of deltas per save
+    "habits": "habits.csv",
+    "nutrition_day": "nutrition_day.json",   # legacy single file, split into NUTRITION_DIR on first use
+}
+NUTRITION_DIR = "nutrition"                   # one <YYYY-MM>.json partition per month
+# older JSON-array versions of the logs, converted on first use
+LEGACY_ARRAYS = {"checkins": "checkins.json", "gratitude": "gratitude.json"}
+LEGACY_STATS = "stats.json"   # whole-document summary of older versions (rebuilt as counters)
+STATS_FOLD = 256              # stats.jsonl records before they are summed into one
+# small whole-document blobs
+DOC_FILES = {
+    "games": "games.json",            # game scores and aggregates (see haven.games)
+    "affirmations": "affirmations.json",
+    "nutrition_goals": "nutrition_goals.json",
+    "melody": "moody_melody.json",
+}
+
+
+def _sum_counters(recs) -> dict:
+    total = {}
+    for r in recs:
+        if isinstance(r, dict):
+            for k, v in r.items():
+                if isinstance(v, (int, float)):
+                    total[k] = total.get(k, 0) + v
+    return total
+
+
+# ---------- Readers (tolerant: bad/missing files fall back to defaults) ----------
+def df_safe(path: Path, cols):
+    if path.exists():
+        try: return pd.read_csv(path)
+        except Exception: pass
+    return pd.DataFrame(columns=cols)
+
+def load_json(path: Path, default):
+    try:
+        if path.exists() and path.stat().st_size > 0:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+    except Exception:
+        pass
+    return default
+
+def _none_if_nan(v):
+    return None if v is None or (isinstance(v, float) and v != v) else v
+
+def months_between(start: str, end: str) -> list:
+    """['2024-11', '2024-12', '2025-01'] for '2024-11-20'..'2025-01-03'."""
+    y, m = int(start[:4]), int(start[5:7])
+    out = []
+    while f"{y:04d}-{m:02d}" <= end[:7]:
+        out.append(f"{y:04d}-{m:02d}")
+        y, m = (y + 1, 1) if m == 12 else (y, m + 1)
+    return out
+
+
+# ---------- Interface ----------
+class Store(ABC):
+    """Entity-level persistence for one user folder (a backend missing a method fails on creation)."""
+    name = "base"
+
+    def __init__(self, user_dir):
+        self.user_dir = Path(user_dir)
+        self.user_dir.mkdir(parents=True, exist_ok=True)
+        self.lock = threading.RLock()
+
+    # journal
+    @abstractmethod
+    def load_journal(self) -> pd.DataFrame: ...
+    @abstractmethod
+    def append_journal(self, row: dict): ...
+    # check-ins
+    @abstractmethod
+    def load_checkins(self) -> list: ...
+    @abstractmethod
+    def append_checkin(self, rec: dict): ...
+    def tail_checkins(self, n: int) -> list: return self.load_checkins()[-n:] if n > 0 else []
+    # gratitude wall
+    @abstractmethod
+    def load_gratitude(self) -> list: ...
+    @abstractmethod
+    def append_gratitude(self, line: str): ...
+    def count_gratitude(self) -> int: return len(self.load_gratitude())
+    def tail_gratitude(self, n: int) -> list: return self.load_gratitude()[-n:] if n > 0 else []
+    # habits: one row per (Date, Habit)
+    @abstractmethod
+    def load_habits(self) -> pd.DataFrame: ...
+    @abstractmethod
+    def set_habits(self, date: str, updates: dict): ...
+    @abstractmethod
+    def add_habit(self, date: str, habit: str): ...
+    @abstractmethod
+    def delete_habit(self, habit: str): ...
+    # nutrition: {date: entry}; pages load a date window, exports stream in date order
+    @abstractmethod
+    def load_nutrition(self) -> dict: ...
+    def load_nutrition_range(self, start: str, end: str) -> dict:
+        return {d: e for d, e in self.load_nutrition().items() if start <= d <= end}
+    def iter_nutrition(self): yield from sorted(self.load_nutrition().items())
+    @abstractmethod
+    def put_nutrition_day(self, date: str, entry: dict): ...
+    # exports: whole history in chunks, plus a cheap version of the source (None = unknown)
+    def iter_journal(self, chunk: int = 5000):
+        df = self.load_journal()
+        for i in range(0, len(df), chunk):
+            yield df.iloc[i:i + chunk]
+    def iter_habits(self, chunk: int = 5000):
+        df = self.load_habits()
+        for i in range(0, len(df), chunk):
+            yield df.iloc[i:i + chunk]
+    def source_version(self, kind: str): return None
+
+    # journal summary counters (haven.stats): add_stats must be atomic across sessions
+    @abstractmethod
+    def load_stats(self) -> dict: ...
+    @abstractmethod
+    def add_stats(self, deltas: dict): ...
+    @abstractmethod
+    def reset_stats(self, counters: dict): ...
+
+    # small documents (games, affirmations, nutrition_goals, melody)
+    @abstractmethod
+    def load_doc(self, name: str, default): ...
+    @abstractmethod
+    def save_doc(self, name: str, value): ...
+    # full-text journal search (only backends with an index; see haven.search)
+    fts = False
+    def search_journal(self, terms: list, date_from=None, date_to=None, moods=None) -> pd.DataFrame:
+        raise NotImplementedError  # optional: callers check `fts` first
+
+    def close(self): pass
+
+
+# ---------- Legacy CSV/JSON files ----------
+class FileStore(Store):
+    """The original data/<uid>/ layout. Journal rows are appended to the CSV, check-ins and
+    gratitude go to append-only JSON Lines logs, nutrition days live in one JSON file per month;
+    the other entities are kept in memory and rewritten as a whole (atomically, see fsio).
+    Parsed files are shared through the process-wide cache, so a returning user's next session
+    doesn't re-parse them."""
+    name = "files"
+
+    def __init__(self, user_dir):
+        super().__init__(user_dir)
+        self._logs = {}
+        self._nutrition_ready = False
+
+    def path(self, key: str) -> Path:
+        return self.user_dir / (FILES.get(key) or DOC_FILES[key])
+
+    def log(self, key: str) -> AppendLog:
+        with self.lock:
+            if key not in self._logs:
+                lg = AppendLog(self.path(key))
+                if key in LEGACY_ARRAYS:
+                    migrate_json_array(self.user_dir / LEGACY_ARRAYS[key], lg)
+                lg.maybe_compact()
+                self._logs[key] = lg
+            return self._logs[key]
+
+    def _dump(self, key: str, value):
+        WRITER.write_text(self.path(key), json.dumps(value, indent=2))
+
+    def _cached(self, key: str, parser):
+        # shared read-only value; thaw() before handing it to a session
+        return load_file(self.path(key), parser, self.user_dir.name)
+
+    def _habits(self):
+        return self._cached("habits", lambda p: df_safe(p, HABIT_COLS))
+
+    # ----- nutrition partitions -----
+    def _month_path(self, month: str) -> Path:
+        return self.user_dir / NUTRITION_DIR / f"{month}.json"
+
+    def _split_legacy_nutrition(self):
+        """One-time split of nutrition_day.json into monthly partitions."""
+        if self._nutrition_ready:
+            return
+        with self.lock:
+            legacy = self.path("nutrition_day")
+            if legacy.exists():
+                by_month = {}
+                for d, e in load_json(legacy, {}).items():
+                    by_month.setdefault(str(d)[:7], {})[d] = e
+                (self.user_dir / NUTRITION_DIR).mkdir(exist_ok=True)
+                for month, part in by_month.items():
+                    # keep days a partition already has (an interrupted earlier split)
+                    merged = {**part, **load_json(self._month_path(month), {})}
+                    WRITER.write_text(self._month_path(month), json.dumps(dict(sorted(merged.items())), indent=2))
+                legacy.rename(legacy.with_name(legacy.name + ".migrated"))
+            self._nutrition_ready = True
+
+    def _month(self, month: str) -> dict:
+        self._split_legacy_nutrition()
+        return load_file(self._month_path(month), lambda p: load_json(p, {}), self.user_dir.name)
+
+    def _months(self) -> list:
+        self._split_legacy_nutrition()
+        return sorted(p.stem for p in (self.user_dir / NUTRITION_DIR).glob("????-??.json"))
+
+    def load_journal(self):
+        return thaw(self._cached("journal", lambda p: df_safe(p, JOURNAL_COLS)))
+
+    def append_journal(self, row):
+        p = self.path("journal")
+        with self.lock:
+            if p.exists() and p.stat().st_size > 0:
+                with open(p, newline="", encoding="utf-8") as f:
+                    header = next(csv.reader(f), None) or JOURNAL_COLS
+                line = pd.DataFrame([row]).reindex(columns=header).to_csv(header=False, index=False)
+                WRITER.append_bytes(p, line.encode("utf-8"))
+            else:
+                WRITER.write_text(p, pd.DataFrame([row]).reindex(columns=JOURNAL_COLS).to_csv(index=False))
+
+    def load_checkins(self):
+        return self.log("checkins").read_all()
+
+    def append_checkin(self, rec):
+        self.log("checkins").append(rec)
+
+    def tail_checkins(self, n):
+        return self.log("checkins").tail(n)
+
+    def load_gratitude(self):
+        return self.log("gratitude").read_all()
+
+    def append_gratitude(self, line):
+        self.log("gratitude").append(line)
+
+    def count_gratitude(self):
+        return len(self.log("gratitude"))
+
+    def tail_gratitude(self, n):
+        return self.log("gratitude").tail(n)
+
+    def load_habits(self):
+        return thaw(self._habits())
+
+    def _write_habits(self, df):
+        WRITER.write_text(self.path("habits"), df.to_csv(index=False))
+
+    def set_habits(self, date, updates):
+        with self.lock:
+            df = self.load_habits()
+            upd = pd.Series({str(h): int(d) for h, d in updates.items()}, dtype="int64")
+            # one pass over the frame for the whole batch
+            day = df.loc[df["Date"] == date, "Habit"]
+            hit = day[day.isin(upd.index)]
+            df.loc[hit.index, "Done"] = hit.map(upd).to_numpy()
+            new = [{"Date": date, "Habit": h, "Done": d} for h, d in upd.items() if h not in set(hit)]
+            if new:
+                df = pd.concat([df, pd.DataFrame(new)], ignore_index=True)
+            self._write_habits(df)
+
+    def add_habit(self, date, habit):
+        with self.lock:
+            df = self._habits()
+            if not ((df["Date"] == date) & (df["Habit"] == habit)).any():
+                self._write_habits(pd.concat([df, pd.DataFrame([{"Date": date, "Habit": habit, "Done": 0}])],
+                                             ignore_index=True))
+
+    def delete_habit(self, habit):
+        with self.lock:
+            df = self._habits()
+            self._write_habits(df[df["Habit"] != habit])
+
+    def load_nutrition(self):
+        out = {}
+        for m in self._months():
+            out.update(self._month(m))
+        return thaw(out)
+
+    def load_nutrition_range(self, start, end):
+        # only the partitions the window touches are read
+        out = {}
+        for m in months_between(start, end):
+            out.update((d, e) for d, e in self._month(m).items() if start <= d <= end)
+        return thaw(out)
+
+    def iter_nutrition(self):
+        # one month in memory at a time (read directly: a full export shouldn't flush the cache)
+        for m in self._months():
+            yield from sorted(load_json(self._month_path(m), {}).items())
+
+    def put_nutrition_day(self, date, entry):
+        with self.lock:
+            month = str(date)[:7]
+            data = dict(self._month(month))  # shallow: only this day's value is replaced
+            data[date] = entry
+            (self.user_dir / NUTRITION_DIR).mkdir(exist_ok=True)
+            WRITER.write_text(self._month_path(month), json.dumps(data, indent=2))
+
+    def _iter_csv(self, key, chunk):
+        # read straight from disk in chunks: a full export shouldn't go through (or flush) the cache
+        p = self.path(key)
+        if not p.exists() or p.stat().st_size == 0:
+            return
+        try:
+            for df in pd.read_csv(p, chunksize=chunk):
+                yield df
+        except pd.errors.EmptyDataError:
+            return
+
+    def iter_journal(self, chunk=5000):
+        return self._iter_csv("journal", chunk)
+
+    def iter_habits(self, chunk=5000):
+        return self._iter_csv("habits", chunk)
+
+    def source_version(self, kind):
+        if kind == "nutrition":
+            return tuple((m, file_version(self._month_path(m))) for m in self._months())
+        if kind == "gratitude":
+            self.log("gratitude")  # converts a legacy JSON array first
+        return file_version(self.path(kind))
+
+    # ----- stats: deltas appended to stats.jsonl, folded into one record once there are many -----
+    def load_stats(self):
+        lg = self.log("stats")
+        if len(lg) > STATS_FOLD:
+            lg.rewrite(lambda recs: [_sum_counters(recs)])
+        return _sum_counters(lg.read_all())
+
+    def add_stats(self, deltas):
+        self.log("stats").append(deltas)
+
+    def reset_stats(self, counters):
+        self.log("stats").rewrite(lambda recs: [counters])
+        (self.user_dir / LEGACY_STATS).unlink(missing_ok=True)
+
+    def load_doc(self, name, default):
+        return thaw(self._cached(name, lambda p: load_json(p, default)))
+
+    def save_doc(self, name, value):
+        with self.lock:
+            self._dump(name, value)
+
+
+# ---------- SQLite (WAL) ----------
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS journal(
+    id INTEGER PRIMARY KEY, date TEXT, mood_1to5 INTEGER, emotion TEXT, note TEXT);
+CREATE TABLE IF NOT EXISTS checkins(
+    id INTEGER PRIMARY KEY, timestamp TEXT, answers TEXT);
+CREATE TABLE IF NOT EXISTS gratitude(
+    id INTEGER PRIMARY KEY, line TEXT);
+CREATE TABLE IF NOT EXISTS habits(
+    date TEXT NOT NULL, habit TEXT NOT NULL, done INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY(date, habit));
+CREATE INDEX IF NOT EXISTS habits_by_name ON habits(habit);
+CREATE TABLE IF NOT EXISTS nutrition_day(
+    date TEXT PRIMARY KEY, entry TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS docs(
+    name TEXT PRIMARY KEY, body TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS stats(
+    key TEXT PRIMARY KEY, value REAL NOT NULL);
+CREATE TABLE IF NOT EXISTS meta(
+    key TEXT PRIMARY KEY, value TEXT);
+"""
+
+# journal full-text index, kept in sync by triggers (skipped if SQLite lacks FTS5)
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE journal_fts USING fts5(note, emotion, content='journal', content_rowid='id');
+CREATE TRIGGER journal_fts_ai AFTER INSERT ON journal BEGIN
+    INSERT INTO journal_fts(rowid, note, emotion) VALUES(new.id, new.note, new.emotion); END;
+CREATE TRIGGER journal_fts_ad AFTER DELETE ON journal BEGIN
+    INSERT INTO journal_fts(journal_fts, rowid, note, emotion) VALUES('delete', old.id, old.note, old.emotion); END;
+CREATE TRIGGER journal_fts_au AFTER UPDATE ON journal BEGIN
+    INSERT INTO journal_fts(journal_fts, rowid, note, emotion) VALUES('delete', old.id, old.note, old.emotion);
+    INSERT INTO journal_fts(rowid, note, emotion) VALUES(new.id, new.note, new.emotion); END;
+INSERT INTO journal_fts(journal_fts) VALUES('rebuild');
+"""
+
+class SQLiteStore(Store):
+    """One data/<uid>/haven.db per user; every save touches only the affected rows."""
+    name = "sqlite"
+    DB_NAME = "haven.db"
+
+    def __init__(self, user_dir):
+        super().__init__(user_dir)
+        self.db_path = self.user_dir / self.DB_NAME
+        # autocommit; multi-statement writes go through _batch()
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        # WAL + NORMAL never corrupts on a crash; HAVEN_FSYNC=always also syncs every commit
+        self.conn.execute("PRAGMA synchronous=" + ("FULL" if WRITER.policy == "always" else "NORMAL"))
+        self.conn.execute("PRAGMA busy_timeout=5000")
+        self.conn.executescript(SCHEMA)
+        self.fts = self._ensure_fts()
+        self._gen = 0  # bumped on every write through this store
+
+    def _ensure_fts(self) -> bool:
+        if self.conn.execute("SELECT 1 FROM sqlite_master WHERE name='journal_fts'").fetchone():
+            return True
+        try:
+            self.conn.executescript("BEGIN;" + FTS_SCHEMA + "COMMIT;")
+            return True
+        except sqlite3.OperationalError:  # no FTS5 compiled in: haven.search uses its own index
+            if self.conn.in_transaction:
+                self.conn.execute("ROLLBACK")
+            return False
+
+    def _exec(self, sql, params=()):
+        with self.lock:
+            return self.conn.execute(sql, params)
+
+    def _write(self, sql, params=()):
+        with self.lock:
+            self._gen += 1
+            return self.conn.execute(sql, params)
+
+    def _cached(self, name: str, loader):
+        # data_version moves when another connection (worker) commits; _gen covers our own writes
+        with self.lock:
+            dv = self.conn.execute("PRAGMA data_version").fetchone()[0]
+        return CACHE.load((self.user_dir.name, f"{self.db_path}:{name}", self._gen, dv), loader)
+
+    def _batch(self):
+        store = self
+        class _Tx:
+            def __enter__(self):
+                store.lock.acquire()
+                store._gen += 1
+                store.conn.execute("BEGIN IMMEDIATE")
+                return store.conn
+            def __exit__(self, exc_type, *_):
+                try:
+                    store.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+                finally:
+                    store.lock.release()
+        return _Tx()
+
+    def meta(self, key, default=None):
+        row = self._exec("SELECT value FROM meta WHERE key=?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def set_meta(self, key, value):
+        self._write("INSERT INTO meta(key, value) VALUES(?, ?) "
+                   "ON CONFLICT(key) DO UPDATE SET value=excluded.value", (key, str(value)))
+
+    def load_journal(self):
+        def q():
+            with self.lock:
+                return pd.read_sql_query(
+                    "SELECT date, mood_1to5, emotion, note FROM journal ORDER BY id", self.conn)
+        return thaw(self._cached("journal", q))
+
+    def append_journal(self, row):
+        self._write("INSERT INTO journal(date, mood_1to5, emotion, note) VALUES(?, ?, ?, ?)",
+                   tuple(_none_if_nan(row.get(c)) for c in JOURNAL_COLS))
+
+    def search_journal(self, terms, date_from=None, date_to=None, moods=None):
+        where, params = [], []
+        if terms:
+            # every term is a quoted prefix query: "stress"* also finds "stressed"
+            where.append("id IN (SELECT rowid FROM journal_fts WHERE journal_fts MATCH ?)")
+            params.append(" AND ".join('"' + t.replace('"', '""') + '"*' for t in terms))
+        if date_from:
+            where.append("date >= ?"); params.append(str(date_from))
+        if date_to:
+            # dates are 'YYYY-MM-DD' (compare the day part only)
+            where.append("substr(date, 1, 10) <= ?"); params.append(str(date_to))
+        if moods:
+            where.append(f"mood_1to5 IN ({','.join('?' * len(moods))})"); params.extend(int(m) for m in moods)
+        sql = "SELECT date, mood_1to5, emotion, note FROM journal"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        with self.lock:
+            return pd.read_sql_query(sql + " ORDER BY id", self.conn, params=params)
+
+    def load_checkins(self):
+        rows = self._exec("SELECT timestamp, answers FROM checkins ORDER BY id").fetchall()
+        return [{"answers": json.loads(a), "timestamp": ts} for ts, a in rows]
+
+    def append_checkin(self, rec):
+        self._write("INSERT INTO checkins(timestamp, answers) VALUES(?, ?)",
+                   (rec.get("timestamp", ""), json.dumps(rec.get("answers"))))
+
+    def tail_checkins(self, n):
+        rows = self._exec("SELECT timestamp, answers FROM checkins ORDER BY id DESC LIMIT ?", (max(0, n),)).fetchall()
+        return [{"answers": json.loads(a), "timestamp": ts} for ts, a in reversed(rows)]
+
+    def load_gratitude(self):
+        return [r[0] for r in self._exec("SELECT line FROM gratitude ORDER BY id").fetchall()]
+
+    def append_gratitude(self, line):
+        self._write("INSERT INTO gratitude(line) VALUES(?)", (line,))
+
+    def count_gratitude(self):
+        return self._exec("SELECT count(*) FROM gratitude").fetchone()[0]
+
+    def tail_gratitude(self, n):
+        rows = self._exec("SELECT line FROM gratitude ORDER BY id DESC LIMIT ?", (max(0, n),)).fetchall()
+        return [r[0] for r in reversed(rows)]
+
+    def load_habits(self):
+        def q():
+            with self.lock:
+                return pd.read_sql_query(
+                    "SELECT date AS Date, habit AS Habit, done AS Done FROM habits ORDER BY rowid", self.conn)
+        return thaw(self._cached("habits", q))
+
+    def set_habits(self, date, updates):
+        with self._batch() as c:
+            c.executemany("INSERT INTO habits(date, habit, done) VALUES(?, ?, ?) "
+                          "ON CONFLICT(date, habit) DO UPDATE SET done=excluded.done",
+                          [(date, h, int(d)) for h, d in updates.items()])
+
+    def add_habit(self, date, habit):
+        self._write("INSERT OR IGNORE INTO habits(date, habit, done) VALUES(?, ?, 0)", (date, habit))
+
+    def delete_habit(self, habit):
+        self._write("DELETE FROM habits WHERE habit=?", (habit,))
+
+    def load_nutrition(self):
+        def q():
+            rows = self._exec("SELECT date, entry FROM nutrition_day ORDER BY date").fetchall()
+            return {d: json.loads(e) for d, e in rows}
+        return thaw(self._cached("nutrition_day", q))
+
+    def load_nutrition_range(self, start, end):
+        rows = self._exec("SELECT date, entry FROM nutrition_day WHERE date BETWEEN ? AND ? ORDER BY date",
+                          (start, end)).fetchall()
+        return {d: json.loads(e) for d, e in rows}
+
+    def iter_nutrition(self, page: int = 500):
+        # keyset pagination: the lock is never held while the caller consumes rows
+        last = ""
+        while True:
+            rows = self._exec("SELECT date, entry FROM nutrition_day WHERE date > ? ORDER BY date LIMIT ?",
+                              (last, page)).fetchall()
+            for d, e in rows:
+                yield d, json.loads(e)
+            if len(rows) < page:
+                return
+            last = rows[-1][0]
+
+    def _pages(self, sql, cols, chunk):
+        # keyset pagination on rowid, like iter_nutrition
+        last = 0
+        while True:
+            rows = self._exec(sql, (last, chunk)).fetchall()
+            if not rows:
+                return
+            yield pd.DataFrame([r[1:] for r in rows], columns=cols)
+            if len(rows) < chunk:
+                return
+            last = rows[-1][0]
+
+    def iter_journal(self, chunk=5000):
+        return self._pages("SELECT id, date, mood_1to5, emotion, note FROM journal WHERE id > ? "
+                           "ORDER BY id LIMIT ?", JOURNAL_COLS, chunk)
+
+    def iter_habits(self, chunk=5000):
+        return self._pages("SELECT rowid, date, habit, done FROM habits WHERE rowid > ? "
+                           "ORDER BY rowid LIMIT ?", HABIT_COLS, chunk)
+
+    def source_version(self, kind):
+        # any commit touches the db or its WAL (coarse: one version for every table)
+        return file_version(self.db_path), file_version(self.db_path.with_name(self.DB_NAME + "-wal"))
+
+    def put_nutrition_day(self, date, entry):
+        self._write("INSERT INTO nutrition_day(date, entry) VALUES(?, ?) "
+                   "ON CONFLICT(date) DO UPDATE SET entry=excluded.entry", (date, json.dumps(entry)))
+
+    def load_stats(self):
+        return {k: int(v) if v == int(v) else v for k, v in self._exec("SELECT key, value FROM stats").fetchall()}
+
+    def add_stats(self, deltas):
+        # one upsert per counter: concurrent sessions add up instead of overwriting each other
+        with self._batch() as c:
+            c.executemany("INSERT INTO stats(key, value) VALUES(?, ?) "
+                          "ON CONFLICT(key) DO UPDATE SET value=value+excluded.value", list(deltas.items()))
+
+    def reset_stats(self, counters):
+        with self._batch() as c:
+            c.execute("DELETE FROM stats")
+            c.execute("DELETE FROM docs WHERE name='stats'")   # whole-document summary of older versions
+            c.executemany("INSERT INTO stats(key, value) VALUES(?, ?)", list(counters.items()))
+
+    def load_doc(self, name, default):
+        def q():
+            row = self._exec("SELECT body FROM docs WHERE name=?", (name,)).fetchone()
+            if not row:
+                return default
+            try: return json.loads(row[0])
+            except Exception: return default
+        return thaw(self._cached(f"doc:{name}", q))
+
+    def save_doc(self, name, value):
+        self._write("INSERT INTO docs(name, body) VALUES(?, ?) "
+                   "ON CONFLICT(name) DO UPDATE SET body=excluded.body", (name, json.dumps(value)))
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+# ---------- One-shot migration: data/<uid>/*.csv|json -> haven.db ----------
+def migrate_files_to_sqlite(user_dir, store: SQLiteStore = None, force: bool = False) -> bool:
+    """Copy a legacy folder into its SQLite db. Returns False if it already ran."""
+    own = store is None
+    store = store or SQLiteStore(user_dir)
+    try:
+        if store.meta("migrated_from_files") and not force:
+            return False
+        legacy = FileStore(user_dir)
+        jdf = legacy.load_journal().reindex(columns=JOURNAL_COLS)
+        hdf = legacy.load_habits().reindex(columns=HABIT_COLS)
+        with store._batch() as c:
+            if force:
+                for t in ("journal", "checkins", "gratitude", "habits", "nutrition_day", "docs", "stats"):
+                    c.execute(f"DELETE FROM {t}")
+            c.executemany("INSERT INTO journal(date, mood_1to5, emotion, note) VALUES(?, ?, ?, ?)",
+                          [tuple(_none_if_nan(v) for v in r) for r in jdf.itertuples(index=False)])
+            c.executemany("INSERT INTO checkins(timestamp, answers) VALUES(?, ?)",
+                          [(r.get("timestamp", ""), json.dumps(r.get("answers")))
+                           for r in legacy.load_checkins() if isinstance(r, dict)])
+            c.executemany("INSERT INTO gratitude(line) VALUES(?)",
+                          [(str(x),) for x in legacy.load_gratitude()])
+            # legacy CSVs may hold duplicate (Date, Habit) rows: keep "done" if any of them was
+            c.executemany("INSERT INTO habits(date, habit, done) VALUES(?, ?, ?) "
+                          "ON CONFLICT(date, habit) DO UPDATE SET done=max(done, excluded.done)",
+                          [(str(d), str(h), int(_none_if_nan(x) or 0)) for d, h, x in hdf.itertuples(index=False)
+                           if _none_if_nan(d) is not None and _none_if_nan(h) is not None])
+            c.executemany("INSERT INTO nutrition_day(date, entry) VALUES(?, ?)",
+                          [(d, json.dumps(e)) for d, e in legacy.load_nutrition().items()])
+            c.executemany("INSERT INTO stats(key, value) VALUES(?, ?)", list(legacy.load_stats().items()))
+            for name in DOC_FILES:
+                if legacy.path(name).exists():
+                    c.execute("INSERT INTO docs(name, body) VALUES(?, ?)",
+                              (name, json.dumps(legacy.load_doc(name, None))))
+            c.execute("INSERT INTO meta(key, value) VALUES('migrated_from_files', ?) "
+                      "ON CONFLICT(key) DO UPDATE SET value=excluded.value",
+                      (time.strftime("%Y-%m-%d %H:%M:%S"),))
+        return True
+    finally:
+        if own:
+            store.close()
+
+
+# ---------- Factory (one store per user folder per process) ----------
+BACKENDS = {"files": FileStore, "sqlite": SQLiteStore}
+_STORES = {}
+_STORES_LOCK = threading.Lock()
+
+def open_store(user_dir, backend: str = None) -> Store:
+    backend = (backend or os.getenv("HAVEN_STORAGE", "sqlite")).strip().lower()
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown HAVEN_STORAGE backend: {backend!r} (use one of {sorted(BACKENDS)})")
+    key = (backend, str(Path(user_dir).resolve()))
+    with _STORES_LOCK:
+        store = _STORES.get(key)
+        if store is None:
+            store = BACKENDS[backend](user_dir)
+            if isinstance(store, SQLiteStore):
+                migrate_files_to_sqlite(user_dir, store=store)
+            _STORES[key] = store
+        return store
+
+def close_store(user_dir):
+    """Drop (and close) any open store for this folder, e.g. before deleting it."""
+    path = str(Path(user_dir).resolve())
+    with _STORES_LOCK:
+        for key in [k for k in _STORES if k[1] == path]:
+            _STORES.pop(key).close()
+
+
+if __name__ == "__main__":
+    # python -m haven.storage migrate [data_root]  — migrate every data/<uid>/ folder up front
+    import sys
+    if len(sys.argv) < 2 or sys.argv[1] != "migrate":
+        sys.exit("usage: python -m haven.storage migrate [data_root]")
+    root = Path(sys.argv[2] if len(sys.argv) > 2 else "data")
+    for d in sorted(p for p in root.iterdir() if p.is_dir()):
+        print(f"{d.name}: {'migrated' if migrate_files_to_sqlite(d) else 'already migrated'}")
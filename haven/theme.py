@@ -0,0 +1,201 @@
+# haven/theme.py — theme palettes and their stylesheets, built once per process
+#
+# Fonts are self-hosted: static/fonts/*.woff2 (Inter latin subset, Playfair Display; OFL, licenses
+# alongside) are declared with @font-face and fetched from the static route with a ?v= content hash,
+# so browsers cache them for good and nothing is requested from the internet.
+# theme_css() renders a palette into one minified <style> (font faces + theme + buttons) and keeps
+# it per theme name; Streamlit re-sends the element on each rerun, but it is no longer rebuilt.
+#   python -m haven.theme build   # print the size of each theme's stylesheet
+import re, sys, hashlib
+from pathlib import Path
+
+FONTS_DIR = Path(__file__).resolve().parent.parent / "static" / "fonts"   # next to mental_health.py
+
+THEMES = {
+    "Rose Bento (pink)": {
+        "bg_grad": "linear-gradient(180deg,#fff 0%,#fdeff4 40%,#f9dbe6 100%)",
+        "panel": "#fff5f8cc",
+        "card": "#f7c3d0",
+        "ink": "#3b2a2e",
+        "muted": "#7c6169",
+        "accent": "#d36b8a",
+        "accent_soft": "#fde4ec",
+        "radius": "22px",
+        "shadow": "0 14px 40px rgba(211,107,138,.25)",
+        "headline_font": "'Playfair Display', Georgia, serif",
+        "body_font": "Inter, ui-sans-serif, system-ui"
+    },
+    "Sage Calm (green)": {
+        "bg_grad": "linear-gradient(180deg,#ffffff 0%,#e9f0eb 40%,#dfe9e2 100%)",
+        "panel": "#ffffffcc",
+        "card": "#cfdccf",
+        "ink": "#273026",
+        "muted": "#5f6b60",
+        "accent": "#7aa184",
+        "accent_soft": "#e9f3ec",
+        "radius": "22px",
+        "shadow": "0 14px 40px rgba(122,161,132,.25)",
+        "headline_font": "'Playfair Display', Georgia, serif",
+        "body_font": "Inter, ui-sans-serif, system-ui"
+    }
+}
+
+# family, file, weight range, unicode-range (None = whole font)
+FONT_FACES = [
+    ("Inter", "Inter-latin-wght.woff2", "400 700",
+     "U+0000-00FF,U+0131,U+0152-0153,U+02BB-02BC,U+02C6,U+02DA,U+02DC,U+0304,U+0308,U+0329,"
+     "U+2000-206F,U+2074,U+20AC,U+2122,U+2191,U+2193,U+2212,U+2215,U+FEFF,U+FFFD"),
+    ("Playfair Display", "PlayfairDisplay-wght.woff2", "400 900", None),
+]
+
+BASE_CSS = """
+:root{
+  --bg-grad: {bg_grad};
+  --panel: {panel};
+  --card: {card};
+  --ink: {ink};
+  --muted: {muted};
+  --accent: {accent};
+  --accent-soft: {accent_soft};
+  --radius: {radius};
+  --shadow: {shadow};
+  --hfont: {headline_font};
+  --bfont: {body_font};
+}
+html, body { background: var(--bg-grad); }
+* { font-family: var(--bfont); color: var(--ink); }
+h1,h2,h3,h4 { font-family: var(--hfont); letter-spacing:.2px; color: var(--ink); }
+.hero {
+  background: radial-gradient(1200px 600px at -10% -10%, var(--accent-soft) 0%, #0000 60%),
+              radial-gradient(900px 500px at 110% -20%, #fff 0%, #0000 60%);
+  border-radius: 28px; padding: 28px; box-shadow: var(--shadow);
+  border: 1px solid rgba(0,0,0,.05);
+}
+.pin-card{ background:var(--panel); border-radius:var(--radius); box-shadow:var(--shadow); border:1px solid rgba(0,0,0,.06); padding:16px; margin-bottom:16px; backdrop-filter:blur(8px); }
+.pin-grid{ column-count:1; column-gap:16px; }
+@media(min-width:760px){ .pin-grid{ column-count:2; } }
+@media(min-width:1180px){ .pin-grid{ column-count:3; } }
+.chat-msg{ padding:12px 14px; border-radius:16px; margin:8px 0; max-width:95%; }
+.chat-user{ background:#fff; border:1px solid rgba(0,0,0,.08); }
+.chat-assistant{ background:var(--accent-soft); }
+.muted{ color:var(--muted); }
+.kpi{ background: var(--panel); border-radius: 16px; padding:14px 16px; box-shadow: var(--shadow); }
+.kpi .lbl{ font-size:.85rem; color:var(--muted); }
+.kpi .val{ font-size:1.4rem; font-weight:700; }
+.sidebar-card{ background:var(--panel); border-radius:16px; padding:14px; box-shadow:var(--shadow); border:1px solid rgba(0,0,0,.05); }
+.chip{ display:inline-block; padding:6px 10px; border-radius:999px; background: var(--accent-soft); margin-right:6px; }
+"""
+
+BUTTONS_CSS = """
+/* ---------- Pinterest-y buttons (global, form submit buttons included) ---------- */
+.stButton > button,
+.stFormSubmitButton > button{
+  width: 100%;
+  padding: 14px 18px;
+  border-radius: 18px;
+  border: 1px solid rgba(0,0,0,.06);
+  background: linear-gradient(180deg,#ffffff, #fff7fb);
+  color: var(--ink);
+  font-weight: 700;
+  letter-spacing: .2px;
+  box-shadow:
+    0 14px 30px rgba(211,107,138,.12),
+    0 2px 0 rgba(255,255,255,.85) inset;
+  transition: transform .18s ease, box-shadow .18s ease, filter .18s ease;
+}
+
+/* Hover / active lift */
+.stButton > button:hover,
+.stFormSubmitButton > button:hover{
+  transform: translateY(-2px);
+  box-shadow:
+    0 18px 40px rgba(211,107,138,.18),
+    0 2px 0 rgba(255,255,255,.95) inset;
+  filter: saturate(1.02);
+}
+.stButton > button:active,
+.stFormSubmitButton > button:active{
+  transform: translateY(0);
+  box-shadow:
+    0 8px 18px rgba(211,107,138,.14),
+    0 1px 0 rgba(255,255,255,.9) inset;
+}
+
+/* Subtle focus ring (accessible) */
+.stButton > button:focus,
+.stFormSubmitButton > button:focus{
+  outline: 2px solid rgba(211,107,138,.55) !important;
+  outline-offset: 2px;
+}
+
+/* Make your two hero CTAs feel bigger (first row of buttons after H1) */
+.block-container .stButton:first-child button,
+.block-container .stButton:nth-child(2) button{
+  padding: 16px 20px;
+  border-radius: 20px;
+  font-size: 1.05rem;
+}
+
+/* Optional: tiny, rounded "chip" nav vibe matches Pinterest */
+.stButton > button:not(:hover){
+  background-clip: padding-box;
+}
+
+/* ---------- (Optional) Neutralizer for places you DON'T want this look ----------
+Wrap a section with:
+st.markdown('<div class="btn-neutral">', unsafe_allow_html=True)
+...your widgets...
+st.markdown('</div>', unsafe_allow_html=True)
+*/
+.btn-neutral .stButton > button{
+  border-radius: 8px;
+  background: #fff;
+  box-shadow: none;
+  font-weight: 600;
+}
+.btn-neutral .stButton > button:hover{
+  transform:none; box-shadow:none; filter:none;
+}
+"""
+
+
+def minify(css: str) -> str:
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.S)
+    css = re.sub(r"\s+", " ", css)
+    css = re.sub(r"\s*([{};,>])\s*", r"\1", css)
+    css = re.sub(r"([{;])\s*([\w-]+)\s*:\s*", r"\1\2:", css)   # "prop : value" (keeps selector pseudo-classes intact)
+    return css.replace(";}", "}").strip()
+
+
+def font_faces() -> str:
+    rules = []
+    for family, name, weight, urange in FONT_FACES:
+        path = FONTS_DIR / name
+        if not path.exists():
+            continue  # falls back to the next font in the stack
+        v = hashlib.sha256(path.read_bytes()).hexdigest()[:12]
+        rules.append(f"@font-face{{font-family:'{family}';font-style:normal;font-weight:{weight};font-display:swap;"
+                     f"src:url('app/static/fonts/{name}?v={v}') format('woff2')"
+                     + (f";unicode-range:{urange}" if urange else "") + "}")
+    return "".join(rules)
+
+
+_built = {}
+
+
+def theme_css(name: str) -> str:
+    """The full minified <style> element for a theme (built on first use, then reused)."""
+    css = _built.get(name)
+    if css is None:
+        theme = THEMES[name]
+        base = re.sub(r"\{(\w+)\}", lambda m: theme.get(m.group(1), m.group(0)), BASE_CSS)
+        css = _built[name] = f"<style>{font_faces()}{minify(base + BUTTONS_CSS)}</style>"
+    return css
+
+
+if __name__ == "__main__":
+    # python -m haven.theme build
+    if len(sys.argv) < 2 or sys.argv[1] != "build":
+        sys.exit("usage: python -m haven.theme build")
+    for n in THEMES:
+        print(f"{n}: {len(theme_css(n)):,} bytes")
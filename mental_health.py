@@ -1,90 +1,42 @@
 # app.py — Mindful Haven (Inspo theme, per-user data, Gemini + Games)
-import os, re, time, json, random, hashlib, shutil
+import os, time, random, hashlib, shutil
+from functools import wraps
 from pathlib import Path
 import pandas as pd
 import plotly.express as px
 import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 from dotenv import load_dotenv
 import google.generativeai as genai
+from haven.storage import open_store, close_store
+from haven.state import DirtyTracker
+from haven.fsio import WRITER
+from haven.cache import CACHE
+from haven.llm import get_client
+from haven.respcache import get_response_cache, exact_key, text_key
+from haven.safety import classify, tone
+from haven.search import search_journal
+from haven.stats import Aggregates
+from haven.habits import HabitLog
+from haven.journal import Journal
+from haven.theme import THEMES, theme_css
+from haven.assets import variants, picture_html
+from haven.audio import audio_library, AUDIO_MIME, library_digests, remove_static_links
+from haven.exports import export_file, FORMATS as EXPORT_FORMATS
+from haven.components import BREATHING, breathing, reaction
+from haven.games import GameStats, ReactionStats, VERSION as GAMES_VERSION
 
 # ---------- App ----------
 st.set_page_config(page_title="Mindful Haven", page_icon="🧠", layout="wide")
 
 # ---------- Theme System (Rose Bento + Sage Calm) ----------
-THEMES = {
-    "Rose Bento (pink)": {
-        "bg_grad": "linear-gradient(180deg,#fff 0%,#fdeff4 40%,#f9dbe6 100%)",
-        "panel": "#fff5f8cc",
-        "card": "#f7c3d0",
-        "ink": "#3b2a2e",
-        "muted": "#7c6169",
-        "accent": "#d36b8a",
-        "accent_soft": "#fde4ec",
-        "radius": "22px",
-        "shadow": "0 14px 40px rgba(211,107,138,.25)",
-        "headline_font": "'Playfair Display', serif",
-        "body_font": "Inter, ui-sans-serif, system-ui"
-    },
-    "Sage Calm (green)": {
-        "bg_grad": "linear-gradient(180deg,#ffffff 0%,#e9f0eb 40%,#dfe9e2 100%)",
-        "panel": "#ffffffcc",
-        "card": "#cfdccf",
-        "ink": "#273026",
-        "muted": "#5f6b60",
-        "accent": "#7aa184",
-        "accent_soft": "#e9f3ec",
-        "radius": "22px",
-        "shadow": "0 14px 40px rgba(122,161,132,.25)",
-        "headline_font": "'Playfair Display', serif",
-        "body_font": "Inter, ui-sans-serif, system-ui"
-    }
-}
-
-def inject_theme(theme):
-    st.markdown(f"""
-    <style>
-    @import url('https://fonts.googleapis.com/css2?family=Inter:wght@400;600&family=Playfair+Display:wght@500;700&display=swap');
-    :root{{
-      --bg-grad: {theme['bg_grad']};
-      --panel: {theme['panel']};
-      --card: {theme['card']};
-      --ink: {theme['ink']};
-      --muted: {theme['muted']};
-      --accent: {theme['accent']};
-      --accent-soft: {theme['accent_soft']};
-      --radius: {theme['radius']};
-      --shadow: {theme['shadow']};
-      --hfont: {theme['headline_font']};
-      --bfont: {theme['body_font']};
-    }}
-    html, body {{ background: var(--bg-grad); }}
-    * {{ font-family: var(--bfont); color: var(--ink); }}
-    h1,h2,h3,h4 {{ font-family: var(--hfont); letter-spacing:.2px; color: var(--ink); }}
-    .hero {{
-      background: radial-gradient(1200px 600px at -10% -10%, var(--accent-soft) 0%, #0000 60%),
-                  radial-gradient(900px 500px at 110% -20%, #fff 0%, #0000 60%);
-      border-radius: 28px; padding: 28px; box-shadow: var(--shadow);
-      border: 1px solid rgba(0,0,0,.05);
-    }}
-    .pin-card{{ background:var(--panel); border-radius:var(--radius); box-shadow:var(--shadow); border:1px solid rgba(0,0,0,.06); padding:16px; margin-bottom:16px; backdrop-filter:blur(8px); }}
-    .pin-grid{{ column-count:1; column-gap:16px; }}
-    @media(min-width:760px){{ .pin-grid{{ column-count:2; }} }}
-    @media(min-width:1180px){{ .pin-grid{{ column-count:3; }} }}
-    .chat-msg{{ padding:12px 14px; border-radius:16px; margin:8px 0; max-width:95%; }}
-    .chat-user{{ background:#fff; border:1px solid rgba(0,0,0,.08); }}
-    .chat-assistant{{ background:var(--accent-soft); }}
-    .muted{{ color:var(--muted); }}
-    .kpi{{ background: var(--panel); border-radius: 16px; padding:14px 16px; box-shadow: var(--shadow); }}
-    .kpi .lbl{{ font-size:.85rem; color:var(--muted); }}
-    .kpi .val{{ font-size:1.4rem; font-weight:700; }}
-    .sidebar-card{{ background:var(--panel); border-radius:16px; padding:14px; box-shadow:var(--shadow); border:1px solid rgba(0,0,0,.05); }}
-    .chip{{ display:inline-block; padding:6px 10px; border-radius:999px; background: var(--accent-soft); margin-right:6px; }}
-    </style>
-    """, unsafe_allow_html=True)
+# palettes + stylesheet live in haven/theme.py (self-hosted fonts, minified CSS built once per theme)
+def inject_theme(name):
+    st.markdown(theme_css(name), unsafe_allow_html=True)
 
 # Use a fixed default theme (can change to "Sage Calm (green)" if you prefer)
 _theme = "Rose Bento (pink)"
-inject_theme(THEMES[_theme])
+inject_theme(_theme)
 
 # --------- Safety / Disclaimer panel ---------
 # --------- Minimal, Pinterest-style disclaimer ---------
@@ -107,78 +59,6 @@ st.sidebar.markdown("""
 """, unsafe_allow_html=True)
 
 
-# >>> place immediately after inject_theme(THEMES[_theme])
-st.markdown("""
-<style>
-/* ---------- Pinterest-y buttons (global) ---------- */
-.stButton > button{
-  width: 100%;
-  padding: 14px 18px;
-  border-radius: 18px;
-  border: 1px solid rgba(0,0,0,.06);
-  background: linear-gradient(180deg,#ffffff, #fff7fb);
-  color: var(--ink);
-  font-weight: 700;
-  letter-spacing: .2px;
-  box-shadow:
-    0 14px 30px rgba(211,107,138,.12),
-    0 2px 0 rgba(255,255,255,.85) inset;
-  transition: transform .18s ease, box-shadow .18s ease, filter .18s ease;
-}
-
-/* Hover / active lift */
-.stButton > button:hover{
-  transform: translateY(-2px);
-  box-shadow:
-    0 18px 40px rgba(211,107,138,.18),
-    0 2px 0 rgba(255,255,255,.95) inset;
-  filter: saturate(1.02);
-}
-.stButton > button:active{
-  transform: translateY(0);
-  box-shadow:
-    0 8px 18px rgba(211,107,138,.14),
-    0 1px 0 rgba(255,255,255,.9) inset;
-}
-
-/* Subtle focus ring (accessible) */
-.stButton > button:focus{
-  outline: 2px solid rgba(211,107,138,.55) !important;
-  outline-offset: 2px;
-}
-
-/* Make your two hero CTAs feel bigger (first row of buttons after H1) */
-.block-container .stButton:first-child button,
-.block-container .stButton:nth-child(2) button{
-  padding: 16px 20px;
-  border-radius: 20px;
-  font-size: 1.05rem;
-}
-
-/* Optional: tiny, rounded "chip" nav vibe matches Pinterest */
-.stButton > button:not(:hover){
-  background-clip: padding-box;
-}
-
-/* ---------- (Optional) Neutralizer for places you DON'T want this look ----------
-Wrap a section with:
-st.markdown('<div class="btn-neutral">', unsafe_allow_html=True)
-...your widgets...
-st.markdown('</div>', unsafe_allow_html=True)
-*/
-.btn-neutral .stButton > button{
-  border-radius: 8px;
-  background: #fff;
-  box-shadow: none;
-  font-weight: 600;
-}
-.btn-neutral .stButton > button:hover{
-  transform:none; box-shadow:none; filter:none;
-}
-</style>
-""", unsafe_allow_html=True)
-
-
 # ---------- Small nav helper ----------
 def _nav_to(name: str, **state):
     for k, v in state.items():
@@ -199,6 +79,9 @@ def normalize_model(name: str) -> str:
     if any(b in name.lower() for b in banned): return "models/gemini-2.5-flash-lite"
     return name if name.startswith("models/") else f"models/{name}"
 MODEL = normalize_model(RAW_MODEL)
+# shared client: reused model, bounded worker pool, per-call deadline (HAVEN_LLM_TIMEOUT)
+LLM = get_client(MODEL)
+REPLIES = get_response_cache()  # repeatable prompts (CBT, affirmations) served from data/llm_responses.db
 
 # --- Do NOT ping Gemini globally (prevents 429s on every rerun) ---
 def require_gemini():
@@ -218,6 +101,18 @@ def pick_asset(basename: str):
             return p
     return ASSETS_DIR / f"{basename}.jpeg"
 
+def show_image(path, sizes: str = "100vw", caption: str = None, where=st):
+    # resized WebP/AVIF variants (haven/assets.py); the browser picks one through the static route
+    v = variants(path)
+    if v is None:
+        where.image(str(path), caption=caption, use_column_width=True)
+    elif not st.get_option("server.enableStaticServing"):
+        where.image(str(v.best(960)), caption=caption, use_column_width=True)
+    else:
+        where.markdown(picture_html(v, sizes, alt=caption or ""), unsafe_allow_html=True)
+        if caption:
+            where.caption(caption)
+
 LOGO_PRIMARY = pick_asset("logo_primary")      # your app logo (image 2)
 POSTER_OKAY  = pick_asset("poster_okay")       # “It’s okay to not be okay” (image 1)
 NUTRITION_BANNER = pick_asset("nutrition_banner")
@@ -235,7 +130,7 @@ if not username.strip():
         unsafe_allow_html=True,
     )
     if POSTER_OKAY.exists():
-        st.image(str(POSTER_OKAY), use_column_width=True)
+        show_image(POSTER_OKAY)
     else:
         st.info("Add assets/poster_okay.(png/jpg/jpeg/webp)")
     st.stop()
@@ -251,59 +146,70 @@ st.sidebar.caption(f"Profile ID: `{USER_ID}`")
 
 # Show logo under Profile ID (per your request)
 if LOGO_PRIMARY.exists():
-    st.sidebar.image(str(LOGO_PRIMARY), use_column_width=True)
+    show_image(LOGO_PRIMARY, "300px", where=st.sidebar)
 
 # ---------- Paths ----------
 JOURNAL_CSV = USER_DIR / "journal.csv"
-CHECKINS_JSON = USER_DIR / "checkins.json"
+CHECKINS_JSONL = USER_DIR / "checkins.jsonl"      # append-only log (+ .idx offsets)
 HABITS_CSV = USER_DIR / "habits.csv"
-GRATITUDE_JSON = USER_DIR / "gratitude.json"
+GRATITUDE_JSONL = USER_DIR / "gratitude.jsonl"
 NOTES_TXT = USER_DIR / "session_notes.txt"
 GAMES_JSON = USER_DIR / "games.json"
 # --- Nutrition files ---
-NUTRITION_JSON = USER_DIR / "nutrition_day.json"        # per-day entries (dict keyed by date)
+NUTRITION_JSON = USER_DIR / "nutrition_day.json"        # legacy per-day file (split into nutrition/<YYYY-MM>.json by the store)
 NUTRITION_GOALS_JSON = USER_DIR / "nutrition_goals.json"  # weekly goals + checklist
 MOODY_JSON = USER_DIR / "moody_melody.json"
-AUDIO_DIR = USER_DIR / "audio"
+AUDIO_DIR = USER_DIR / "audio"   # uploads: <sha256>.<ext> + index.json (haven/audio.py)
 AUDIO_DIR.mkdir(parents=True, exist_ok=True)
+# --- Storage backend (HAVEN_STORAGE=sqlite|files) ---
+STORE = open_store(USER_DIR)
+# a run that ended in st.rerun() never reaches the end of the script: commit its writes now
+WRITER.end_run()
 
 
 
 # ---------- State ----------
 ss = st.session_state
-def df_safe(path: Path, cols):
-    if path.exists():
-        try: return pd.read_csv(path)
-        except Exception: pass
-    return pd.DataFrame(columns=cols)
-
-def load_json(path: Path, default):
-    try:
-        if path.exists() and path.stat().st_size > 0:
-            with open(path, "r", encoding="utf-8") as f:
-                return json.load(f)
-    except Exception:
-        pass
-    return default
-
 ss.setdefault("chat", [])
-ss.setdefault("journal_df", df_safe(JOURNAL_CSV, ["date","mood_1to5","emotion","note"]))
-ss.setdefault("gratitude", load_json(GRATITUDE_JSON, []))
-ss.setdefault("habits", df_safe(HABITS_CSV, ["Date","Habit","Done"]))
+if "journal" not in ss:
+    ss.journal = Journal(STORE.load_journal())  # appends are O(1); frame() builds the DataFrame lazily
+if "habit_log" not in ss:
+    ss.habit_log = HabitLog.from_frame(STORE.load_habits())  # (date, habit) -> done bits
 ss.setdefault("reflection_answers", [""]*5)
 ss.setdefault("last_was_stress", False)
 ss.setdefault("exercise_streak", 0)
 ss.setdefault("reflection_streak", 0)
 ss.setdefault("last_tone", "neutral")
-ss.setdefault("games", load_json(GAMES_JSON, {"reaction": [], "stroop_best": 0}))
+if "games" not in ss:
+    _games_doc = STORE.load_doc("games", {})
+    ss.games = GameStats.from_doc(_games_doc)   # running aggregates, not the full list of plays
+    ss.affirmations = STORE.load_doc("affirmations", [])
+    if _games_doc.get("version") != GAMES_VERSION:
+        # older games.json: a list of every reaction time, saved affirmations inline
+        if _games_doc.get("affirmations_saved"):
+            ss.affirmations = _games_doc["affirmations_saved"] + ss.affirmations
+            STORE.save_doc("affirmations", ss.affirmations)
+        if _games_doc:
+            STORE.save_doc("games", ss.games.to_doc())
 ss.setdefault("current_page", "🏠 Home")
 # --- Nutrition state defaults ---
 today_str = time.strftime("%Y-%m-%d")
-ss.setdefault("nutrition_day", load_json(NUTRITION_JSON, {}))     # {date: {...}}
-ss.setdefault("nutrition_goals", load_json(NUTRITION_GOALS_JSON, {
+ss.setdefault("nutrition_goals", STORE.load_doc("nutrition_goals", {
     "goals": ["Drink 3L water", "Eat 5 servings veggies", "No sugary drink 5/7 days"],
     "weekly_checks": {d: {"Fruit": False, "Veggies": False, "No sugary drink": False} for d in ["Mon","Tue","Wed","Thu","Fri","Sat","Sun"]}
 }))
+# --- Dirty tracking: remember what is on disk so reruns only write real changes ---
+if "persist" not in ss:
+    ss.persist = DirtyTracker()
+    ss.persist.mark_clean("nutrition_goals", ss.nutrition_goals)
+ss.persist.begin_run()
+# only the last 7 days of nutrition are kept in the session (the week chart + today);
+# reloaded when the date rolls over, older months are never read outside the export
+if ss.get("nutrition_window", ("", ""))[1] != today_str:
+    ss.nutrition_window = ((pd.Timestamp(today_str) - pd.Timedelta(days=6)).strftime("%Y-%m-%d"), today_str)
+    ss.nutrition_day = STORE.load_nutrition_range(*ss.nutrition_window)  # {date: {...}}
+    if today_str in ss.nutrition_day:
+        ss.persist.mark_clean(f"nutrition_day/{today_str}", ss.nutrition_day[today_str])
 if today_str not in ss.nutrition_day:
     ss.nutrition_day[today_str] = {
         "water_glasses": 0,            # 0..12
@@ -311,7 +217,7 @@ if today_str not in ss.nutrition_day:
         "calories": 0, "protein": 0, "carbs": 0, "fat": 0,
         "notes": "", "mood_after_meals": 3  # 1..5
     }
-ss.setdefault("melody", load_json(MOODY_JSON, {
+ss.setdefault("melody", STORE.load_doc("melody", {
     "playlists": {
         "Calm Mix": []  # list of tracks dicts
     },
@@ -320,51 +226,90 @@ ss.setdefault("melody", load_json(MOODY_JSON, {
 
 
 
-# ---------- Persistence helpers ----------
-def save_journal(df):
-    df.to_csv(JOURNAL_CSV, index=False)
-    ss.journal_df = df
+# ---------- Persistence helpers (row-level: only the changed entity is written) ----------
+def load_stats():
+    # streaks / per-day moods / emotion counts, kept up to date by save_journal
+    agg = Aggregates(STORE.load_stats())
+    if not agg.matches(ss.journal):
+        agg = Aggregates.build(ss.journal.frame())
+        STORE.reset_stats(agg.counters())
+    return agg
+
+def save_journal(row):
+    STORE.append_journal(row)
+    ss.journal.append(row)
+    # only the deltas are stored (added atomically), so concurrent sessions' counts add up
+    STORE.add_stats(ss.stats.add_journal(row))
 
 def save_checkin(answers):
-    data = []
-    if CHECKINS_JSON.exists() and CHECKINS_JSON.stat().st_size>0:
-        try: data = json.load(open(CHECKINS_JSON))
-        except Exception: data = []
-    data.append({"answers":answers, "timestamp": time.strftime("%Y-%m-%d %H:%M:%S")})
-    json.dump(data, open(CHECKINS_JSON,"w"), indent=2)
+    STORE.append_checkin({"answers":answers, "timestamp": time.strftime("%Y-%m-%d %H:%M:%S")})
+
+def save_gratitude(line):
+    STORE.append_gratitude(line)
 
-def save_gratitude():
-    json.dump(ss.gratitude, open(GRATITUDE_JSON,"w"), indent=2)
+def save_habits(date, updates):
+    # updates: {habit: 0/1} for one day; one Store write for the whole batch, skipped if nothing changed
+    changed = ss.habit_log.set(date, updates)
+    if changed:
+        STORE.set_habits(date, changed)
 
-def save_habits():
-    ss.habits.to_csv(HABITS_CSV, index=False)
+def add_habit(date, habit):
+    if ss.habit_log.add(date, habit):
+        STORE.add_habit(date, habit)
+
+def delete_habit(habit):
+    ss.habit_log.remove(habit)
+    STORE.delete_habit(habit)
 
 def save_games():
-    json.dump(ss.games, open(GAMES_JSON,"w"), indent=2)
+    STORE.save_doc("games", ss.games.to_doc())
+
+def save_affirmation(text):
+    ss.affirmations.append({"text": text, "ts": time.strftime("%Y-%m-%d %H:%M")})
+    STORE.save_doc("affirmations", ss.affirmations)
 
-def save_nutrition_day():
-    json.dump(ss.nutrition_day, open(NUTRITION_JSON, "w"), indent=2)
+def save_nutrition_day(date):
+    entry = ss.nutrition_day[date]
+    ss.persist.flush(f"nutrition_day/{date}", entry, lambda: STORE.put_nutrition_day(date, entry))
 
 def save_nutrition_goals():
-    json.dump(ss.nutrition_goals, open(NUTRITION_GOALS_JSON, "w"), indent=2)
+    # called on every Nutrition rerun; only writes when goals/checklist actually changed
+    ss.persist.flush("nutrition_goals", ss.nutrition_goals,
+                     lambda: STORE.save_doc("nutrition_goals", ss.nutrition_goals))
 
 def save_melody():
-    json.dump(ss.melody, open(MOODY_JSON, "w"), indent=2)
+    STORE.save_doc("melody", ss.melody)
 
+if "stats" not in ss:
+    ss.stats = load_stats()
 
+# ---------- Audio playback ----------
+PLAYLIST_PAGE = 20
 
-# ---------- Safety & Emotion ----------
-CRISIS = [r"\bi want to die\b", r"\bsuicide\b", r"\bkill myself\b", r"\bself[- ]harm\b", r"\bending it all\b", r"\bno reason to live\b"]
-def crisis(text): t=text.lower().strip(); return any(re.search(p,t) for p in CRISIS)
-def stress(text): t=text.lower(); return any(w in t for w in ["stress","anxiety","overwhelmed","panic","sad","lonely","depressed","tired"])
-def tone(text):
-    t=text.lower()
-    pos=any(x in t for x in ["grateful","hopeful","better","calm","good","proud","glad","relieved"])
-    neg=any(x in t for x in ["anxious","panic","sad","angry","overwhelmed","tired","drained","depressed","worthless"])
-    if pos and not neg: return "positive"
-    if neg and not pos: return "negative"
-    return "neutral"
+# uploads are private: never linked into static/ (older versions did; take those links down)
+remove_static_links()
+
+def audio_player(where, track):
+    # st.audio serves the file from the session's media route (Range requests, right MIME type)
+    if not os.path.isfile(track["path"]):
+        where.caption("File missing")
+        return
+    where.audio(track["path"], format=AUDIO_MIME.get(Path(track["path"]).suffix.lower(), "audio/wav"), autoplay=True)
 
+# ---------- Exports ----------
+def export_button(where, kind: str, fmt: str):
+    # built (or reused from data/<uid>/exports while the source is unchanged) only after a click
+    name = f"{kind}.{fmt}"
+    if where.button(f"Prepare {name}", key=f"export_{kind}_{fmt}"):
+        path = export_file(STORE, kind, fmt)
+        where.download_button(f"⬇️ Download {name}", data=path.read_bytes(),
+                              file_name=f"{kind}_{USER_ID}.{fmt}", key=f"export_{kind}_{fmt}_dl",
+                              mime="text/csv" if fmt == "csv" else None)
+
+
+
+# ---------- Safety & Emotion ----------
+# crisis / stress / tone come from one precompiled pattern: haven/safety.py (extra terms via HAVEN_LEXICON)
 HELPLINES = [
     "KIRAN (India): 1800 599 0019",
     "Tele-MANAS (India): 080-4611 0007 / 14416",
@@ -427,6 +372,7 @@ with st.expander("📝 Prompt of the day", expanded=False):
         ss["_nav"] = "📓 Journal"
         # prefill Q1 with the prompt
         ss.reflection_answers[0] = prompts[idx]
+        ss.pop("ref_0", None)
         st.rerun()
 
 
@@ -435,11 +381,31 @@ page = ss.pop("_nav", ss.get("current_page", "🏠 Home"))
 ss.current_page = page
 
 # ---------- Pages ----------
-if page == "🏠 Home":
+# Each page is a fragment: a click on one of its widgets reruns just that page function, not the
+# bootstrap, hero, nav and sidebar above. Navigation (_nav_to) still reruns the whole app.
+def page_fragment(fn):
+    @st.fragment
+    @wraps(fn)
+    def run():
+        ss.persist.begin_run()
+        try:
+            fn()
+        finally:
+            WRITER.end_run()  # a fragment rerun never reaches the end of the script
+    return run
+
+def rerun_page():
+    # rebuild only the current page when we're already in its fragment rerun (fragment-scoped
+    # reruns aren't allowed during a full run)
+    ctx = get_script_run_ctx()
+    st.rerun(scope="fragment" if ctx is not None and ctx.fragment_ids_this_run else "app")
+
+@page_fragment
+def page_home():
     c1,c2,c3,c4 = st.columns(4)
-    c1.markdown(f"<div class='kpi'><div class='lbl'>Reflections</div><div class='val'>{len(ss.journal_df)}</div></div>", unsafe_allow_html=True)
-    c2.markdown(f"<div class='kpi'><div class='lbl'>Gratitudes</div><div class='val'>{len(ss.gratitude)}</div></div>", unsafe_allow_html=True)
-    c3.markdown(f"<div class='kpi'><div class='lbl'>Habits</div><div class='val'>{len(ss.habits)}</div></div>", unsafe_allow_html=True)
+    c1.markdown(f"<div class='kpi'><div class='lbl'>Reflections</div><div class='val'>{ss.stats.entries()}</div></div>", unsafe_allow_html=True)
+    c2.markdown(f"<div class='kpi'><div class='lbl'>Gratitudes</div><div class='val'>{STORE.count_gratitude()}</div></div>", unsafe_allow_html=True)
+    c3.markdown(f"<div class='kpi'><div class='lbl'>Habits</div><div class='val'>{len(ss.habit_log)}</div></div>", unsafe_allow_html=True)
     c4.markdown(f"<div class='kpi'><div class='lbl'>Breath Sessions</div><div class='val'>{ss.exercise_streak}</div></div>", unsafe_allow_html=True)
 
     st.write("")
@@ -450,9 +416,7 @@ if page == "🏠 Home":
         note = st.text_input("One-line note")
         if st.button("Save quick check-in"):
             row = {"date": time.strftime("%Y-%m-%d"), "mood_1to5": m, "emotion": tone(note), "note": note}
-            df = ss.journal_df
-            df = pd.concat([df, pd.DataFrame([row])], ignore_index=True)
-            save_journal(df)
+            save_journal(row)
             ss.reflection_streak += 1
             if m <= 2:
                 with st.expander("Helplines (India)"):
@@ -463,12 +427,12 @@ if page == "🏠 Home":
         g = st.text_input("I’m grateful for...")
         if st.button("Add gratitude"):
             if g.strip():
-                ss.gratitude.append(f"{time.strftime('%Y-%m-%d')}: {g.strip()}")
-                save_gratitude()
-        if ss.gratitude:
+                save_gratitude(f"{time.strftime('%Y-%m-%d')}: {g.strip()}")
+        wall = STORE.tail_gratitude(12)
+        if wall:
             st.markdown("<div class='pin-grid'>" + "".join(
                 [f"<div class='pin-card'><b>{x.split(':',1)[0]}</b><br>{x.split(':',1)[1].strip()}</div>"
-                 for x in ss.gratitude[-12:]]
+                 for x in wall]
             ) + "</div>", unsafe_allow_html=True)
 
     with colB:
@@ -480,22 +444,25 @@ if page == "🏠 Home":
         st.subheader("Session Notes")
         notes = st.text_area("Jot down anything to remember later", value=NOTES_TXT.read_text() if NOTES_TXT.exists() else "", height=180)
         if st.button("Save notes", use_container_width=True):
-            NOTES_TXT.write_text(notes)
+            WRITER.write_text(NOTES_TXT, notes)
             st.success("Notes saved.")
 
     st.write("")
     # Home poster (image 1)
     if POSTER_OKAY.exists():
-        st.image(str(POSTER_OKAY), use_column_width=True)
+        show_image(POSTER_OKAY)
 
-elif page == "💬 Chat":
+@page_fragment
+def page_chat():
     left, right = st.columns([1.5,1], gap="large")
     with left:
         st.subheader("I’m here to listen")
         u = st.chat_input("How are you feeling today?")
+        pending = None  # prompt whose reply streams in below the history
         if u:
-            ss.last_tone = tone(u)
-            if crisis(u):
+            sig = classify(u)  # crisis + stress + tone in one scan
+            ss.last_tone = sig.tone
+            if sig.crisis:
                 ss.chat.append(("assistant",
                     "I’m really glad you told me. If you’re in immediate danger or considering self-harm, "
                     "please reach out to local emergency services or someone you trust right now. You deserve support."))
@@ -503,24 +470,29 @@ elif page == "💬 Chat":
                     for h in HELPLINES: st.markdown(f"- {h}")
             else:
                 ss.chat.append(("user", u))
-                ss.last_was_stress = stress(u)
-                try:
-                    m = genai.GenerativeModel(MODEL)
-                    r = m.generate_content(
-                        "You are a warm AI therapist. Validate feelings, avoid diagnosis. "
-                        "Offer one gentle suggestion or grounding step if appropriate.\n\nUser: "+u,
-                        generation_config={"temperature":0.7,"max_output_tokens":350}
-                    )
-                    reply = (getattr(r,"text","") or "").strip() or \
-                            "I’m here with you. What would feel supportive in this moment?"
-                except Exception:
-                    reply = "Let’s try a quick grounding: 5 things you see, 4 you can touch, 3 you hear, 2 you smell, 1 you taste."
-                ss.chat.append(("assistant", reply))
+                ss.last_was_stress = sig.stress
+                pending = ("You are a warm AI therapist. Validate feelings, avoid diagnosis. "
+                           "Offer one gentle suggestion or grounding step if appropriate.\n\nUser: "+u)
 
         for role,msg in ss.chat[-60:]:
             cls = "chat-user" if role=="user" else "chat-assistant"
             st.markdown(f"<div class='chat-msg {cls}'>{msg}</div>", unsafe_allow_html=True)
 
+        if pending:
+            # stream the reply into its bubble, then commit the final text to the history
+            bubble = st.empty()
+            reply = ""
+            try:
+                for chunk in LLM.stream(pending, generation_config={"temperature":0.7,"max_output_tokens":350}):
+                    reply += chunk
+                    bubble.markdown(f"<div class='chat-msg chat-assistant'>{reply}▍</div>", unsafe_allow_html=True)
+                reply = reply.strip() or "I’m here with you. What would feel supportive in this moment?"
+            except Exception:
+                reply = reply.strip() or \
+                        "Let’s try a quick grounding: 5 things you see, 4 you can touch, 3 you hear, 2 you smell, 1 you taste."
+            bubble.markdown(f"<div class='chat-msg chat-assistant'>{reply}</div>", unsafe_allow_html=True)
+            ss.chat.append(("assistant", reply))
+
         if ss.last_was_stress:
             st.write("")
             st.subheader("Suggestions")
@@ -538,18 +510,10 @@ elif page == "💬 Chat":
             for h in HELPLINES: st.markdown(f"- {h}")
         st.markdown("</div>", unsafe_allow_html=True)
 
-elif page == "📓 Journal":
-    from datetime import datetime, timedelta
-
+@page_fragment
+def page_journal():
     st.subheader("Daily Reflection")
 
-    # ---------- Ensure DataFrame structure ----------
-    df = ss.journal_df.copy()
-    for col in ["date", "mood_1to5", "emotion", "note"]:
-        if col not in df.columns:
-            df[col] = "" if col != "mood_1to5" else None
-    ss.journal_df = df
-
     # ---------- Reflection form ----------
     qs = [
         "1) Highlight of your day",
@@ -562,15 +526,17 @@ elif page == "📓 Journal":
         if not isinstance(ss.reflection_answers, list) or len(ss.reflection_answers) < 5:
             ss.reflection_answers = (ss.reflection_answers + [""] * 5)[:5]
 
-        ans = []
-        for i, q in enumerate(qs):
-            val = st.text_input(q, value=ss.reflection_answers[i], key=f"ref_{i}")
-            ans.append(val)
+        # one form: typing stays in the browser, the server reruns once on "Save reflection"
+        for i in range(len(qs)):
+            ss.setdefault(f"ref_{i}", ss.reflection_answers[i])
+        with st.form("reflection_form", border=False):
+            ans = [st.text_input(q, key=f"ref_{i}") for i, q in enumerate(qs)]
 
-        # Mood as slider (no crash on invalid input)
-        mood = st.slider("5) Mood 1–5", 1, 5, 3, key="ref_mood_slider")
+            # Mood as slider (no crash on invalid input)
+            mood = st.slider("5) Mood 1–5", 1, 5, 3, key="ref_mood_slider")
+            submitted = st.form_submit_button("Save reflection")
 
-        if st.button("Save reflection"):
+        if submitted:
             ss.reflection_answers[:4] = ans[:4]
             row = {
                 "date": time.strftime("%Y-%m-%d"),
@@ -578,10 +544,7 @@ elif page == "📓 Journal":
                 "emotion": tone(" ".join(ans[:4])),
                 "note": ans[0] or "",
             }
-            df = ss.journal_df.copy()
-            df["mood_1to5"] = pd.to_numeric(df["mood_1to5"], errors="coerce")
-            df = pd.concat([df, pd.DataFrame([row])], ignore_index=True)
-            save_journal(df)
+            save_journal(row)
 
             if int(mood) <= 2:
                 with st.expander("Helplines (India)"):
@@ -598,61 +561,59 @@ elif page == "📓 Journal":
 
     # ---------- Search & view reflections ----------
     st.write("")
-    df = ss.journal_df.copy()
-    if df.empty:
+    if ss.journal.empty:
         st.info("No entries yet — add your first reflection.")
     else:
-        q = st.text_input("Search reflections", placeholder="Search by note or emotion...")
-        df["note"] = df["note"].fillna("")
-        df["emotion"] = df["emotion"].fillna("")
-
-        if q:
-            ql = q.lower().strip()
-            df = df[df.apply(
-                lambda r: ql in r["note"].lower() or ql in r["emotion"].lower(),
-                axis=1
-            )]
+        q = st.text_input("Search reflections", placeholder='Search by note or emotion... (several words, or "a phrase")')
+        with st.expander("Filters"):
+            fc1, fc2 = st.columns(2)
+            span = fc1.date_input("Date range", value=(), key="journal_search_dates")
+            moods = fc2.multiselect("Mood", [1, 2, 3, 4, 5], key="journal_search_moods")
+        d_from = span[0].isoformat() if len(span) > 0 else None
+        d_to = span[-1].isoformat() if len(span) > 0 else None
+        if q or d_from or moods:
+            # vectorized scan over a cached lower-cased column (HAVEN_SEARCH=fts: no frame built)
+            df = search_journal(ss.journal, q, d_from, d_to, moods, store=STORE, user=USER_DIR.name)
+            st.caption(f"{len(df)} matching entr{'y' if len(df) == 1 else 'ies'}")
+        else:
+            df = ss.journal.tail(12)  # no filter: only the last cards, no full frame
 
         if df.empty:
             st.info("No matching entries.")
         else:
             cards = []
-            for _, r in df.tail(12).iterrows():
+            for r in df.tail(12).fillna({"note": "", "emotion": ""}).to_dict("records"):
+                mood_txt = "" if pd.isna(r.get("mood_1to5")) else int(r["mood_1to5"])
                 cards.append(
                     f"<div class='pin-card'><h4 style='margin:.2rem 0'>{r.get('date','')}</h4>"
-                    f"<div class='small muted'>Mood: {r.get('mood_1to5','')}/5 • Emotion: <b>{r.get('emotion','')}</b></div>"
+                    f"<div class='small muted'>Mood: {mood_txt}/5 • Emotion: <b>{r.get('emotion','')}</b></div>"
                     f"<p>{(r.get('note','') or '')[:220]}</p></div>"
                 )
             st.markdown("<div class='pin-grid'>" + "".join(cards) + "</div>", unsafe_allow_html=True)
 
     # ---------- Reflection streaks ----------
-    df_streak = ss.journal_df.copy()
-    if not df_streak.empty and "date" in df_streak.columns:
-        dts = pd.to_datetime(df_streak["date"], errors="coerce").dropna().dt.date
-        if not dts.empty:
-            today = datetime.strptime(time.strftime("%Y-%m-%d"), "%Y-%m-%d").date()
-            present = set(sorted(dts.unique()))
-            streak, cursor = 0, today
-            while cursor in present:
-                streak += 1
-                cursor = cursor - timedelta(days=1)
-            badge = "🌱" if streak >= 1 else ""
-            if streak >= 3: badge = "🌿"
-            if streak >= 7: badge = "🌸"
-            if streak >= 14: badge = "🌷"
-            if streak >= 30: badge = "💮"
-            st.markdown(
-                f"<div class='pin-card'>Reflection streak: <b>{int(streak)}</b> days {badge}</div>",
-                unsafe_allow_html=True,
-            )
+    # maintained by save_journal (haven/stats.py): no rescan of the history here
+    if ss.stats.entries():
+        streak = ss.stats.current_streak(time.strftime("%Y-%m-%d"))
+        badge = "🌱" if streak >= 1 else ""
+        if streak >= 3: badge = "🌿"
+        if streak >= 7: badge = "🌸"
+        if streak >= 14: badge = "🌷"
+        if streak >= 30: badge = "💮"
+        st.markdown(
+            f"<div class='pin-card'>Reflection streak: <b>{int(streak)}</b> days {badge}"
+            f" <span class='small muted'>· longest {ss.stats.longest_streak()}</span></div>",
+            unsafe_allow_html=True,
+        )
 
-elif page == "🍎 Nutrition":
+@page_fragment
+def page_nutrition():
     st.subheader("Weekly Nutrition Planner")
     st.caption("Small steps every day 🌷")
 
     # --- Top banner ---
     if NUTRITION_BANNER.exists():
-        st.image(str(NUTRITION_BANNER), use_column_width=True)
+        show_image(NUTRITION_BANNER)
     else:
         st.markdown(
             "<div class='pin-card' style='height:150px;"
@@ -698,14 +659,14 @@ elif page == "🍎 Nutrition":
                     goals_list.pop(i)
                     ss.nutrition_goals["goals"] = goals_list
                     save_nutrition_goals()
-                    st.rerun()
+                    rerun_page()
 
         newg = st.text_input("➕ Add a new weekly goal", key="ng_add_goal")
         if newg.strip() and st.button("Add goal", key="ng_add_btn"):
             goals_list.append(newg.strip())
             ss.nutrition_goals["goals"] = goals_list
             save_nutrition_goals()
-            st.rerun()
+            rerun_page()
 
         ss.nutrition_goals["goals"] = goals_list
         save_nutrition_goals()
@@ -713,7 +674,7 @@ elif page == "🍎 Nutrition":
     with scol:
         # 🖼️ Keep NUTRITION_SIDE here (same placement)
         if NUTRITION_SIDE.exists():
-            st.image(str(NUTRITION_SIDE), use_column_width=True)
+            show_image(NUTRITION_SIDE, "(max-width: 640px) 100vw, 40vw")
 
     st.markdown("---")
 
@@ -734,39 +695,46 @@ elif page == "🍎 Nutrition":
             if gl_cols[i].button(label, key=f"water_{i}"):
                 day["water_glasses"] = min(12, day["water_glasses"] + 1)
                 ss.nutrition_day[today_str] = day
-                save_nutrition_day()
-                st.rerun()
+                save_nutrition_day(today_str)
+                rerun_page()
 
         c1, c2 = st.columns(2)
         if c1.button("Reset water"):
             day["water_glasses"] = 0
             ss.nutrition_day[today_str] = day
-            save_nutrition_day()
-            st.rerun()
+            save_nutrition_day(today_str)
+            rerun_page()
         c2.caption(f"Total: **{day['water_glasses']}** glasses")
 
-        st.markdown("**Meals**")
-        day["breakfast"] = st.text_area("🍳 Breakfast", value=day["breakfast"], height=70)
-        day["lunch"]     = st.text_area("🥗 Lunch", value=day["lunch"], height=70)
-        day["dinner"]    = st.text_area("🍲 Dinner", value=day["dinner"], height=70)
-        day["snacks"]    = st.text_area("🍪 Snacks", value=day["snacks"], height=60)
-
-        st.markdown("**Macros (approx.)**")
-        m1, m2, m3, m4 = st.columns(4)
-        day["calories"] = m1.number_input("kcal", 0, 10000, value=int(day["calories"]))
-        day["protein"]  = m2.number_input("Protein (g)", 0, 500, value=int(day["protein"]))
-        day["carbs"]    = m3.number_input("Carbs (g)", 0, 800, value=int(day["carbs"]))
-        day["fat"]      = m4.number_input("Fat (g)", 0, 300, value=int(day["fat"]))
-
-        n1, n2 = st.columns([1, 1])
-        with n1:
-            day["mood_after_meals"] = st.slider("How did your body feel?", 1, 5, int(day["mood_after_meals"]))
-        with n2:
-            day["notes"] = st.text_input("Note (optional)", value=day["notes"])
-
-        if st.button("Save today"):
+        # meals, macros, feeling and note are one form: edits stay in the browser until "Save today",
+        # which reruns and writes the day once
+        with st.form("nutrition_today", border=False):
+            st.markdown("**Meals**")
+            edit = {
+                "breakfast": st.text_area("🍳 Breakfast", value=day["breakfast"], height=70),
+                "lunch":     st.text_area("🥗 Lunch", value=day["lunch"], height=70),
+                "dinner":    st.text_area("🍲 Dinner", value=day["dinner"], height=70),
+                "snacks":    st.text_area("🍪 Snacks", value=day["snacks"], height=60),
+            }
+
+            st.markdown("**Macros (approx.)**")
+            m1, m2, m3, m4 = st.columns(4)
+            edit["calories"] = m1.number_input("kcal", 0, 10000, value=int(day["calories"]))
+            edit["protein"]  = m2.number_input("Protein (g)", 0, 500, value=int(day["protein"]))
+            edit["carbs"]    = m3.number_input("Carbs (g)", 0, 800, value=int(day["carbs"]))
+            edit["fat"]      = m4.number_input("Fat (g)", 0, 300, value=int(day["fat"]))
+
+            n1, n2 = st.columns([1, 1])
+            with n1:
+                edit["mood_after_meals"] = st.slider("How did your body feel?", 1, 5, int(day["mood_after_meals"]))
+            with n2:
+                edit["notes"] = st.text_input("Note (optional)", value=day["notes"])
+            submitted = st.form_submit_button("Save today")
+
+        if submitted:
+            day.update(edit)
             ss.nutrition_day[today_str] = day
-            save_nutrition_day()
+            save_nutrition_day(today_str)
             st.success("Saved ✓")
 
     # ===== RIGHT: Checklist (first), then Progress =====
@@ -840,28 +808,14 @@ elif page == "🍎 Nutrition":
 
     # --- Export ---
     st.subheader("Export Data")
-    rows = []
-    for d, ent in ss.nutrition_day.items():
-        rows.append({
-            "date": d,
-            "water_glasses": ent.get("water_glasses", 0),
-            "calories": ent.get("calories", 0),
-            "protein": ent.get("protein", 0),
-            "carbs": ent.get("carbs", 0),
-            "fat": ent.get("fat", 0),
-            "mood_after_meals": ent.get("mood_after_meals", 3),
-            "breakfast": ent.get("breakfast", ""),
-            "lunch": ent.get("lunch", ""),
-            "dinner": ent.get("dinner", ""),
-            "snacks": ent.get("snacks", ""),
-            "notes": ent.get("notes", ""),
-        })
-    df_nut = pd.DataFrame(rows).sort_values("date")
-    st.download_button("⬇️ Download nutrition.csv", data=df_nut.to_csv(index=False).encode(),
-                       file_name=f"nutrition_{USER_ID}.csv")
-
-
-elif page == "🧩 Tools":
+    # full history written month by month from the store (the session only holds this week)
+    fmt = st.radio("Format", EXPORT_FORMATS, horizontal=True, key="nutrition_export_fmt") \
+        if len(EXPORT_FORMATS) > 1 else "csv"
+    export_button(st, "nutrition", fmt)
+
+
+@page_fragment
+def page_tools():
     st.subheader("Wellness Tools")
 
     # -------------------- ✅ Habits (simple) --------------------
@@ -874,47 +828,37 @@ elif page == "🧩 Tools":
         add_clicked = st.button("Add habit", use_container_width=True)
 
     if add_clicked and (new_habit or "").strip():
-        ss.habits = pd.concat(
-            [ss.habits, pd.DataFrame([{"Date": today_str, "Habit": new_habit.strip(), "Done": 0}])],
-            ignore_index=True
-        )
-        save_habits()
+        add_habit(today_str, new_habit.strip())
         st.success("Added ✓")
-        st.rerun()
+        rerun_page()
 
-    if ss.habits.empty:
+    names = ss.habit_log.names()
+    if not names:
         st.caption("No habits yet — add one above.")
     else:
-        names = sorted(set(ss.habits["Habit"].astype(str).tolist()))
-        done_today = 0
+        done_set = ss.habit_log.done_on(today_str)  # one lookup for the whole list
+        toggles = {}
 
         for i, h in enumerate(names):
-            mask_today = (ss.habits["Date"] == today_str) & (ss.habits["Habit"] == h)
-            is_done = bool(int(ss.habits.loc[mask_today, "Done"].max())) if mask_today.any() else False
+            is_done = h in done_set
 
             c1, c2, c3 = st.columns([0.09, 0.71, 0.20])
             tick = c1.checkbox("", value=is_done, key=f"tool_h_{i}")
             c2.write(h)
             del_clicked = c3.button("Delete", key=f"tool_del_{i}")
 
-            # Toggle save
+            # Toggles are collected and saved together below
             if tick != is_done:
-                if mask_today.any():
-                    ss.habits.loc[mask_today, "Done"] = int(tick)
-                else:
-                    ss.habits = pd.concat(
-                        [ss.habits, pd.DataFrame([{"Date": today_str, "Habit": h, "Done": int(tick)}])],
-                        ignore_index=True
-                    )
-                save_habits()
-            if tick:
-                done_today += 1
+                toggles[h] = int(tick)
 
             # Delete all rows of that habit name
             if del_clicked:
-                ss.habits = ss.habits[ss.habits["Habit"] != h].reset_index(drop=True)
-                save_habits()
-                st.rerun()
+                delete_habit(h)
+                rerun_page()
+
+        if toggles:
+            save_habits(today_str, toggles)
+        done_today = len(ss.habit_log.done_on(today_str))
 
         # Progress for today
         st.progress(done_today / max(1, len(names)))
@@ -922,22 +866,13 @@ elif page == "🧩 Tools":
 
         a1, a2 = st.columns(2)
         if a1.button("Mark all done for today"):
-            for h in names:
-                mask = (ss.habits["Date"] == today_str) & (ss.habits["Habit"] == h)
-                if mask.any():
-                    ss.habits.loc[mask, "Done"] = 1
-                else:
-                    ss.habits = pd.concat(
-                        [ss.habits, pd.DataFrame([{"Date": today_str, "Habit": h, "Done": 1}])],
-                        ignore_index=True
-                    )
-            save_habits()
-            st.rerun()
+            save_habits(today_str, {h: 1 for h in names})
+            rerun_page()
 
         if a2.button("Clear today's ticks"):
-            ss.habits.loc[ss.habits["Date"] == today_str, "Done"] = 0
-            save_habits()
-            st.rerun()
+            # only habits ticked today: no "not done" rows for days never tracked
+            save_habits(today_str, {h: 0 for h in ss.habit_log.done_on(today_str)})
+            rerun_page()
 
     st.write("---")
 
@@ -948,48 +883,12 @@ elif page == "🧩 Tools":
 
     with t1:
         st.caption("4–7–8 for anxiety · Box breathing for focus")
-        mode = st.radio("Mode", ["4-7-8", "Box (4-4-4-4)"], horizontal=True, index=0)
+        mode = st.radio("Mode", list(BREATHING), horizontal=True, index=0)
         cycles = st.slider("Cycles", 1, 6, 3)
-        ph = st.empty()
-
-        if "breath_running" not in ss:
-            ss.breath_running = False
-        cstart, cstop = st.columns(2)
-        if cstart.button("Start", use_container_width=True):
-            ss.breath_running = True
-        if cstop.button("Stop", use_container_width=True):
-            ss.breath_running = False
-
-        def phase(label, sec):
-            with ph.container():
-                st.markdown(
-                    f"<div class='pin-card center'><h3>{label}</h3><div class='muted'>{sec}s</div></div>",
-                    unsafe_allow_html=True
-                )
-                pb = st.progress(0)
-                for i in range(sec):
-                    if not ss.breath_running:
-                        return False
-                    pb.progress(int((i + 1) / sec * 100))
-                    time.sleep(1)
-            return ss.breath_running
-
-        if ss.breath_running:
-            for _ in range(cycles):
-                if mode == "4-7-8":
-                    if not phase("Inhale", 4): break
-                    if not phase("Hold", 7): break
-                    if not phase("Exhale", 8): break
-                else:
-                    if not phase("Inhale", 4): break
-                    if not phase("Hold", 4): break
-                    if not phase("Exhale", 4): break
-                    if not phase("Hold", 4): break
-            ph.empty()
-            if ss.breath_running:
-                st.success("Nice work. Notice any shift?")
-                ss.exercise_streak += 1
-            ss.breath_running = False
+        # the countdown runs in the browser (haven/frontend/breathing.js); the page reruns once, when it completes
+        if breathing(mode, cycles, THEMES[_theme]):
+            st.success("Nice work. Notice any shift?")
+            ss.exercise_streak += 1
 
     with t2:
         st.caption("Cognitive reframing: catch → check → change")
@@ -999,14 +898,14 @@ elif page == "🧩 Tools":
         alt = ccol[2].text_area("Balanced Alternative", height=120, placeholder="A more balanced way to say this is...")
         if st.button("Generate gentle reframe"):
             try:
-                m = genai.GenerativeModel(MODEL)
                 prompt = f"""You are a CBT-style coach. Given:
 Automatic thought: {thought}
 Evidence: {evidence}
 Balanced alternative: {alt}
 Return 3 short, compassionate reframes in bullet points."""
-                r = m.generate_content(prompt, generation_config={"temperature": 0.6, "max_output_tokens": 250})
-                txt = (getattr(r, "text", "") or "").strip()
+                txt = REPLIES.generate(LLM, text_key("cbt", thought, evidence, alt, user=USER_ID), prompt,
+                                       generation_config={"temperature": 0.6, "max_output_tokens": 250},
+                                       owner=USER_ID)
             except Exception:
                 txt = ("• Maybe the mistake says nothing about your worth.\n"
                        "• One moment doesn’t define all of you.\n"
@@ -1023,7 +922,8 @@ Return 3 short, compassionate reframes in bullet points."""
             st.info("Start at toes → tense 5s → release 10s → move upward.")
 
 
-elif page == "🎮 Games":
+@page_fragment
+def page_games():
     # -------------------- Minimal floating pink petals (page-local) --------------------
     st.markdown("""
     <style>
@@ -1103,62 +1003,33 @@ elif page == "🎮 Games":
                         f"</div>", unsafe_allow_html=True)
             if st.button("Open", key=f"open_{g['key']}", use_container_width=True):
                 st.session_state.game_view = g["key"]
-                st.rerun()
+                rerun_page()
     st.markdown('</div>', unsafe_allow_html=True)  # /card-grid
     st.markdown('</div>', unsafe_allow_html=True)  # /games-wrap
 
     st.write("---")
 
     # -------------------- Shared helpers / persistence --------------------
+    # ss.games is a haven.games.GameStats: scores are written when a round ends, not on every answer
     def _save_games():
-        try:
-            save_games()
-        except Exception:
-            # fallback in case save_games not imported in your earlier context
-            json.dump(ss.games, open(GAMES_JSON, "w"), indent=2)
-
-    # Ensure games dict has new fields
-    ss.games.setdefault("reaction", [])
-    ss.games.setdefault("eo_best", 0)
-    ss.games.setdefault("emotion_sort_best", 0)
-    ss.games.setdefault("affirmations_saved", [])
+        save_games()
 
         # ==================== GAME 1: Reaction Focus ====================
     if st.session_state.game_view == "Reaction Focus":
         st.subheader("⚡ Reaction Focus")
-        st.caption("When it says **GO!**, hit the button immediately. Try to beat your best.")
-        if "rf_phase" not in ss:
-            ss.rf_phase=None; ss.rf_delay=0.0; ss.rf_set=0.0; ss.rf_go=0.0
-
-        c1, c2 = st.columns([1,1])
-        if ss.rf_phase is None:
-            if c1.button("Start ▶️", key="rf_start", use_container_width=True):
-                ss.rf_phase="wait"; ss.rf_delay=random.uniform(1.6, 3.8); ss.rf_set=time.time(); st.rerun()
-            c2.button("Reset ⟲", key="rf_reset_disabled", use_container_width=True, disabled=True)
-            st.info("Press **Start** and… wait. Don’t click until you see **GO!**.")
-        elif ss.rf_phase == "wait":
-            if c2.button("Reset ⟲", key="rf_reset", use_container_width=True):
-                ss.rf_phase=None; st.rerun()
-            remain = time.time() - ss.rf_set
-            if remain >= ss.rf_delay:
-                ss.rf_phase="go"; ss.rf_go=time.time(); st.rerun()
-            else:
-                st.warning("⏳ Wait for **GO!** …")
-                time.sleep(0.2); st.rerun()
-        elif ss.rf_phase == "go":
-            st.success("**GO!** Tap now!")
-            if st.button("Click!", key="rf_click", use_container_width=True):
-                rt = round((time.time()-ss.rf_go)*1000)
-                ss.games["reaction"].append(rt); _save_games()
-                ss.rf_phase=None
-                st.success(f"Your reaction time: **{rt} ms**")
-
-        rx = ss.games.get("reaction", [])
-        if rx:
-            best=min(rx); avg=sum(rx)/len(rx)
-            st.markdown(f"- Best: **{best:.0f} ms** • Avg: **{avg:.0f} ms** • Plays: {len(rx)}")
+        st.caption("When it says **GO!**, tap immediately. Try to beat your best.")
+        # wait, GO and timing run in the browser (haven/frontend/reaction.js); only the score comes back
+        res = reaction(THEMES[_theme], key="rf_pad")
+        if res:
+            ss.games.reaction.add(res["ms"]); _save_games()
+            st.success(f"Your reaction time: **{res['ms']} ms**")
+
+        rx = ss.games.reaction
+        if rx.count:
+            st.markdown(f"- Best: **{rx.best:.0f} ms** • Avg: **{rx.mean:.0f} ms** • "
+                        f"p50: **{rx.quantile(.5):.0f} ms** • p90: **{rx.quantile(.9):.0f} ms** • Plays: {rx.count}")
             if st.button("Clear scores", key="rf_clear", type="secondary"):
-                ss.games["reaction"] = []; _save_games(); st.success("Cleared.")
+                ss.games.reaction = ReactionStats(); _save_games(); st.success("Cleared.")
 
     # ==================== GAME 2: Even–Odd Blitz (replacing Stroop) ====================
     elif st.session_state.game_view == "Even–Odd Blitz":
@@ -1180,19 +1051,17 @@ elif page == "🎮 Games":
         if top[0].button("Start / Next ▶️", key="eo_next", use_container_width=True):
             if ss.eo_phase in ("idle", "answered", "done"):
                 if ss.eo_round >= 10:
-                    # finished -> store best then reset for a fresh run
-                    ss.games["eo_best"] = int(max(ss.games.get("eo_best", 0), ss.eo_score))
-                    _save_games()
+                    # finished (the best was stored when round 10 was answered) -> fresh run
                     ss.eo_round = 0
                     ss.eo_score = 0
                 ss.eo_round += 1
                 new_number()
-                st.rerun()
+                rerun_page()
 
         if top[1].button("Reset ⟲", key="eo_reset", use_container_width=True):
             ss.eo_phase, ss.eo_round, ss.eo_score = "idle", 0, 0
             ss.eo_current = None
-            st.rerun()
+            rerun_page()
 
         # show current number
         if ss.eo_phase == "showing" and ss.eo_current is not None:
@@ -1217,13 +1086,14 @@ elif page == "🎮 Games":
                     st.success("Correct ✓")
                 else:
                     st.error(f"Oops — it was **{correct.title()}**")
-                _save_games()
 
         # wrap-up / next
         if ss.eo_phase == "answered":
             if ss.eo_round >= 10:
-                best = max(ss.games.get("eo_best", 0), ss.eo_score)
-                ss.games["eo_best"] = int(best); _save_games()
+                # the Blitz's only write: once per 10 rounds, and only for a new best
+                if ss.games.record_best("eo_best", ss.eo_score):
+                    _save_games()
+                best = ss.games.bests["eo_best"]
                 st.markdown(f"### 🎯 Final Score: **{ss.eo_score}/10** • Best: **{best}/10**")
                 st.balloons()
                 ss.eo_phase = "done"
@@ -1260,11 +1130,11 @@ elif page == "🎮 Games":
                 cols2 = st.columns([2,1,1,1])
                 cols2[0].markdown(f"<div class='chip' style='display:inline-block;padding:6px 10px;border-radius:999px;background:var(--accent-soft);margin:4px 0'>{w}</div>", unsafe_allow_html=True)
                 if cols2[1].button("😊", key=f"es_h_{i}", help="Happy"):
-                    ss.es_bins["Happy"].append(w); ss.es_pool.remove(w); st.rerun()
+                    ss.es_bins["Happy"].append(w); ss.es_pool.remove(w); rerun_page()
                 if cols2[2].button("😔", key=f"es_s_{i}", help="Sad"):
-                    ss.es_bins["Sad"].append(w); ss.es_pool.remove(w); st.rerun()
+                    ss.es_bins["Sad"].append(w); ss.es_pool.remove(w); rerun_page()
                 if cols2[3].button("😬", key=f"es_a_{i}", help="Anxious"):
-                    ss.es_bins["Anxious"].append(w); ss.es_pool.remove(w); st.rerun()
+                    ss.es_bins["Anxious"].append(w); ss.es_pool.remove(w); rerun_page()
 
         st.write("")
         bcols = st.columns(3)
@@ -1289,26 +1159,25 @@ elif page == "🎮 Games":
             ss.es_done = True
         if c2.button("Reset Round"):
             ss.es_pool=[]; ss.es_bins={"Happy":[], "Sad":[], "Anxious":[]}; ss.es_done=False; ss.es_score=None
-            st.rerun()
+            rerun_page()
         if c3.button("New Round"):
             sample = random.sample(WORDS, 9)
             ss.es_pool = sample; ss.es_bins={"Happy":[], "Sad":[], "Anxious":[]}; ss.es_done=False; ss.es_score=None
-            st.rerun()
+            rerun_page()
 
         if ss.es_done and ss.es_score is not None:
             got, total = ss.es_score
             st.success(f"Score: **{got}/{total}**")
             if got == total: st.balloons()
-            ss.games["emotion_sort_best"] = max(ss.games.get("emotion_sort_best",0), got)
-            _save_games()
+            if ss.games.record_best("emotion_sort_best", got):
+                _save_games()
             with st.expander("Reflect (optional)"):
                 txt = st.text_area("What did you notice about these emotions?")
                 if st.button("Save as note to gratitude"):
-                    ss.gratitude.append(f"{time.strftime('%Y-%m-%d')}: Reflection — {txt.strip()}")
-                    save_gratitude()
-                    st.success("Saved to gratitude.json")
+                    save_gratitude(f"{time.strftime('%Y-%m-%d')}: Reflection — {txt.strip()}")
+                    st.success("Saved to gratitude wall")
 
-            st.markdown(f"_Best this profile: **{ss.games['emotion_sort_best']}**_")
+            st.markdown(f"_Best this profile: **{ss.games.bests['emotion_sort_best']}**_")
 
     # ==================== GAME 4: Affirmation Builder ====================
     elif st.session_state.game_view == "Affirmation Builder":
@@ -1331,10 +1200,13 @@ elif page == "🎮 Games":
         made = None
         if c1.button("Generate suggestion"):
             try:
-                m = genai.GenerativeModel(MODEL)
                 prompt = f"Write one short {tone} affirmation for {focus}. Include the strength '{trait}'. Situation: {situation or '—'}"
-                r = m.generate_content(prompt, generation_config={"temperature":0.7,"max_output_tokens":60})
-                made = (getattr(r,"text","") or "").strip()
+                # selectbox-only prompts repeat a lot: shared exact key; a typed situation is per user
+                owner = USER_ID if situation.strip() else ""
+                key = (text_key("affirm", trait, focus, tone, situation, user=USER_ID) if owner
+                       else exact_key("affirm", trait=trait, focus=focus, tone=tone))
+                made = REPLIES.generate(LLM, key, prompt, generation_config={"temperature":0.7,"max_output_tokens":60},
+                                        owner=owner)
             except Exception:
                 made = f"Even when {situation or 'things are tough'}, I remember I am {trait}, and I can take one small step at a time."
             st.markdown(f"<div class='pin-card'>{made}</div>", unsafe_allow_html=True)
@@ -1342,23 +1214,22 @@ elif page == "🎮 Games":
         if c2.button("Save my draft"):
             af = target.strip()
             if af:
-                ss.games["affirmations_saved"].append({"text":af, "ts":time.strftime("%Y-%m-%d %H:%M")})
-                _save_games()
+                save_affirmation(af)
                 st.success("Saved ✓  (see below)")
 
         if c3.button("Add to Gratitude"):
             af = (made or target).strip()
             if af:
-                ss.gratitude.append(f"{time.strftime('%Y-%m-%d')}: {af}")
-                save_gratitude()
+                save_gratitude(f"{time.strftime('%Y-%m-%d')}: {af}")
                 st.success("Added to gratitude wall ✓")
 
-        if ss.games.get("affirmations_saved"):
+        if ss.affirmations:
             st.markdown("### Saved affirmations")
-            for a in reversed(ss.games["affirmations_saved"][-8:]):
+            for a in reversed(ss.affirmations[-8:]):
                 st.markdown(f"- _{a['ts']}_ — **{a['text']}**")
 
-elif page == "🎵 Music":
+@page_fragment
+def page_music():
     # ==================== 🎧 Moody Melody (simple layout with image) ====================
     st.subheader("Moody Melody")
 
@@ -1398,7 +1269,7 @@ elif page == "🎵 Music":
                ss.melody["current"] = name
                save_melody()
                st.success(f"Created **{name}**")
-               st.rerun()
+               rerun_page()
 
     with tab_map[current]:
        # Header row: name + rename + delete
@@ -1412,7 +1283,7 @@ elif page == "🎵 Music":
                 ss.melody["current"] = nt
                 save_melody()
                 st.success("Renamed ✓")
-                st.rerun()
+                rerun_page()
             else:
                 st.warning("Pick a new, unique name.")
        if r1c3.button("Delete") and len(playlists) > 1:
@@ -1420,7 +1291,7 @@ elif page == "🎵 Music":
            ss.melody["current"] = list(playlists.keys())[0]
            save_melody()
            st.success("Deleted ✓")
-           st.rerun()
+           rerun_page()
 
     st.markdown("---")
 
@@ -1448,28 +1319,30 @@ elif page == "🎵 Music":
                    "path": "", "url": t_url.strip(),
                    "added": time.strftime("%Y-%m-%d %H:%M")
               })
-              save_melody(); st.success("Added ✓"); st.rerun()
+              save_melody(); st.success("Added ✓"); rerun_page()
 
         up = c_add2.file_uploader("…or upload audio", type=["mp3", "wav", "ogg", "m4a"], label_visibility="collapsed")
         if up is not None and st.button("📤 Upload file"):
-            ext = Path(up.name).suffix.lower()
-            safe = re.sub(r"[^a-zA-Z0-9._-]+", "_", Path(up.name).stem) + ext
-            local_path = (AUDIO_DIR / safe)
-            with open(local_path, "wb") as f:
-               f.write(up.read())
-            title = t_title.strip() or Path(up.name).stem
-            playlists[current].append({
-               "title": title, "mood": t_mood, "src": "local",
-               "path": str(local_path), "url": "",
-               "added": time.strftime("%Y-%m-%d %H:%M")
-            })
-            save_melody(); st.success("Uploaded ✓"); st.rerun()
+            # streamed to disk in chunks, stored once per content hash (haven/audio.py)
+            try:
+                rec = audio_library(USER_DIR).ingest(up, up.name)
+            except ValueError as e:
+                st.warning(str(e))
+            else:
+                title = t_title.strip() or Path(up.name).stem
+                playlists[current].append({
+                   "title": title, "mood": t_mood, "src": "local",
+                   "path": rec["path"], "url": "", "hash": rec["hash"],
+                   "duration": rec.get("duration"), "bitrate": rec.get("bitrate"), "size": rec["size"],
+                   "added": time.strftime("%Y-%m-%d %H:%M")
+                })
+                save_melody(); st.success("Already in your library ✓" if rec["dedup"] else "Uploaded ✓"); rerun_page()
 
     with right_col:
         # Pretty image on the right
         music_image = "assets/music_switch.jpeg"  # ensure this file exists
         if os.path.exists(music_image):
-           st.image(music_image, caption="music: ON • world: OFF", use_column_width=True)
+           show_image(music_image, "(max-width: 640px) 100vw, 45vw", caption="music: ON • world: OFF")
         else:
            st.info("Add your image as assets/music_switch.jpeg")
 
@@ -1490,45 +1363,59 @@ elif page == "🎵 Music":
            if not tracks:
                st.caption("No songs yet. Add tracks above.")
            else:
-               for idx, t in enumerate(tracks):
+               # one page of rows; only the track being played gets a player
+               pages = -(-len(tracks) // PLAYLIST_PAGE)
+               pg = st.number_input(f"Page (of {pages})", 1, pages, key=f"mm_page_{pname}") if pages > 1 else 1
+               start = (pg - 1) * PLAYLIST_PAGE
+               for idx in range(start, min(start + PLAYLIST_PAGE, len(tracks))):
+                   t = tracks[idx]
                    with st.container():
                       c1, c2, c3 = st.columns([4, 2, 1])
                       c1.markdown(f"**🎧 {t.get('title','Untitled')}**  ·  _{t.get('mood','')}_")
+                      if t.get("duration"):
+                          m, sec = divmod(int(t["duration"]), 60)
+                          c1.caption(f"{m}:{sec:02d}" + (f" · {t['bitrate']} kbps" if t.get("bitrate") else ""))
                       if t.get("src") == "local" and t.get("path"):
-                          c2.audio(t["path"])
+                          if ss.get("mm_playing") == (pname, idx):
+                              audio_player(c2, t)
+                          elif c2.button("▶ Play", key=f"mm_play_{pname}_{idx}"):
+                              ss.mm_playing = (pname, idx)
+                              rerun_page()
                       elif t.get("url"):
                           c2.link_button("Open Link", t["url"])
                       else:
                           c2.caption("—")
                       if c3.button("✖", key=f"mm_del_{pname}_{idx}"):
                           tracks.pop(idx)
+                          if (ss.get("mm_playing") or ("",))[0] == pname:
+                              ss.mm_playing = None  # indexes after idx have moved
                           save_melody()
-                          st.rerun()
+                          rerun_page()
 
     st.markdown("<hr style='opacity:0.2;'>", unsafe_allow_html=True)
 
 
 
-elif page == "📈 Progress":
+@page_fragment
+def page_progress():
     st.subheader("Your Progress")
-    df = ss.journal_df
-
-    # --- Chart 1: Mood Trend ---
-    if not df.empty and "mood_1to5" in df.columns:
-        d2 = df.dropna(subset=["mood_1to5"]).copy()
-        if not d2.empty:
-            d2["#"] = range(1, len(d2) + 1)
-            fig = px.line(
-                d2, x="#", y="mood_1to5", markers=True, title="Mood Trend",
-                range_y=[0, 5], color_discrete_sequence=["#227b79"]
-            )
-            fig.update_layout(margin=dict(l=10, r=10, t=50, b=10))
-            st.plotly_chart(fig, use_container_width=True)
+    # charts read the per-user summary kept by save_journal (haven/stats.py), not the full journal
+    by_day = ss.stats.mood_by_day()
+
+    # --- Chart 1: Mood Trend (daily average) ---
+    if by_day:
+        d2 = pd.DataFrame(by_day, columns=["date", "mood_1to5"])
+        fig = px.line(
+            d2, x="date", y="mood_1to5", markers=True, title="Mood Trend",
+            range_y=[0, 5], color_discrete_sequence=["#227b79"]
+        )
+        fig.update_layout(margin=dict(l=10, r=10, t=50, b=10))
+        st.plotly_chart(fig, use_container_width=True)
 
     # --- Chart 2: Emotion Frequency ---
-    if not df.empty and "emotion" in df.columns:
-        counts = df["emotion"].value_counts().reset_index()
-        counts.columns = ["emotion", "count"]
+    emotions = ss.stats.emotion_counts()
+    if emotions:
+        counts = pd.DataFrame(sorted(emotions.items(), key=lambda kv: -kv[1]), columns=["emotion", "count"])
         if not counts.empty:
             fig2 = px.bar(
                 counts, x="emotion", y="count", title="Emotion Frequency",
@@ -1539,13 +1426,11 @@ elif page == "📈 Progress":
 
     # --- Mood Calendar (last 31 days) ---
     st.subheader("Mood Calendar (last 31 days)")
-    if not df.empty and "mood_1to5" in df.columns and "date" in df.columns:
-        d3 = df.dropna(subset=["mood_1to5"]).copy()
-        # parse dates safely and keep the most recent 31 entries
-        d3["date"] = pd.to_datetime(d3["date"], errors="coerce")
-        d3 = d3.dropna(subset=["date"]).sort_values("date").tail(31)
+    if ss.stats.entries():
+        # most recent 31 days that have a mood (daily average)
+        d3 = by_day[-31:]
 
-        if not d3.empty:
+        if d3:
             # color map for moods 1..5
             mood_colors = {
                 1: "#f8c6d8",  # light pink
@@ -1556,13 +1441,9 @@ elif page == "📈 Progress":
             }
 
             cells = []
-            for _, r in d3.iterrows():
-                try:
-                    m = int(r["mood_1to5"])
-                except Exception:
-                    m = 0
+            for date_str, mean in d3:
+                m = int(round(mean))
                 color = mood_colors.get(m, "#eeeeee")
-                date_str = r["date"].date().isoformat()
                 cells.append(
                     f"<div title='{date_str} • mood {m}' "
                     f"style='width:22px;height:22px;border-radius:6px;background:{color};"
@@ -1578,24 +1459,16 @@ elif page == "📈 Progress":
 
     # --- Export / Download ---
     st.subheader("Export / Download")
+    fmt = st.radio("Format", EXPORT_FORMATS, horizontal=True, key="progress_export_fmt") \
+        if len(EXPORT_FORMATS) > 1 else "csv"
     col = st.columns(3)
-    col[0].download_button(
-        "Download journal.csv",
-        data=JOURNAL_CSV.read_bytes() if JOURNAL_CSV.exists() else b"",
-        file_name=f"journal_{USER_ID}.csv"
-    )
-    col[1].download_button(
-        "Download habits.csv",
-        data=HABITS_CSV.read_bytes() if HABITS_CSV.exists() else b"",
-        file_name=f"habits_{USER_ID}.csv"
-    )
-    col[2].download_button(
-        "Download gratitude.json",
-        data=GRATITUDE_JSON.read_bytes() if GRATITUDE_JSON.exists() else b"",
-        file_name=f"gratitude_{USER_ID}.json"
-    )
+    # built from the store in chunks, so exports work for every backend
+    export_button(col[0], "journal", fmt)
+    export_button(col[1], "habits", fmt)
+    export_button(col[2], "gratitude", "json")
 
-elif page == "⚙️ Settings":
+@page_fragment
+def page_settings():
     st.subheader("Appearance")
     st.caption("Switch themes in the sidebar under “🎨 Theme”.")
     st.subheader("Privacy")
@@ -1608,6 +1481,12 @@ elif page == "⚙️ Settings":
     if st.button("Delete my local data"):
         try:
             deleted_path = str(USER_DIR.resolve())
+            # public links an older version published for this profile's tracks
+            remove_static_links(library_digests(USER_DIR) |
+                                {t["hash"] for ts in ss.get("melody", {}).get("playlists", {}).values()
+                                 for t in ts if t.get("hash")})
+            close_store(USER_DIR)
+            REPLIES.forget(USER_ID)  # cached replies that echo this profile's typed text
             if USER_DIR.exists():
                 shutil.rmtree(USER_DIR)
             for k in list(st.session_state.keys()):
@@ -1617,3 +1496,25 @@ elif page == "⚙️ Settings":
             st.rerun()
         except Exception as e:
             st.error("Could not delete: " + str(e))
+
+PAGES = {"🏠 Home": page_home, "💬 Chat": page_chat, "📓 Journal": page_journal, "🍎 Nutrition": page_nutrition,
+         "🧩 Tools": page_tools, "🎮 Games": page_games, "🎵 Music": page_music, "📈 Progress": page_progress,
+         "⚙️ Settings": page_settings}
+PAGES.get(page, page_home)()
+
+# ---------- Durable commit for this rerun's writes (HAVEN_FSYNC=per-rerun) ----------
+WRITER.end_run()
+
+# ---------- Debug: persistence counters (HAVEN_DEBUG=1) ----------
+if os.getenv("HAVEN_DEBUG"):
+    _ps = ss.persist.stats()
+    st.sidebar.caption(f"writes this run: {_ps['run_writes']} · total: {_ps['writes']} · skipped: {_ps['skipped']}")
+    _cs = CACHE.stats()
+    st.sidebar.caption(f"data cache: {_cs['hits']} hits · {_cs['misses']} misses · "
+                       f"{_cs['entries']} entries · {_cs['bytes'] // 1024} KiB")
+    _ls, _rs = LLM.stats, LLM.limiter.stats if LLM.limiter else {}
+    st.sidebar.caption(f"llm: {_ls['calls']} calls · {_ls['retried']} retried · {_ls['fallbacks']} fallbacks · "
+                       f"quota waits: {_rs.get('throttled', 0)} · rejected: {_rs.get('rejected', 0)}")
+    _rc = REPLIES.stats
+    if _rc:
+        st.sidebar.caption(f"reply cache: {_rc['hits']} hits · {_rc['misses']} misses · {_rc['evicted']} evicted")
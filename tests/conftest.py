@@ -0,0 +1,5 @@
+# tests run against the working tree: `pytest` from the repo root (or anywhere)
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
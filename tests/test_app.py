@@ -0,0 +1,61 @@
+# end-to-end: the real script under Streamlit's AppTest, offline (fake Gemini) in a scratch folder
+import os
+from pathlib import Path
+import pytest
+
+AppTest = pytest.importorskip("streamlit.testing.v1").AppTest
+ROOT = Path(__file__).resolve().parent.parent
+PAGES = ["🏠 Home", "💬 Chat", "📓 Journal", "🍎 Nutrition", "🧩 Tools", "🎮 Games", "🎵 Music", "📈 Progress"]
+
+
+@pytest.fixture(params=["sqlite", "files"])
+def app(request, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.symlink(ROOT / "assets", tmp_path / "assets")
+    for k, v in {"GOOGLE_API_KEY": "dummy", "HAVEN_FAKE_LLM": "1", "HAVEN_LLM_TIMEOUT": "5",
+                 "HAVEN_STORAGE": request.param}.items():
+        monkeypatch.setenv(k, v)
+    at = AppTest.from_file(str(ROOT / "mental_health.py"), default_timeout=60)
+    at.run()
+    at.sidebar.text_input[0].input("pytest user")
+    at.run()
+    assert not at.exception
+    return at
+
+
+def _go(at, page):
+    at.session_state["_nav"] = page
+    at.run()
+    assert not at.exception, (page, [e.message for e in at.exception])
+
+
+def test_every_page_renders_and_idle_reruns_write_nothing(app):
+    for page in PAGES:
+        _go(app, page)
+        app.run()                                   # an idle rerun of the page fragment
+        assert app.session_state["persist"].stats()["run_writes"] == 0, page
+
+
+def test_page_saves_are_committed_within_the_run(app):
+    from haven.fsio import WRITER
+    _go(app, "🏠 Home")
+    [t for t in app.text_input if t.label == "One-line note"][0].input("calm")
+    [b for b in app.button if b.label == "Save quick check-in"][0].click()
+    app.run()
+    assert not app.exception
+    assert WRITER.pending() == 0                    # page_fragment ends every run with end_run()
+
+
+def test_reaction_result_is_recorded_once(app):
+    _go(app, "🎮 Games")
+    app.button(key="open_Reaction Focus").click()
+    app.run()
+    app.session_state["rf_pad"] = {"id": "round-1", "ms": 251}   # what the browser pad sends back
+    app.run()
+    app.run()                                       # the same value again on the next rerun
+    stats = app.session_state["games"].reaction
+    assert (stats.count, stats.best) == (1, 251)
+    assert any("Best: **251 ms**" in m.value for m in app.markdown)
+    app.session_state["rf_pad"] = {"id": "round-2", "ms": 300}
+    app.run()
+    assert app.session_state["games"].reaction.count == 2
@@ -0,0 +1,93 @@
+import json
+from haven.applog import AppendLog, migrate_json_array
+
+
+def _log(tmp_path, recs=()):
+    lg = AppendLog(tmp_path / "checkins.jsonl")
+    lg.extend(recs)
+    return lg
+
+
+def test_append_len_tail(tmp_path):
+    lg = _log(tmp_path, [{"n": i} for i in range(5)])
+    assert len(lg) == 5
+    assert lg.tail(2) == [{"n": 3}, {"n": 4}]
+    assert lg.read_all() == [{"n": i} for i in range(5)]
+    assert len(AppendLog(lg.path)) == 5        # a fresh instance trusts the index
+
+
+def test_torn_last_line_is_dropped(tmp_path):
+    lg = _log(tmp_path, [{"n": 0}, {"n": 1}])
+    with open(lg.path, "ab") as f:
+        f.write(b'{"n": 2, "ans')               # crash in the middle of a write
+    lg = AppendLog(lg.path)
+    assert len(lg) == 2 and lg.damaged == 1
+    assert lg.read_all() == [{"n": 0}, {"n": 1}]
+    assert lg.path.read_bytes().endswith(b"}\n")
+    lg.append({"n": 3})
+    assert AppendLog(lg.path).tail(2) == [{"n": 1}, {"n": 3}]
+
+
+def test_torn_record_whose_offset_was_indexed(tmp_path):
+    lg = _log(tmp_path, [{"n": 0}, {"n": 1}, {"n": 2}])
+    size = lg.path.stat().st_size
+    with open(lg.path, "r+b") as f:             # the last record lost its tail, its offset is in .idx
+        f.truncate(size - 4)
+    lg = AppendLog(lg.path)
+    assert len(lg) == 2 and lg.damaged == 1
+    assert lg.tail(5) == [{"n": 0}, {"n": 1}]
+    lg.append({"n": 3})
+    fresh = AppendLog(lg.path)
+    assert len(fresh) == 3 and fresh.tail(2) == [{"n": 1}, {"n": 3}]
+
+
+def test_index_behind_data_is_caught_up(tmp_path):
+    lg = _log(tmp_path, [{"n": 0}, {"n": 1}])
+    with open(lg.path, "ab") as f:             # crash between the data and the index write
+        f.write(b'{"n": 2}\n')
+    lg = AppendLog(lg.path)
+    assert len(lg) == 3
+    assert lg.tail(1) == [{"n": 2}]
+
+
+def test_stale_index_is_rebuilt(tmp_path):
+    lg = _log(tmp_path, [{"n": 0}, {"n": 1}, {"n": 2}])
+    stale = lg.idx_path.read_bytes()
+    # the data file is replaced behind the index's back (restored backup: new inode, fewer records)
+    tmp = tmp_path / "new.jsonl"
+    tmp.write_bytes(b'{"n": 7}\n{"n": 8}\n')
+    tmp.replace(lg.path)
+    lg.idx_path.write_bytes(stale)
+    lg = AppendLog(lg.path)
+    assert len(lg) == 2
+    assert lg.tail(5) == [{"n": 7}, {"n": 8}]
+
+    lg.idx_path.write_bytes(b"garbage")
+    lg = AppendLog(lg.path)
+    assert len(lg) == 2 and lg.tail(1) == [{"n": 8}]
+
+
+def test_compact_keeps_records_and_drops_damage(tmp_path):
+    recs = [{"n": i, "text": "é" * i} for i in range(20)]
+    lg = _log(tmp_path, recs[:10])
+    with open(lg.path, "ab") as f:
+        f.write(b"not json\n")
+    lg = AppendLog(lg.path)
+    lg.extend(recs[10:])
+    assert len(lg) == 21 and lg.damaged == 1
+    assert lg.compact() == 20
+    assert lg.damaged == 0
+    assert lg.read_all() == recs
+    fresh = AppendLog(lg.path)
+    assert len(fresh) == 20 and fresh.tail(3) == recs[-3:]
+    assert not fresh.maybe_compact()
+
+
+def test_migrate_json_array(tmp_path):
+    legacy = tmp_path / "checkins.json"
+    legacy.write_text(json.dumps([{"n": 0}, {"n": 1}]))
+    lg = AppendLog(tmp_path / "checkins.jsonl")
+    assert migrate_json_array(legacy, lg)
+    assert not legacy.exists() and (tmp_path / "checkins.json.migrated").exists()
+    assert lg.read_all() == [{"n": 0}, {"n": 1}] and len(lg) == 2
+    assert not migrate_json_array(legacy, lg)  # once only
@@ -0,0 +1,59 @@
+import io
+import struct
+import wave
+import pytest
+from haven.audio import AudioLibrary, UploadTooLarge, library_digests, probe
+
+
+def _wav_bytes(seconds=1.0, rate=8000):
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(b"\0\0" * int(rate * seconds))
+    return buf.getvalue()
+
+
+def _ogg_page(granule, body):
+    return b"OggS" + bytes(2) + struct.pack("<q", granule) + bytes(12) + bytes([1, len(body)]) + body
+
+
+def test_probes(tmp_path):
+    (tmp_path / "a.wav").write_bytes(_wav_bytes(2.0))
+    assert probe(tmp_path / "a.wav") == {"duration": 2.0, "bitrate": 128}
+    # MPEG-1 layer III, 128 kbps, 44.1 kHz behind a 10-byte ID3 tag: 16,000 bytes of audio = 1 s
+    mp3 = b"ID3\x04\0\0\0\0\0\0" + b"\xff\xfb\x90\x00" + bytes(15996)
+    (tmp_path / "b.mp3").write_bytes(mp3)
+    assert probe(tmp_path / "b.mp3") == {"duration": 1.0, "bitrate": 128}
+    vorbis = b"\x01vorbis" + bytes(4) + b"\x02" + struct.pack("<I", 44100) + bytes(14)   # version, channels, rate
+    ogg = _ogg_page(0, vorbis) + bytes(1000) + _ogg_page(44100 * 3, b"x")
+    (tmp_path / "c.ogg").write_bytes(ogg)
+    assert probe(tmp_path / "c.ogg")["duration"] == 3.0
+    mvhd = struct.pack(">I4s", 8 + 20, b"mvhd") + bytes(4) + bytes(8) + struct.pack(">II", 1000, 4500)
+    m4a = struct.pack(">I4s", 16, b"ftyp") + bytes(8) + struct.pack(">I4s", 8 + len(mvhd), b"moov") + mvhd
+    (tmp_path / "d.m4a").write_bytes(m4a)
+    assert probe(tmp_path / "d.m4a")["duration"] == 4.5
+    (tmp_path / "e.mp3").write_bytes(b"not audio at all")
+    (tmp_path / "f.wav").write_bytes(b"RIFF")
+    assert probe(tmp_path / "e.mp3") == {} and probe(tmp_path / "f.wav") == {} and probe(tmp_path / "g.flac") == {}
+
+
+def test_ingest_dedups_by_content(tmp_path):
+    lib = AudioLibrary(tmp_path / "u" / "audio", max_bytes=1 << 20)
+    data = _wav_bytes(0.5)
+    first = lib.ingest(io.BytesIO(data), "Calm.WAV")
+    again = lib.ingest(io.BytesIO(data), "renamed.wav")
+    assert not first["dedup"] and again["dedup"] and again["path"] == first["path"]
+    assert first["size"] == len(data) and first["duration"] == 0.5
+    assert library_digests(tmp_path / "u") == {first["hash"]}
+    assert sorted(p.name for p in lib.root.iterdir()) == sorted([first["file"], "index.json"])
+
+
+def test_size_cap_and_types(tmp_path):
+    lib = AudioLibrary(tmp_path / "audio", max_bytes=1000)
+    with pytest.raises(UploadTooLarge):
+        lib.ingest(io.BytesIO(_wav_bytes(1.0)), "big.wav")
+    with pytest.raises(ValueError):
+        lib.ingest(io.BytesIO(b"x"), "notes.txt")
+    assert list(lib.root.iterdir()) == []                   # no temp file left behind
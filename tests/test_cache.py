@@ -0,0 +1,67 @@
+import os
+import pandas as pd
+from haven.cache import LRUCache, load_file, sizeof, thaw, CACHE
+from haven.fsio import WRITER
+
+
+def test_hits_and_lru_eviction():
+    c = LRUCache(budget_bytes=3 * sizeof("x" * 100))
+    calls = []
+
+    def loader(v):
+        def f():
+            calls.append(v)
+            return v * 100
+        return f
+    for k in "abc":
+        c.load(("u", k, 1), loader(k))
+    c.load(("u", "a", 1), loader("a"))          # hit: "a" becomes most recent
+    c.load(("u", "d", 1), loader("d"))          # evicts "b", the least recently used
+    assert calls == ["a", "b", "c", "d"]
+    c.load(("u", "a", 1), loader("a"))
+    c.load(("u", "b", 1), loader("b"))
+    assert calls == ["a", "b", "c", "d", "b"]
+    assert c.evictions >= 1 and c.stats()["hits"] == 2
+
+
+def test_new_version_replaces_old_one():
+    c = LRUCache(10_000)
+    c.load(("u", "/p", 1), lambda: "v1")
+    assert c.load(("u", "/p", 2), lambda: "v2") == "v2"
+    assert c.stats()["entries"] == 1
+    c.invalidate("/p")
+    assert (c.stats()["entries"], c.stats()["bytes"]) == (0, 0)
+
+
+def test_oversized_values_are_not_cached():
+    c = LRUCache(10)
+    assert c.load(("u", "big", 1), lambda: "x" * 1000) == "x" * 1000
+    assert c.stats()["entries"] == 0
+
+
+def test_thaw_copies_containers():
+    shared = {"a": [1, {"b": 2}], "df": pd.DataFrame({"x": [1]})}
+    mine = thaw(shared)
+    mine["a"][1]["b"] = 3
+    mine["df"].loc[0, "x"] = 9
+    assert shared["a"][1]["b"] == 2 and shared["df"].loc[0, "x"] == 1
+
+
+def test_load_file_sees_every_write(tmp_path):
+    p = tmp_path / "goals.json"
+    parses = []
+
+    def parser(path):
+        parses.append(1)
+        return path.read_text()
+    assert load_file(p, lambda _: "default", "u") == "default"
+    WRITER.write_text(p, "one")
+    assert load_file(p, parser, "u") == "one"
+    assert load_file(p, parser, "u") == "one" and len(parses) == 1
+    WRITER.write_text(p, "two!")
+    assert load_file(p, parser, "u") == "two!" and len(parses) == 2
+    # a change made outside the app (new size / mtime) is picked up too
+    p.write_text("three, edited by hand")
+    os.utime(p, ns=(1, 1))
+    assert load_file(p, parser, "u") == "three, edited by hand"
+    CACHE.invalidate(p)
@@ -0,0 +1,61 @@
+import csv
+import json
+import pytest
+from haven import exports
+from haven.exports import export_file
+from haven.storage import FileStore, SQLiteStore
+
+
+@pytest.fixture(params=["files", "sqlite"])
+def store(request, tmp_path):
+    s = FileStore(tmp_path) if request.param == "files" else SQLiteStore(tmp_path)
+    for i in range(7):
+        s.append_journal({"date": f"2025-01-0{i + 1}", "mood_1to5": 3, "emotion": "calm", "note": f"n{i}"})
+    s.put_nutrition_day("2025-01-31", {"water_glasses": 4})
+    s.put_nutrition_day("2025-02-01", {"calories": 1800, "notes": "soup"})
+    s.append_gratitude("tea")
+    yield s
+    s.close()
+
+
+def _rows(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        return list(csv.reader(f))
+
+
+def test_csv_in_chunks(store, monkeypatch):
+    monkeypatch.setattr(exports, "CHUNK_ROWS", 3)
+    rows = _rows(export_file(store, "journal"))
+    assert rows[0] == ["date", "mood_1to5", "emotion", "note"]
+    assert [r[3] for r in rows[1:]] == [f"n{i}" for i in range(7)]
+    nut = _rows(export_file(store, "nutrition"))
+    assert [r[0] for r in nut[1:]] == ["2025-01-31", "2025-02-01"]
+    assert nut[2][nut[0].index("calories")] == "1800" and nut[1][nut[0].index("mood_after_meals")] == "3"
+    assert json.loads(export_file(store, "gratitude", "json").read_text()) == ["tea"]
+
+
+def test_reused_until_the_source_changes(store):
+    first = export_file(store, "journal")
+    mtime = first.stat().st_mtime_ns
+    assert export_file(store, "journal") == first and first.stat().st_mtime_ns == mtime
+    store.append_journal({"date": "2025-01-08", "mood_1to5": 1, "emotion": "sad", "note": "new"})
+    second = export_file(store, "journal")
+    assert second != first and not first.exists()          # the stale file is removed
+    assert _rows(second)[-1][3] == "new"
+    store.put_nutrition_day("2025-02-01", {"calories": 2000})
+    nut = _rows(export_file(store, "nutrition"))
+    assert nut[-1][nut[0].index("calories")] == "2000"
+
+
+@pytest.mark.skipif("parquet" not in exports.FORMATS, reason="pyarrow not installed")
+def test_parquet_types(store):
+    import pyarrow.parquet as pq
+    t = pq.read_table(export_file(store, "journal", "parquet"))
+    assert t.num_rows == 7 and str(t.schema.field("mood_1to5").type) == "double"
+    empty = pq.read_table(export_file(store, "habits", "parquet"))
+    assert empty.num_rows == 0 and empty.column_names == ["Date", "Habit", "Done"]
+
+
+def test_unknown_format(store):
+    with pytest.raises(ValueError):
+        export_file(store, "gratitude", "csv")
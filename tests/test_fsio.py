@@ -0,0 +1,51 @@
+import pytest
+from haven.fsio import DurableWriter
+
+
+def test_write_is_atomic_and_leaves_no_temp_files(tmp_path):
+    w = DurableWriter("per-rerun")
+    p = tmp_path / "goals.json"
+    w.write_text(p, "old")
+    w.write_text(p, "new")
+    assert p.read_text() == "new"
+    assert [f.name for f in tmp_path.iterdir()] == ["goals.json"]
+
+
+def test_failed_write_keeps_the_old_file(tmp_path, monkeypatch):
+    w = DurableWriter("per-rerun")
+    p = tmp_path / "goals.json"
+    w.write_text(p, "old")
+
+    def crash(*a):
+        raise OSError("rename failed")
+    monkeypatch.setattr("haven.fsio.os.replace", crash)
+    with pytest.raises(OSError):
+        w.write_text(p, "new")
+    assert p.read_text() == "old"
+    assert [f.name for f in tmp_path.iterdir()] == ["goals.json"]
+
+
+def test_per_rerun_commits_once_per_run(tmp_path):
+    w = DurableWriter("per-rerun")
+    seen = []
+    w.subscribe(seen.append)
+    w.write_text(tmp_path / "a.json", "1")
+    w.append_bytes(tmp_path / "b.jsonl", b"x\n")
+    w.append_bytes(tmp_path / "b.jsonl", b"y\n")
+    assert w.pending() == 2 and len(seen) == 3
+    w.end_run()
+    assert w.pending() == 0 and w.commits == 1
+    w.end_run()
+    assert w.commits == 1                       # nothing written: no fsync pass
+    assert (tmp_path / "b.jsonl").read_bytes() == b"x\ny\n"
+
+
+def test_always_syncs_immediately(tmp_path):
+    w = DurableWriter("always")
+    w.write_text(tmp_path / "a.json", "1")
+    assert w.pending() == 0
+
+
+def test_unknown_policy():
+    with pytest.raises(ValueError):
+        DurableWriter("sometimes")
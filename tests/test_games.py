@@ -0,0 +1,71 @@
+import random
+import pytest
+from haven.games import ALPHA, GameStats, QuantileSketch, ReactionStats
+
+
+def _exact(xs, q):
+    xs = sorted(xs)
+    return xs[int(q * (len(xs) - 1))]
+
+
+def test_sketch_within_relative_error():
+    rnd = random.Random(0)
+    xs = [rnd.lognormvariate(5.6, 0.4) for _ in range(5000)]
+    sk = QuantileSketch()
+    for x in xs:
+        sk.add(x)
+    for q in (0.01, 0.25, 0.5, 0.9, 0.99):
+        assert abs(sk.quantile(q) - _exact(xs, q)) <= ALPHA * _exact(xs, q) + 1e-9
+    assert QuantileSketch().quantile(0.5) is None
+
+
+def test_merge_equals_one_sketch():
+    rnd = random.Random(1)
+    xs = [rnd.randint(120, 900) for _ in range(2000)] + [0, 0]
+    whole, a, b = QuantileSketch(), QuantileSketch(), QuantileSketch()
+    for i, x in enumerate(xs):
+        whole.add(x)
+        (a if i % 3 else b).add(x)
+    a.merge(b)
+    assert (a.zero, a.bins, a.count) == (whole.zero, whole.bins, whole.count)
+    assert a.quantile(0.9) == whole.quantile(0.9)
+    with pytest.raises(ValueError):
+        a.merge(QuantileSketch(alpha=0.05))
+
+
+def test_sketch_doc_round_trip():
+    sk = QuantileSketch()
+    for x in (0, 150, 250, 250, 400):
+        sk.add(x)
+    back = QuantileSketch.from_doc(sk.to_doc())
+    assert (back.zero, back.bins, back.count) == (sk.zero, sk.bins, sk.count)
+
+
+def test_reaction_stats_running_aggregates():
+    r = ReactionStats()
+    for ms in (300, 250, 410, -5):
+        r.add(ms)
+    assert (r.count, r.total, r.best, r.worst) == (4, 960, 0, 410)
+    assert r.mean == 240
+    one = ReactionStats()
+    one.add(251)
+    assert one.quantile(0.5) == one.quantile(0.9) == 251     # clamped to the exact best/worst
+    back = ReactionStats.from_doc(r.to_doc())
+    assert (back.count, back.total, back.best, back.worst) == (4, 960, 0, 410)
+
+
+def test_older_docs_convert():
+    g = GameStats.from_doc({"reaction": [300, 200, "x"], "eo_best": "7", "stroop_best": None})
+    assert (g.reaction.count, g.reaction.best) == (2, 200)
+    assert g.bests == {"eo_best": 7, "emotion_sort_best": 0, "stroop_best": 0}
+    g = GameStats.from_doc({"version": 2, "reaction": {"count": 1, "sum": 250, "best": 250, "worst": 250,
+                                                       "sketch": {"bins": {"140": 1}}, "recent": "+gA="}})
+    assert "recent" not in g.to_doc()["reaction"] and g.reaction.sketch.count == 1
+
+
+def test_record_best():
+    g = GameStats()
+    assert g.record_best("eo_best", 5)
+    assert not g.record_best("eo_best", 5)
+    assert not g.record_best("eo_best", 3)
+    assert g.to_doc()["eo_best"] == 5
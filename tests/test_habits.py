@@ -0,0 +1,40 @@
+import pandas as pd
+from haven.habits import HabitLog
+from haven.storage import HABIT_COLS
+
+
+def _log():
+    df = pd.DataFrame([("d1", "Walk", 1), ("d1", "Read", 0), ("d2", "Walk", 0),
+                       ("d2", "Walk", 1), ("d2", "Read", None), (None, "Walk", 1)], columns=HABIT_COLS)
+    return HabitLog.from_frame(df)
+
+
+def test_from_frame_collapses_duplicates():
+    log = _log()
+    assert len(log) == 4
+    assert log.names() == ["Read", "Walk"]
+    assert log.done_on("d1") == {"Walk"} and log.done_on("d2") == {"Walk"}
+    assert len(HabitLog.from_frame(pd.DataFrame(columns=HABIT_COLS))) == 0
+
+
+def test_set_returns_only_changes():
+    log = _log()
+    assert log.set("d1", {"Walk": 1, "Read": 1}) == {"Read": 1}
+    assert log.set("d1", {"Walk": 1, "Read": 1}) == {}
+    assert log.set("d3", {"Walk": 0}) == {"Walk": 0}          # a new row counts as a change
+    assert len(log) == 5 and log.done_on("d3") == set()
+    assert log.set("d3", {"Stretch": 1}) == {"Stretch": 1}
+    assert log.names() == ["Read", "Stretch", "Walk"]
+
+
+def test_add_and_remove_keep_other_bits():
+    log = _log()
+    assert log.add("d3", "Stretch") and not log.add("d3", "Stretch")
+    log.set("d3", {"Walk": 1, "Stretch": 1})
+    log.remove("Read")
+    log.remove("Missing")
+    assert log.names() == ["Stretch", "Walk"]
+    assert log.done_on("d1") == {"Walk"} and log.done_on("d3") == {"Stretch", "Walk"}
+    assert len(log) == 4
+    log.add("d4", "Read")                                    # a re-added name gets a fresh bit
+    assert log.done_on("d1") == {"Walk"} and len(log) == 5
@@ -0,0 +1,29 @@
+import pandas as pd
+from haven.journal import Journal
+from haven.storage import JOURNAL_COLS
+
+
+def _row(i):
+    return {"date": f"2025-01-{i:02d}", "mood_1to5": i % 5 + 1, "emotion": "calm", "note": f"n{i}"}
+
+
+def test_appends_stay_pending_until_frame():
+    j = Journal(pd.DataFrame([_row(1), _row(2)]))
+    j.append(_row(3))
+    j.append(_row(4))
+    assert len(j) == 4 and not j.empty
+    assert j.tail(3)["note"].tolist() == ["n2", "n3", "n4"]
+    assert len(j._base) == 2                       # tail() didn't materialize anything
+    df = j.frame()
+    assert df["note"].tolist() == ["n1", "n2", "n3", "n4"] and j.frame() is df
+    assert list(df.columns) == JOURNAL_COLS
+
+
+def test_empty_and_normalized():
+    j = Journal()
+    assert j.empty and j.tail(5).empty and j.frame().empty
+    j.append({"date": "2025-01-01", "mood_1to5": "4", "note": "no emotion"})
+    assert j.tail(1)["mood_1to5"].tolist() == [4.0]
+    assert j.frame()["emotion"].tolist() == [""]
+    j.append(_row(2))
+    assert j.tail(0).empty and j.tail(10)["note"].tolist() == ["no emotion", "n2"]
@@ -0,0 +1,86 @@
+import threading
+import pytest
+from haven.llm import FakeModel, LLMBusy, LLMClient
+
+
+class GatedModel:
+    """generate_content blocks until `gate` is set; counts upstream calls."""
+    def __init__(self, name="m", reply="hello", fail=None):
+        self.gate, self.calls, self.reply, self.fail = threading.Event(), 0, reply, list(fail or [])
+
+    def generate_content(self, prompt, generation_config=None, stream=False, request_options=None):
+        self.calls += 1
+        if self.fail:
+            raise self.fail.pop(0)
+        self.gate.wait(5)
+        return FakeModel(reply=f"{self.reply}: {prompt}").generate_content(prompt)
+
+
+def _client(model, **kw):
+    return LLMClient("m", model_factory=lambda _name: model, **kw)
+
+
+def test_one_model_and_reply_text():
+    model = GatedModel()
+    model.gate.set()
+    c = _client(model)
+    assert c.generate("hi") == "hello: hi"
+    assert c.model is c.model
+    assert c.stats["calls"] == 1 and c.stats["fallbacks"] == 0
+
+
+def test_identical_prompts_in_flight_share_one_call():
+    model = GatedModel()
+    c = _client(model)
+    futs = [c.submit("same", {"temperature": 0.5}) for _ in range(3)]
+    other = c.submit("different")
+    model.gate.set()
+    assert {f.result(2) for f in futs} == {"hello: same"} and other.result(2) == "hello: different"
+    assert model.calls == 2 and c.stats["deduped"] == 2
+    c.generate("same", {"temperature": 0.5})        # finished requests aren't reused
+    assert model.calls == 3
+
+
+def test_deadline_and_full_queue_raise_for_the_fallback():
+    model = GatedModel()
+    c = _client(model, timeout=0.1, max_queue=2)
+    with pytest.raises(TimeoutError):
+        c.generate("slow")
+    c.submit("b")
+    with pytest.raises(LLMBusy):
+        c.generate("c")
+    model.gate.set()
+    assert c.stats["timeouts"] == 1 and c.stats["rejected"] == 1 and c.stats["fallbacks"] == 2
+
+
+def test_retryable_errors_are_retried_within_the_deadline(monkeypatch):
+    monkeypatch.setattr("haven.llm.backoff", lambda attempt: 0.0)
+    model = GatedModel(fail=[RuntimeError("503 unavailable")])
+    model.gate.set()
+    c = _client(model, retries=2)
+    assert c.generate("x") == "hello: x" and c.stats["retried"] == 1
+    model.fail = [RuntimeError("400 bad request")]
+    with pytest.raises(RuntimeError):
+        c.generate("y")
+    assert c.stats["errors"] == 1
+
+
+def test_stream_yields_chunks_in_order():
+    c = _client(FakeModel(reply="one two three", delay=0))
+    chunks = list(c.stream("hi"))
+    assert chunks == ["one ", "two ", "three "]
+    assert c.stats["calls"] == 1 and c._streams == 0
+
+
+def test_stream_deadline_and_errors():
+    slow = _client(FakeModel(reply="a b c d e f", delay=0.05), timeout=0.12)
+    got = []
+    with pytest.raises(TimeoutError):
+        for t in slow.stream("hi"):
+            got.append(t)
+    assert 0 < len(got) < 6                         # the first chunks were already shown
+    broken = GatedModel(fail=[RuntimeError("400 bad request")])
+    c = _client(broken)
+    with pytest.raises(RuntimeError):
+        list(c.stream("hi"))
+    assert c.stats["errors"] == 1 and c.stats["fallbacks"] == 1
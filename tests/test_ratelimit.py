@@ -0,0 +1,66 @@
+import pytest
+from haven.ratelimit import MemoryBuckets, RateLimited, RateLimiter, SQLiteBuckets, backoff, is_retryable
+
+
+class Clock:
+    def __init__(self):
+        self.t = 1000.0
+
+    def __call__(self):
+        return self.t
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    c = Clock()
+    monkeypatch.setattr("haven.ratelimit.time.monotonic", c)
+    monkeypatch.setattr("haven.ratelimit.time.time", c)
+    monkeypatch.setattr("haven.ratelimit.time.sleep", lambda s: setattr(c, "t", c.t + s))
+    return c
+
+
+@pytest.mark.parametrize("make", [lambda tmp: MemoryBuckets(), lambda tmp: SQLiteBuckets(str(tmp / "rl.db"))])
+def test_buckets_take_all_or_nothing_and_refill(tmp_path, clock, make):
+    b = make(tmp_path)
+    wants = [("m:rpm", 1, 2, 1.0), ("m:tpm", 50, 100, 10.0)]
+    assert b.try_take(wants) == 0 and b.try_take(wants) == 0
+    wait = b.try_take(wants)                        # both buckets empty: nothing taken
+    assert wait == pytest.approx(5.0)               # tpm needs 50 tokens at 10/s
+    clock.t += 5
+    assert b.try_take(wants) == 0
+
+
+def test_limiter_waits_then_grants(clock):
+    lim = RateLimiter(rpm=60, tpm=0, max_wait=5)
+    lim.acquire("m", 10)
+    for _ in range(59):
+        lim.acquire("m", 10)
+    start = clock.t
+    lim.acquire("m", 10)                             # the 61st request waits ~1s for a refill
+    assert 1.0 <= clock.t - start < 1.1
+    assert lim.stats == {"granted": 61, "throttled": 1, "rejected": 0}
+
+
+def test_limiter_rejects_past_max_wait(clock):
+    lim = RateLimiter(rpm=1, tpm=0, max_wait=5)
+    lim.acquire("m", 1)
+    with pytest.raises(RateLimited):
+        lim.acquire("m", 1)
+    lim.acquire("other-model", 1)                    # buckets are per model
+    assert lim.stats["rejected"] == 1
+
+
+def test_huge_prompt_still_fits_and_zero_rpm_disables(clock):
+    lim = RateLimiter(rpm=10, tpm=100, max_wait=0)
+    lim.acquire("m", 10_000)                         # capped at the bucket size
+    RateLimiter(rpm=0, tpm=1).acquire("m", 10**9)
+
+
+def test_retry_policy():
+    class ApiError(Exception):
+        def __init__(self, code):
+            self.code = code
+    assert is_retryable(ApiError(429)) and is_retryable(ApiError(503))
+    assert not is_retryable(ApiError(400))
+    assert is_retryable(Exception("503 Service Unavailable")) and not is_retryable(Exception("oops"))
+    assert all(0 <= backoff(a) <= min(8.0, 0.5 * 2 ** a) for a in range(10) for _ in range(20))
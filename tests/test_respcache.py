@@ -0,0 +1,89 @@
+import sqlite3
+from haven.respcache import ResponseCache, exact_key, text_key, normalize
+
+
+class FakeClient:
+    def __init__(self):
+        self.calls = 0
+
+    def generate(self, prompt, generation_config=None):
+        self.calls += 1
+        return f"reply {self.calls}"
+
+
+def _cache(tmp_path, **kw):
+    return ResponseCache(tmp_path / "replies.db", **kw)
+
+
+def test_keys():
+    assert normalize("  I  FAILED, again!! ") == "i failed again"
+    assert text_key("cbt", "I failed!", user="u1") == text_key("cbt", "i  failed", user="u1")
+    assert text_key("cbt", "I failed", user="u1") != text_key("cbt", "I failed", user="u2")
+    assert exact_key("affirm", a=1, b=2) == exact_key("affirm", b=2, a=1)
+
+
+def test_variants_collected_before_hits(tmp_path):
+    c, client = _cache(tmp_path, variants=2), FakeClient()
+    assert c.generate(client, "k", "p") == "reply 1"
+    assert c.generate(client, "k", "p") == "reply 2"       # still collecting: miss
+    served = {c.generate(client, "k", "p") for _ in range(20)}
+    assert client.calls == 2 and served <= {"reply 1", "reply 2"}
+    assert c.stats["hits"] == 20
+
+
+def test_ttl_expires_entries(tmp_path, monkeypatch):
+    c = _cache(tmp_path, ttl=10, variants=1)
+    now = [1000.0]
+    monkeypatch.setattr("haven.respcache.time.time", lambda: now[0])
+    c.put("k", "hello")
+    assert c.get("k") == "hello"
+    now[0] += 11
+    assert c.get("k") is None
+
+
+def test_eviction_drops_least_recently_served(tmp_path, monkeypatch):
+    c = _cache(tmp_path, variants=1, max_entries=2)
+    now = [1000.0]
+    monkeypatch.setattr("haven.respcache.time.time", lambda: now[0])
+    for k in ("a", "b"):
+        now[0] += 1
+        c.put(k, k)
+    now[0] += 1
+    c.get("a")                       # "b" is now the least recently served
+    now[0] += 1
+    c.put("c", "c")
+    assert [c.get(k) for k in "abc"] == ["a", None, "c"]
+    assert c.stats["evicted"] == 1
+
+
+def test_byte_cap(tmp_path):
+    c = _cache(tmp_path, variants=1, max_bytes=10)
+    c.put("a", "x" * 8)
+    c.put("b", "y" * 8)
+    assert c.get("a") is None and c.get("b") == "y" * 8
+
+
+def test_forget_owner(tmp_path):
+    c, client = _cache(tmp_path, variants=1), FakeClient()
+    c.generate(client, text_key("cbt", "my thought", user="u1"), "p", owner="u1")
+    c.generate(client, text_key("cbt", "my thought", user="u2"), "p", owner="u2")
+    c.generate(client, exact_key("affirm", tone="gentle"), "p")
+    assert c.forget("u1") == 1
+    assert c.get(text_key("cbt", "my thought", user="u1")) is None
+    assert c.get(text_key("cbt", "my thought", user="u2")) is not None
+    assert c.get(exact_key("affirm", tone="gentle")) is not None
+    assert c.forget("") == 0
+
+
+def test_older_file_without_owner_is_reset(tmp_path):
+    path = tmp_path / "replies.db"
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE responses(key TEXT, variant TEXT, text TEXT, size INTEGER, created REAL, "
+                 "used REAL, PRIMARY KEY(key, variant))")
+    conn.execute("INSERT INTO responses VALUES('k', 'v', 'someone''s thought', 5, 1e12, 1e12)")
+    conn.commit()
+    conn.close()
+    c = ResponseCache(path, variants=1)
+    assert c.get("k") is None
+    c.put("k", "new", owner="u1")
+    assert c.get("k") == "new"
@@ -0,0 +1,49 @@
+import random
+from haven.safety import Classifier, load_lexicon
+
+
+def test_crisis_not_hidden_by_overlapping_term():
+    lex = load_lexicon()
+    lex["stress"].append("exhausted i")
+    r = Classifier(lex).classify("so exhausted i want to die")
+    assert r.crisis and r.stress
+    assert [m.text for m in r.spans] == ["exhausted i", "i want to die"]
+
+
+def test_overlapping_other_terms_both_count():
+    lex = load_lexicon()
+    lex["positive"].append("not so sad")
+    r = Classifier(lex).classify("i am not so sad today")
+    assert r.stress                 # "sad" inside the positive phrase still counts
+    assert r.tone == "neutral"      # positive and negative both hit
+
+
+def test_signals_and_spans():
+    r = Classifier().classify("Feeling STRESSED... I want   to die")
+    assert (r.crisis, r.stress, r.tone) == (True, True, "neutral")
+    assert r.spans[-1].text == "I want   to die" and r.spans[-1].categories == ("crisis",)
+    assert not Classifier().classify("a calm and good day").crisis
+
+
+def test_custom_term_extending_a_builtin_keeps_both():
+    lex = load_lexicon()
+    lex["negative"].append("sadness")
+    r = Classifier(lex).classify("such sadness")
+    assert r.stress and r.tone == "negative"       # "sad" (stress) isn't hidden by "sadness"
+    assert [(m.text, m.categories) for m in r.spans] == [
+        ("sad", ("stress", "negative")), ("sadness", ("negative",))]
+
+
+def test_matches_substring_checks_with_nested_terms():
+    rnd = random.Random(1)
+    lex = load_lexicon()
+    lex["negative"] += ["sadness", "tiredness", "panic attack"]
+    lex["positive"] += ["calmer", "good mood", "goodness"]
+    clf = Classifier(lex)
+    words = "i am so sad sadness tired tiredness panic attack calm calmer good mood goodness day".split()
+    for _ in range(300):
+        t = " ".join(rnd.choice(words) for _ in range(rnd.randint(1, 8)))
+        r = clf.classify(t)
+        assert r.stress == any(w in t for w in lex["stress"])
+        pos, neg = any(w in t for w in lex["positive"]), any(w in t for w in lex["negative"])
+        assert r.tone == ("positive" if pos and not neg else "negative" if neg and not pos else "neutral")
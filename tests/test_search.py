@@ -0,0 +1,59 @@
+import pandas as pd
+import pytest
+from haven.journal import Journal
+from haven.search import parse_query, search_journal, _sample
+from haven.storage import SQLiteStore
+
+
+@pytest.fixture
+def journal(tmp_path):
+    df = _sample(400)
+    df.loc[3, "note"] = "Stressed before the PRESENTATION, tired after exams"
+    df.loc[7, "note"] = "tired after exams again"
+    store = SQLiteStore(tmp_path)
+    for row in df.to_dict("records"):
+        store.append_journal(row)
+    yield df, store
+    store.close()
+
+
+def _dates(df):
+    return df["date"].tolist()
+
+
+def test_parse_query():
+    assert parse_query('Tired  "after   exams" ') == ["tired", "after exams"]
+    assert parse_query("   ") == []
+
+
+@pytest.mark.parametrize("q, d_from, d_to, moods", [
+    ("stress tired", None, None, None),
+    ('"presentation"', "2000-01-02", "2000-01-10", None),
+    ("cal", None, "2000-01-05", [1, 2]),
+    ("", "2000-01-03", None, [5]),
+    ("grateful NEGATIVE", None, None, [3, 4]),
+])
+def test_engines_agree_on_word_prefix_queries(journal, q, d_from, d_to, moods):
+    df, store = journal
+    got = {e: _dates(search_journal(df, q, d_from, d_to, moods, store=store, user="t", engine=e))
+           for e in ("auto", "scan", "index", "fts")}
+    assert got["scan"], q
+    assert got["auto"] == got["scan"] == got["index"] == got["fts"]
+
+
+def test_auto_keeps_substring_matching_at_any_size(journal):
+    df, store = journal
+    big = pd.concat([df] * 60, ignore_index=True)       # 24k entries, past any size threshold
+    rows = search_journal(big, "ress", store=store, user="t")
+    assert len(rows) == len(search_journal(big, "ress", store=store, user="t", engine="scan"))
+    assert len(rows) == 60 * len(search_journal(df, "ress", engine="scan"))
+    assert search_journal(df, "ress", store=store, engine="fts").empty    # word prefixes only
+
+
+def test_fts_does_not_build_the_frame(journal):
+    df, store = journal
+    j = Journal(df)
+    j.append({"date": "2030-01-01", "mood_1to5": 3, "emotion": "calm", "note": "pending entry"})
+    search_journal(j, "tired", store=store, engine="fts")
+    assert j._pending                                    # still not materialized
+    assert len(search_journal(j, "pending", engine="scan")) == 1
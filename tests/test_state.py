@@ -0,0 +1,34 @@
+from haven.state import DirtyTracker, digest
+
+
+def test_digest_ignores_key_order():
+    assert digest({"a": 1, "b": [1, 2]}) == digest({"b": [1, 2], "a": 1})
+    assert digest({"a": 1}) != digest({"a": 2})
+
+
+def test_flush_skips_unchanged_values():
+    t, writes = DirtyTracker(), []
+    goals = {"water": 8, "checklist": {"fruit": True}}
+    t.mark_clean("goals", goals)
+    assert not t.is_dirty("goals", dict(goals))
+    assert not t.flush("goals", goals, lambda: writes.append(1))
+    goals["water"] = 9
+    assert t.is_dirty("goals", goals)
+    assert t.flush("goals", goals, lambda: writes.append(2))
+    assert not t.flush("goals", goals, lambda: writes.append(3))
+    assert writes == [2]
+    assert t.stats() == {"run_writes": 1, "writes": 1, "skipped": 2}
+    t.begin_run()
+    assert t.stats()["run_writes"] == 0 and t.writes == 1
+
+
+def test_failed_write_stays_dirty():
+    t = DirtyTracker()
+
+    def boom():
+        raise OSError("disk full")
+    try:
+        t.flush("day", {"x": 1}, boom)
+    except OSError:
+        pass
+    assert t.is_dirty("day", {"x": 1}) and t.writes == 0
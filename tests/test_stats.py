@@ -0,0 +1,70 @@
+import random
+from datetime import date, timedelta
+import pandas as pd
+from haven.stats import Aggregates, journal_deltas, merge_deltas
+
+
+def _row(d, mood=3, emotion="calm"):
+    return {"date": f"{d} 09:00", "mood_1to5": mood, "emotion": emotion, "note": ""}
+
+
+def _days(start, n):
+    d0 = date.fromisoformat(start)
+    return [(d0 + timedelta(i)).isoformat() for i in range(n)]
+
+
+def test_deltas():
+    assert journal_deltas(_row("2025-01-02", 4, "calm")) == {
+        "rows": 1, "day/2025-01-02/n": 1, "day/2025-01-02/mood": 4.0, "day/2025-01-02/moods": 1,
+        "emotion/calm": 1}
+    assert journal_deltas({"date": "not a date", "mood_1to5": 3}) == {"rows": 1}
+    assert journal_deltas({"date": "2025-01-02", "mood_1to5": float("nan"), "emotion": None}) == {
+        "rows": 1, "day/2025-01-02/n": 1}
+    assert merge_deltas({"rows": 1}, {"rows": 2, "x": 1}) == {"rows": 3, "x": 1}
+
+
+def test_streaks_in_order():
+    agg = Aggregates()
+    for d in _days("2025-01-01", 3) + _days("2025-01-10", 5):
+        agg.add_journal(_row(d))
+    agg.add_journal(_row("2025-01-14"))                  # second entry on the same day
+    assert agg.current_streak("2025-01-14") == 5
+    assert agg.current_streak("2025-01-15") == 0
+    assert agg.longest_streak() == 5 and agg.entries() == 9
+
+
+def test_back_dated_entry_joins_runs():
+    agg = Aggregates()
+    for d in ["2025-01-01", "2025-01-02", "2025-01-04", "2025-01-05"]:
+        agg.add_journal(_row(d))
+    assert agg.longest_streak() == 2 and agg.current_streak("2025-01-05") == 2
+    agg.add_journal(_row("2025-01-03"))                  # fills the gap
+    assert agg.longest_streak() == 5 and agg.current_streak("2025-01-05") == 5
+
+
+def test_incremental_matches_rebuild_and_stored_form():
+    rnd = random.Random(0)
+    rows = [_row(rnd.choice(_days("2025-01-01", 40)), rnd.choice([1, 2, 3, 4, 5, None]),
+                 rnd.choice(["calm", "sad", None])) for _ in range(200)]
+    live, stored = Aggregates(), {}
+    for r in rows:
+        merge_deltas(stored, live.add_journal(r))
+    built = Aggregates.build(pd.DataFrame(rows))
+    loaded = Aggregates(stored)
+    for agg in (built, loaded, Aggregates(live.counters())):
+        assert agg.counters() == live.counters()
+        assert agg.longest_streak() == live.longest_streak()
+        assert agg.current_streak("2025-02-09") == live.current_streak("2025-02-09")
+        assert agg.mood_by_day() == live.mood_by_day()
+    assert live.matches(pd.DataFrame(rows)) and not live.matches(pd.DataFrame(rows[:-1]))
+
+
+def test_summaries():
+    agg = Aggregates()
+    agg.add_journal(_row("2025-01-01", 2, "sad"))
+    agg.add_journal(_row("2025-01-01", 4, "calm"))
+    agg.add_journal(_row("2025-01-02", None, "calm"))
+    agg.add_journal(_row("2025-01-03", 5, None))
+    assert agg.emotion_counts() == {"sad": 1, "calm": 2}
+    assert agg.mood_by_day() == [("2025-01-01", 3.0), ("2025-01-03", 5.0)]
+    assert agg.mood_by_day(last=1) == [("2025-01-03", 5.0)]
@@ -0,0 +1,163 @@
+import json
+import pytest
+from haven.storage import (Store, FileStore, SQLiteStore, migrate_files_to_sqlite, open_store, close_store,
+                           months_between)
+
+
+def _ops(store):
+    """The same sequence of saves the app makes, against any backend."""
+    store.append_journal({"date": "2025-01-01 08:00", "mood_1to5": 4, "emotion": "Calm", "note": "walk"})
+    store.append_journal({"date": "2025-01-02 21:10", "mood_1to5": 2, "emotion": "Anxious", "note": "deadline, \"again\""})
+    store.append_journal({"date": "2025-01-02 22:00", "mood_1to5": None, "emotion": None, "note": "ünïcode"})
+    for i in range(4):
+        store.append_checkin({"timestamp": f"2025-01-0{i + 1} 09:00", "answers": {"sleep": i, "notes": "ok"}})
+    for line in ("sun", "tea", "a friend"):
+        store.append_gratitude(line)
+    store.add_habit("2025-01-01", "Walk")
+    store.add_habit("2025-01-01", "Read")
+    store.add_habit("2025-01-01", "Walk")               # no duplicate
+    store.set_habits("2025-01-01", {"Walk": 1})
+    store.set_habits("2025-01-02", {"Walk": 1, "Read": 0})
+    store.set_habits("2025-01-02", {"Read": 1})
+    store.add_habit("2025-01-02", "Stretch")
+    store.delete_habit("Stretch")
+    store.put_nutrition_day("2024-12-31", {"water": 3})
+    store.put_nutrition_day("2025-01-02", {"water": 5, "meals": ["soup"]})
+    store.put_nutrition_day("2025-01-02", {"water": 6, "meals": ["soup"]})
+    store.save_doc("games", {"version": 2, "eo_best": 3})
+    store.save_doc("melody", {"playlists": {"calm": ["a", "b"]}})
+    store.add_stats({"rows": 1, "day/2025-01-01/n": 1, "day/2025-01-01/mood": 4})
+    store.add_stats({"rows": 2, "day/2025-01-02/n": 2})
+
+
+def _snapshot(store):
+    journal = store.load_journal()
+    return {
+        "journal": [[None if v != v else v for v in r] for r in journal.astype(object).values.tolist()],
+        "journal_chunks": sum(len(c) for c in store.iter_journal(chunk=2)),
+        "checkins": store.load_checkins(),
+        "tail_checkins": store.tail_checkins(2),
+        "gratitude": store.load_gratitude(),
+        "count_gratitude": store.count_gratitude(),
+        "tail_gratitude": store.tail_gratitude(2),
+        "habits": sorted(map(tuple, store.load_habits().astype({"Done": int}).values.tolist())),
+        "nutrition": store.load_nutrition(),
+        "nutrition_range": store.load_nutrition_range("2025-01-01", "2025-01-31"),
+        "nutrition_iter": list(store.iter_nutrition()),
+        "games": store.load_doc("games", None),
+        "melody": store.load_doc("melody", None),
+        "missing": store.load_doc("nutrition_goals", {"default": True}),
+        "stats": store.load_stats(),
+    }
+
+
+@pytest.fixture
+def stores(tmp_path):
+    files, sqlite = FileStore(tmp_path / "files"), SQLiteStore(tmp_path / "sqlite")
+    yield files, sqlite
+    sqlite.close()
+
+
+def test_backends_agree(stores):
+    files, sqlite = stores
+    for s in stores:
+        _ops(s)
+    a, b = _snapshot(files), _snapshot(sqlite)
+    assert a == b
+    assert a["habits"] == [("2025-01-01", "Read", 0), ("2025-01-01", "Walk", 1),
+                           ("2025-01-02", "Read", 1), ("2025-01-02", "Walk", 1)]
+    assert a["stats"] == {"rows": 3, "day/2025-01-01/n": 1, "day/2025-01-01/mood": 4, "day/2025-01-02/n": 2}
+
+
+def test_reset_stats_agrees(stores):
+    for s in stores:
+        s.add_stats({"rows": 5, "emotion/Calm": 2})
+        s.reset_stats({"rows": 1})
+        s.add_stats({"rows": 1})
+    assert [s.load_stats() for s in stores] == [{"rows": 2}] * 2
+
+
+def test_migrator_round_trip(tmp_path):
+    user = tmp_path / "u1"
+    _ops(FileStore(user))
+    (user / "checkins.jsonl").unlink()                  # an older folder: check-ins still a JSON array
+    (user / "checkins.jsonl.idx").unlink()
+    (user / "checkins.json").write_text(json.dumps([{"timestamp": "t0", "answers": {"mood": 3}}]))
+    before = _snapshot(FileStore(user))
+
+    assert migrate_files_to_sqlite(user)
+    db = SQLiteStore(user)
+    try:
+        assert _snapshot(db) == before
+        assert db.load_checkins() == [{"timestamp": "t0", "answers": {"mood": 3}}]
+        assert not migrate_files_to_sqlite(user, store=db)      # only once
+        db.append_gratitude("after")
+        assert migrate_files_to_sqlite(user, store=db, force=True)
+        assert _snapshot(db) == before                           # force replaces, never duplicates
+    finally:
+        db.close()
+
+
+def test_migrator_merges_duplicate_habit_rows(tmp_path):
+    user = tmp_path / "u2"
+    user.mkdir()
+    (user / "habits.csv").write_text("Date,Habit,Done\n2025-01-01,Walk,0\n2025-01-01,Walk,1\n2025-01-01,Read,\n")
+    assert migrate_files_to_sqlite(user)
+    db = SQLiteStore(user)
+    try:
+        assert sorted(map(tuple, db.load_habits().values.tolist())) == [
+            ("2025-01-01", "Read", 0), ("2025-01-01", "Walk", 1)]
+    finally:
+        db.close()
+
+
+def test_incomplete_backend_fails_on_creation(tmp_path):
+    class Partial(Store):
+        def load_journal(self): ...
+    with pytest.raises(TypeError):
+        Partial(tmp_path)
+
+
+def test_open_store_defaults_to_sqlite(tmp_path, monkeypatch):
+    monkeypatch.delenv("HAVEN_STORAGE", raising=False)
+    user = tmp_path / "u3"
+    FileStore(user).append_gratitude("from the files layout")
+    store = open_store(user)
+    try:
+        assert isinstance(store, SQLiteStore)
+        assert store.load_gratitude() == ["from the files layout"]
+    finally:
+        close_store(user)
+
+
+def test_months_between():
+    assert months_between("2024-11-20", "2025-01-03") == ["2024-11", "2024-12", "2025-01"]
+    assert months_between("2025-02-01", "2025-02-28") == ["2025-02"]
+
+
+def test_legacy_nutrition_is_split_by_month(tmp_path):
+    user = tmp_path / "u4"
+    user.mkdir()
+    days = {"2024-12-30": {"water": 1}, "2025-01-02": {"water": 2}, "2025-01-20": {"water": 3}}
+    (user / "nutrition_day.json").write_text(json.dumps(days))
+    (user / "nutrition").mkdir()
+    # an interrupted earlier split: the partition's own days win
+    (user / "nutrition" / "2025-01.json").write_text(json.dumps({"2025-01-02": {"water": 9}}))
+    store = FileStore(user)
+    assert store.load_nutrition_range("2025-01-01", "2025-01-31") == {
+        "2025-01-02": {"water": 9}, "2025-01-20": {"water": 3}}
+    assert sorted(p.name for p in (user / "nutrition").iterdir()) == ["2024-12.json", "2025-01.json"]
+    assert (user / "nutrition_day.json.migrated").exists() and not (user / "nutrition_day.json").exists()
+    store.put_nutrition_day("2025-02-01", {"water": 4})
+    assert [d for d, _ in store.iter_nutrition()] == ["2024-12-30", "2025-01-02", "2025-01-20", "2025-02-01"]
+
+
+def test_week_window_reads_only_its_months(tmp_path, monkeypatch):
+    store = FileStore(tmp_path / "u5")
+    for d in ("2024-06-01", "2025-01-30", "2025-02-02"):
+        store.put_nutrition_day(d, {"water": 1})
+    read = []
+    real = FileStore._month
+    monkeypatch.setattr(FileStore, "_month", lambda self, m: read.append(m) or real(self, m))
+    assert list(store.load_nutrition_range("2025-01-27", "2025-02-02")) == ["2025-01-30", "2025-02-02"]
+    assert read == ["2025-01", "2025-02"]